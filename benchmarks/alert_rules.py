@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Alert rule evaluation cost per sample, by number of rules.
+
+  indexed  AlertEngine.evaluate on a random walk: one bisect per threshold
+           group, then only the rules with an atom the value crossed,
+           including the pending/firing/resolved events they raise
+  quiet    the same on a sample that crosses no threshold, the cost that
+           does not grow with the number of rules
+  naive    every rule compiled to a Python function and called on every
+           sample, for comparison
+
+Rules are a mix of `metric > c` / `metric < c` thresholds, rate() thresholds
+and two-metric `and` rules (--expressions of them), plus as many `or`
+rules, which are not indexable and run as functions. Thresholds are
+uniform over each metric's range and the walk moves 1% of the range per
+step, so every step crosses about 1% of the atoms.
+
+Usage: python benchmarks/alert_rules.py [--rules 1000,10000] [--expressions 0.1] [--json]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "cloud_monitoring_dashboard", "backend"))
+
+from alerts import AlertEngine, RulePlan, compile_source  # noqa: E402
+from history import METRIC_NAMES  # noqa: E402
+
+LEVELS = {"cpu_usage": (0.0, 100.0), "memory_usage": (0.0, 100.0), "api_latency": (50.0, 2000.0),
+          "error_rate": (0.0, 20.0)}
+
+def build_rules(count: int, expressions: float, rng: random.Random) -> list:
+    rules = []
+    for index in range(count):
+        metric = rng.choice(METRIC_NAMES)
+        low, high = LEVELS[metric]
+        threshold = round(rng.uniform(low, high), 2)
+        kind = rng.random()
+        if kind < 2 * expressions:
+            other = rng.choice([name for name in METRIC_NAMES if name != metric])
+            other_low, other_high = LEVELS[other]
+            joiner = "and" if kind < expressions / 2 else "or"
+            expr = f"{metric} > {threshold} {joiner} {other} > {round(rng.uniform(other_low, other_high), 2)}"
+        elif kind < 2 * expressions + 0.1:
+            expr = f"rate({metric}) > {round((high - low) / 20 * rng.random(), 2)}"
+        else:
+            expr = f"{metric} {rng.choice(['>', '>=', '<', '<='])} {threshold}"
+        rules.append({"name": f"rule-{index}", "expr": expr, "for": rng.choice([0, 0, 10, 30])})
+    return rules
+
+def walk(samples: int, rng: random.Random) -> list:
+    current = {name: (low + high) / 2 for name, (low, high) in LEVELS.items()}
+    steps = []
+    for _ in range(samples):
+        for name, (low, high) in LEVELS.items():
+            current[name] = min(high, max(low, current[name] + rng.gauss(0, (high - low) / 100)))
+        steps.append(dict(current))
+    return steps
+
+def bench(count: int, expressions: float, samples: int, rng: random.Random) -> dict:
+    specs = build_rules(count, expressions, rng)
+    started = time.perf_counter()
+    plan = RulePlan(specs)
+    compile_ms = (time.perf_counter() - started) * 1000
+    engine = AlertEngine()
+    engine.replace_plan(plan, timestamp=0.0)
+    steps = walk(samples, rng)
+
+    indexed, events = [], 0
+    for tick, values in enumerate(steps):
+        started = time.perf_counter()
+        events += len(engine.evaluate(None, float(tick), values))
+        indexed.append(time.perf_counter() - started)
+    quiet = []
+    for tick in range(samples, samples + 50):
+        started = time.perf_counter()
+        engine.evaluate(None, float(tick), steps[-1])
+        quiet.append(time.perf_counter() - started)
+
+    #the same rules without the threshold index: one function call per rule per sample
+    functions = [compile_source(rule.source) for rule in plan.rules]
+    naive = []
+    previous = None
+    for tick, values in enumerate(steps):
+        started = time.perf_counter()
+        terms = {("value", name): value for name, value in values.items()}
+        if previous is not None:
+            terms.update({("rate", name): value - previous[name] for name, value in values.items()})
+        for function in functions:
+            try:
+                function(terms)
+            except KeyError:
+                pass
+        previous = values
+        naive.append(time.perf_counter() - started)
+
+    #the first sample evaluates every rule, report it apart from the steady state
+    return {
+        "rules": count,
+        "threshold_groups": engine.get_stats()["threshold_groups"],
+        "expression_rules": engine.get_stats()["expression_rules"],
+        "compile_ms": round(compile_ms, 1),
+        "first_sample_ms": round(indexed[0] * 1000, 3),
+        "indexed_ms": round(statistics.median(indexed[1:]) * 1000, 3),
+        "indexed_p99_ms": round(sorted(indexed[1:])[int(0.99 * (len(indexed) - 2))] * 1000, 3),
+        "quiet_ms": round(statistics.median(quiet[1:]) * 1000, 3),
+        "naive_ms": round(statistics.median(naive[1:]) * 1000, 3),
+        "events_per_sample": round(events / samples, 1)
+    }
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rules", default="1000,10000", help="rule counts, comma separated")
+    parser.add_argument("--expressions", type=float, default=0.1, help="fraction of two-metric and rules, and again of or rules")
+    parser.add_argument("--samples", type=int, default=200, help="samples evaluated per rule count")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    results = [bench(int(count), args.expressions, args.samples, rng) for count in args.rules.split(",")]
+
+    if args.json:
+        print(json.dumps({"benchmark": "alert_rules", "expressions": args.expressions, "results": results}, indent=2))
+        return
+
+    print(f"{'rules':>7} {'groups':>7} {'exprs':>6} {'compile ms':>11} {'first ms':>9} "
+          f"{'indexed ms':>11} {'p99 ms':>7} {'quiet ms':>9} {'naive ms':>9} {'events':>7}")
+    for row in results:
+        print(f"{row['rules']:>7} {row['threshold_groups']:>7} {row['expression_rules']:>6} "
+              f"{row['compile_ms']:>11.1f} {row['first_sample_ms']:>9.2f} {row['indexed_ms']:>11.3f} "
+              f"{row['indexed_p99_ms']:>7.3f} {row['quiet_ms']:>9.3f} {row['naive_ms']:>9.2f} {row['events_per_sample']:>7.1f}")
+
+if __name__ == "__main__":
+    main_cli()
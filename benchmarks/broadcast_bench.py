@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark for ConnectionManager.broadcast.
+
+Measures the per-tick CPU cost of fanning out one metrics frame to N
+in-memory sockets:
+
+  legacy        the original serial loop, json.dumps + await per socket
+  queued/each   per-connection writer queues, encoding once per socket
+  queued/json   per-connection writer queues, one pre-encoded frame (json)
+  queued/orjson same, encoded with orjson (only when it is installed)
+
+The sockets are no-ops, so the legacy column shows pure CPU without the
+head-of-line blocking that real network sends add to it.
+
+Usage: python benchmarks/broadcast_bench.py [--ticks 200] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "cloud_monitoring_dashboard", "backend"))
+#keep the benchmark off the on-disk metrics store
+os.environ.setdefault("METRICS_STORE_ENABLED", "false")
+
+import frames  # noqa: E402
+import main  # noqa: E402
+
+CONNECTION_COUNTS = (10, 100, 1000)
+
+class SendCounter:
+    """Counts frames across all sockets and wakes the benchmark at a target."""
+
+    def __init__(self):
+        self.sent = 0
+        self.target = 0
+        self.done = asyncio.Event()
+
+    def expect(self, frames: int):
+        self.sent = 0
+        self.target = frames
+        self.done.clear()
+
+    def record(self):
+        self.sent += 1
+        if self.sent >= self.target:
+            self.done.set()
+
+class NullWebSocket:
+    """WebSocket stand-in that accepts every frame instantly."""
+    client = None
+
+    def __init__(self, counter: SendCounter = None):
+        self.counter = counter
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        if self.counter is not None:
+            self.counter.record()
+
+    async def close(self, code: int = 1000):
+        pass
+
+def sample_message() -> dict:
+    metrics = main.Metrics(
+        cpu_usage=42.1, memory_usage=63.5, api_latency=118.4, error_rate=1.21,
+        timestamp=datetime.now().isoformat(), active_incidents=["cpu_spike", "api_failure"]
+    )
+    return {
+        "type": "metrics",
+        "data": metrics.to_dict(),
+        "incident_count": 2,
+        "system_status": "critical",
+        "ai_status": "active"
+    }
+
+async def legacy_tick(sockets, message):
+    #the original loop: encode and await every socket in turn
+    for websocket in sockets:
+        await websocket.send_text(json.dumps(message))
+
+async def bench_legacy(connections: int, ticks: int) -> float:
+    sockets = [NullWebSocket() for _ in range(connections)]
+    message = sample_message()
+    started = time.process_time()
+    for _ in range(ticks):
+        await legacy_tick(sockets, message)
+    return (time.process_time() - started) / ticks
+
+async def broadcast_per_socket(manager, message):
+    #queued fan-out but with the old encode-per-socket behaviour
+    for client in list(manager.active_connections.values()):
+        client.enqueue(frames.Frame.from_message(message))
+
+async def bench_frames(connections: int, ticks: int, use_orjson: bool, encode_once: bool = True) -> float:
+    saved = frames.orjson
+    if not use_orjson:
+        frames.orjson = None
+    try:
+        counter = SendCounter()
+        manager = main.ConnectionManager(max_queue=ticks + 1)
+        counter.expect(connections)
+        for _ in range(connections):
+            await manager.connect(NullWebSocket(counter))
+        await counter.done.wait()
+
+        message = sample_message()
+        started = time.process_time()
+        for _ in range(ticks):
+            counter.expect(connections)
+            if encode_once:
+                await manager.broadcast(message)
+            else:
+                await broadcast_per_socket(manager, message)
+            await counter.done.wait()
+        elapsed = (time.process_time() - started) / ticks
+
+        for websocket in list(manager.active_connections):
+            manager.disconnect(websocket)
+        return elapsed
+    finally:
+        frames.orjson = saved
+
+async def run(ticks: int) -> list:
+    results = []
+    for connections in CONNECTION_COUNTS:
+        row = {
+            "connections": connections,
+            "legacy_ms": await bench_legacy(connections, ticks) * 1000,
+            "queued_each_ms": await bench_frames(connections, ticks, use_orjson=False, encode_once=False) * 1000,
+            "queued_json_ms": await bench_frames(connections, ticks, use_orjson=False) * 1000
+        }
+        if frames.orjson is not None:
+            row["queued_orjson_ms"] = await bench_frames(connections, ticks, use_orjson=True) * 1000
+        results.append(row)
+    return results
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ticks", type=int, default=200, help="broadcasts per measurement")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    main.logger.disabled = True
+    results = asyncio.run(run(args.ticks))
+
+    if args.json:
+        print(json.dumps({"benchmark": "broadcast", "ticks": args.ticks, "results": results}, indent=2))
+        return
+
+    print(f"CPU per tick (ms), {args.ticks} ticks, orjson={'yes' if frames.orjson else 'no'}")
+    print(f"{'conns':>6} {'legacy':>10} {'queued/each':>12} {'queued/json':>12} {'queued/orjson':>14}")
+    for row in results:
+        orjson_ms = f"{row['queued_orjson_ms']:.3f}" if "queued_orjson_ms" in row else "-"
+        print(f"{row['connections']:>6} {row['legacy_ms']:>10.3f} {row['queued_each_ms']:>12.3f} "
+              f"{row['queued_json_ms']:>12.3f} {orjson_ms:>14}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Per-tick cost of the /proc host metrics collector.
+
+  reopen     opens, reads and closes every /proc file on each read
+  collector  HostCollector, handles kept open and re-read with seek(0)
+
+Both parse the same counters. CPU time is process time, so the numbers
+are what one sample costs this process; "% core @1s" is that cost at a
+1 second collection interval.
+
+Usage: python benchmarks/collector_overhead.py [--ticks 2000] [--pids self,1] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "cloud_monitoring_dashboard", "backend"))
+
+import collector as collector_module  # noqa: E402
+from collector import HostCollector, parse_pids  # noqa: E402
+
+class ReopeningProcFile:
+    """ProcFile without the cached handle."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def read(self) -> bytes:
+        with open(self.path, "rb", buffering=0) as handle:
+            return handle.read(65536)
+
+    def close(self):
+        pass
+
+def bench_collector(ticks: int, pids: list) -> float:
+    collector = HostCollector(pids)
+    collector.sample()
+    started = time.process_time()
+    for _ in range(ticks):
+        collector.sample()
+    elapsed = (time.process_time() - started) / ticks
+    collector.close()
+    return elapsed
+
+def bench_reopen(ticks: int, pids: list) -> float:
+    saved = collector_module.ProcFile
+    collector_module.ProcFile = ReopeningProcFile
+    try:
+        return bench_collector(ticks, pids)
+    finally:
+        collector_module.ProcFile = saved
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ticks", type=int, default=2000, help="samples per measurement")
+    parser.add_argument("--pids", default="self,1", help="processes to sample, comma separated")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    pids = parse_pids(args.pids)
+    results = []
+    for name, bench in (("reopen", bench_reopen), ("collector", bench_collector)):
+        cost = bench(args.ticks, pids)
+        results.append({"mode": name, "us_per_tick": cost * 1e6, "core_percent_at_1s": cost * 100})
+
+    if args.json:
+        print(json.dumps({"benchmark": "collector_overhead", "ticks": args.ticks, "pids": pids,
+                          "results": results}, indent=2))
+        return
+
+    print(f"CPU per sample, {args.ticks} ticks, {len(pids)} processes")
+    print(f"{'mode':>10} {'us/tick':>10} {'% core @1s':>11}")
+    for row in results:
+        print(f"{row['mode']:>10} {row['us_per_tick']:>10.1f} {row['core_percent_at_1s']:>11.4f}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Memory per stored sample: list of Metrics.to_dict() dicts vs MetricsHistory.
+
+Also times one append at full capacity for both layouts (list.pop(0)
+vs the ring buffer).
+
+Usage: python benchmarks/history_memory.py [--samples 1800] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "cloud_monitoring_dashboard", "backend"))
+
+from history import MetricsHistory  # noqa: E402
+
+INCIDENT_IDS = ["cpu_spike", "memory_leak", "api_failure", "network_latency"]
+
+def make_sample(index: int) -> dict:
+    now = time.time() + index * 2
+    return {
+        "cpu_usage": 25.0 + index % 7,
+        "memory_usage": 45.0 + index % 5,
+        "api_latency": 120.0 + index % 11,
+        "error_rate": 1.2 + (index % 3) / 100,
+        "timestamp": datetime.fromtimestamp(now).isoformat(),
+        "active_incidents": ["cpu_spike"] if index % 4 == 0 else []
+    }, now
+
+def measure_dicts(samples: int) -> float:
+    tracemalloc.start()
+    history = []
+    for index in range(samples):
+        sample, _ = make_sample(index)
+        history.append(sample)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / samples
+
+def measure_ring(samples: int) -> float:
+    tracemalloc.start()
+    history = MetricsHistory(samples, INCIDENT_IDS)
+    for index in range(samples):
+        sample, now = make_sample(index)
+        history.append(now, sample, sample["active_incidents"])
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / samples
+
+def time_appends(samples: int, rounds: int = 5000) -> dict:
+    sample, now = make_sample(0)
+
+    history_list = [sample] * samples
+    started = time.perf_counter()
+    for _ in range(rounds):
+        history_list.append(sample)
+        if len(history_list) > samples:
+            history_list.pop(0)
+    list_us = (time.perf_counter() - started) / rounds * 1e6
+
+    ring = MetricsHistory(samples, INCIDENT_IDS)
+    for _ in range(samples):
+        ring.append(now, sample, sample["active_incidents"])
+    started = time.perf_counter()
+    for _ in range(rounds):
+        ring.append(now, sample, sample["active_incidents"])
+    ring_us = (time.perf_counter() - started) / rounds * 1e6
+
+    return {"list_append_us": list_us, "ring_append_us": ring_us}
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=1800, help="samples held (1800 = 1 hour at 2 s)")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = {
+        "samples": args.samples,
+        "dict_bytes_per_sample": measure_dicts(args.samples),
+        "ring_bytes_per_sample": measure_ring(args.samples),
+        **time_appends(args.samples)
+    }
+
+    if args.json:
+        print(json.dumps({"benchmark": "history_memory", "results": results}, indent=2))
+        return
+
+    print(f"{args.samples} samples")
+    print(f"  list of dicts : {results['dict_bytes_per_sample']:8.1f} bytes/sample, "
+          f"append {results['list_append_us']:.2f} us")
+    print(f"  MetricsHistory: {results['ring_bytes_per_sample']:8.1f} bytes/sample, "
+          f"append {results['ring_append_us']:.2f} us")
+
+if __name__ == "__main__":
+    main_cli()
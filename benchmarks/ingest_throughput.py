@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Single-core throughput of the multi-host ingestion path.
+
+Each request body is pre-encoded JSON; the timed part is what
+POST /api/ingest does per request: decode, bulk validation, queueing and
+the writer appending to the per-host ring buffers.
+
+  columnar  {"batches": [{"host", "timestamps", "<metric>": [...]}]}
+  rows      {"samples": [{"host", "timestamp", "<metric>": ...}, ...]}
+
+Usage: python benchmarks/ingest_throughput.py [--hosts 100] [--per-host 100] [--requests 50] [--json]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "cloud_monitoring_dashboard", "backend"))
+
+from frames import decode_json, encode_json  # noqa: E402
+from history import METRIC_NAMES  # noqa: E402
+from ingest import IngestPipeline  # noqa: E402
+
+def columnar_body(hosts: int, per_host: int, start: float) -> bytes:
+    batches = []
+    for host in range(hosts):
+        batch = {"host": f"host-{host}", "timestamps": [start + i for i in range(per_host)]}
+        for name in METRIC_NAMES:
+            batch[name] = [round(random.uniform(0, 99), 2) for _ in range(per_host)]
+        batches.append(batch)
+    return encode_json({"batches": batches}).encode("utf-8")
+
+def rows_body(hosts: int, per_host: int, start: float) -> bytes:
+    samples = []
+    for i in range(per_host):
+        for host in range(hosts):
+            sample = {"host": f"host-{host}", "timestamp": start + i}
+            for name in METRIC_NAMES:
+                sample[name] = round(random.uniform(0, 99), 2)
+            samples.append(sample)
+    return encode_json({"samples": samples}).encode("utf-8")
+
+def bench(make_body, hosts: int, per_host: int, requests: int) -> dict:
+    pipeline = IngestPipeline(capacity_per_host=max(1800, per_host * requests), max_hosts=hosts,
+                              max_batch=hosts * per_host)
+    now = time.time()
+    #each request carries newer timestamps, like a live feed
+    first = now - requests * per_host - 60
+    bodies = [make_body(hosts, per_host, first + r * per_host) for r in range(requests)]
+
+    started = time.process_time()
+    for body in bodies:
+        pipeline.submit(decode_json(body), now=now)
+        pipeline.drain()
+    elapsed = time.process_time() - started
+
+    samples = hosts * per_host * requests
+    assert pipeline.stats["written"] == samples, pipeline.get_stats()
+    return {
+        "samples": samples,
+        "seconds": elapsed,
+        "samples_per_second": samples / elapsed,
+        "body_bytes": len(bodies[0])
+    }
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hosts", type=int, default=100, help="hosts per request")
+    parser.add_argument("--per-host", type=int, default=100, help="samples per host per request")
+    parser.add_argument("--requests", type=int, default=50, help="requests per measurement")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    results = {
+        name: bench(make_body, args.hosts, args.per_host, args.requests)
+        for name, make_body in (("columnar", columnar_body), ("rows", rows_body))
+    }
+
+    if args.json:
+        print(json.dumps({"benchmark": "ingest_throughput", "hosts": args.hosts, "per_host": args.per_host,
+                          "requests": args.requests, "results": results}, indent=2))
+        return
+
+    print(f"{args.requests} requests x {args.hosts} hosts x {args.per_host} samples")
+    print(f"{'format':>9} {'samples/s':>12} {'body KB':>9}")
+    for name, row in results.items():
+        print(f"{name:>9} {row['samples_per_second']:>12,.0f} {row['body_bytes'] / 1024:>9.0f}")
+
+if __name__ == "__main__":
+    main_cli()
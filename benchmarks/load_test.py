@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+End-to-end load test of the WebSocket and REST paths.
+
+Starts the app with uvicorn in a subprocess, pointed at a local stub that
+answers like Ollama (tags, pull, generate with a configurable delay), so
+no model is needed. Then, for every tick rate:
+
+  websocket  N concurrent /ws clients per wire format. Broadcast latency
+             is receive time minus the tick timestamp of each metrics
+             frame; messages/s, delivery ratio, server CPU and RSS are
+             measured over the same window
+  rest       GET /api/metrics, /api/health and /api/ai/analyze from C
+             concurrent requesters, requests/s, latency and status codes
+
+Client and server share the machine, so latency includes the client's
+own scheduling; compare runs made on the same host.
+
+Usage: python benchmarks/load_test.py [--clients 10,100] [--tick-rates 1,10]
+           [--formats json,compact] [--duration 10] [--concurrency 20] [--json] [--output FILE]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import websockets
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cloud_monitoring_dashboard", "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+import wire  # noqa: E402
+
+MODEL = "llama3.2:1b"
+REST_ENDPOINTS = ("/api/metrics", "/api/health", "/api/ai/analyze")
+
+# ---- ollama stub ----
+
+class OllamaStubHandler(BaseHTTPRequestHandler):
+    """Just enough of the Ollama API for provisioning, health probes and analyses."""
+
+    delay = 0.2
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/":
+            body = b"Ollama is running"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path == "/api/tags":
+            self._json({"models": [{"name": MODEL}]})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path == "/api/pull":
+            self._json({"status": "success"})
+        elif self.path == "/api/generate":
+            time.sleep(self.delay)
+            text = "Load test analysis: metrics within expected ranges, no action required."
+            if not request.get("stream"):
+                self._json({"model": MODEL, "response": text, "done": True})
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for word in text.split(" ") + [None]:
+                line = json.dumps({"response": word + " ", "done": False} if word else {"response": "", "done": True})
+                data = (line + "\n").encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_error(404)
+
+def start_ollama_stub(delay: float) -> ThreadingHTTPServer:
+    OllamaStubHandler.delay = delay
+    server = ThreadingHTTPServer(("127.0.0.1", 0), OllamaStubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# ---- app under test ----
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class AppProcess:
+    """The dashboard in a uvicorn subprocess, with /proc readings of its CPU and memory."""
+
+    def __init__(self, tick_rate: float, ollama_url: str, data_dir: str):
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        env = {
+            **os.environ,
+            "OLLAMA_URL": ollama_url,
+            "SIMULATION_INTERVAL": str(1.0 / tick_rate),
+            "METRICS_DATA_DIR": data_dir,
+            "MODEL_PROVISION_RETRY": "0.5",
+            #every client keeps up in a load test, frames are never coalesced away
+            "WS_QUEUE_SIZE": os.environ.get("WS_QUEUE_SIZE", "256")
+        }
+        self.log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+             "--port", str(self.port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env, stdout=self.log, stderr=subprocess.STDOUT
+        )
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+
+    def wait_ready(self, timeout: float = 60.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                status = httpx.get(self.base_url + "/api/ai/status", timeout=2.0).json()
+                if status.get("state") == "ready":
+                    return
+            except (httpx.HTTPError, ValueError):
+                pass
+            time.sleep(0.25)
+        self.log.seek(0)
+        raise RuntimeError("app did not become ready:\n" + self.log.read().decode("utf-8", "replace")[-3000:])
+
+    def cpu_seconds(self) -> float:
+        with open(f"/proc/{self.process.pid}/stat") as handle:
+            fields = handle.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / self.clock_ticks
+
+    def rss_mb(self) -> float:
+        with open(f"/proc/{self.process.pid}/status") as handle:
+            for line in handle:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+        return 0.0
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+
+# ---- measurements ----
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {"p50": None, "p90": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 3)
+
+    return {"p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99), "max": round(ordered[-1], 3)}
+
+def tick_time(fmt: str, payload) -> float:
+    """Unix time of the tick a metrics frame belongs to, None for other frames."""
+    if fmt == "packed":
+        return wire.unpack(payload)["ts"] / 1000.0 if isinstance(payload, bytes) else None
+    message = json.loads(payload)
+    if fmt == "json":
+        if message.get("type") != "metrics":
+            return None
+        return datetime.fromisoformat(message["data"]["timestamp"]).timestamp()
+    return message["ts"] / 1000.0 if message.get("t") == "m" else None
+
+class WebSocketLoad:
+    def __init__(self, app: AppProcess, clients: int, fmt: str):
+        self.url = app.base_url.replace("http", "ws", 1) + f"/ws?format={fmt}"
+        self.clients = clients
+        self.fmt = fmt
+        self.measuring = False
+        self.latencies = []
+        self.frames = 0
+        self.bytes = 0
+
+    async def client(self, connected: asyncio.Event, counter: list):
+        async with websockets.connect(self.url, max_size=None, compression=None) as ws:
+            counter[0] += 1
+            if counter[0] == self.clients:
+                connected.set()
+            async for payload in ws:
+                sent = tick_time(self.fmt, payload)
+                if sent is None or not self.measuring:
+                    continue
+                self.latencies.append((time.time() - sent) * 1000)
+                self.frames += 1
+                self.bytes += len(payload)
+
+    async def run(self, app: AppProcess, tick_rate: float, warmup: float, duration: float) -> dict:
+        connected = asyncio.Event()
+        counter = [0]
+        tasks = [asyncio.create_task(self.client(connected, counter)) for _ in range(self.clients)]
+        try:
+            await asyncio.wait_for(connected.wait(), timeout=60)
+            await asyncio.sleep(warmup)
+            cpu, started = app.cpu_seconds(), time.monotonic()
+            self.measuring = True
+            await asyncio.sleep(duration)
+            self.measuring = False
+            elapsed = time.monotonic() - started
+            cpu = app.cpu_seconds() - cpu
+            rss = app.rss_mb()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        expected = self.clients * tick_rate * elapsed
+        return {
+            "clients": self.clients,
+            "tick_rate": tick_rate,
+            "format": self.fmt,
+            "messages_per_second": round(self.frames / elapsed, 1),
+            "delivery_ratio": round(self.frames / expected, 3) if expected else None,
+            "bytes_per_message": round(self.bytes / self.frames, 1) if self.frames else None,
+            "latency_ms": percentiles(self.latencies),
+            "server_cpu_percent": round(cpu / elapsed * 100, 1),
+            "server_rss_mb": round(rss, 1)
+        }
+
+async def rest_load(app: AppProcess, path: str, concurrency: int, duration: float) -> dict:
+    latencies = []
+    statuses = {}
+    deadline = time.monotonic() + duration
+
+    async def worker(client: httpx.AsyncClient):
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                status = (await client.get(path)).status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=app.base_url, timeout=30.0, limits=limits) as client:
+        cpu, started = app.cpu_seconds(), time.monotonic()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.monotonic() - started
+        cpu = app.cpu_seconds() - cpu
+    return {
+        "endpoint": path,
+        "concurrency": concurrency,
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "latency_ms": percentiles(latencies),
+        "status_codes": statuses,
+        "server_cpu_percent": round(cpu / elapsed * 100, 1),
+        "server_rss_mb": round(app.rss_mb(), 1)
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=BACKEND_DIR, timeout=10).stdout.strip() or None
+    except OSError:
+        return None
+
+def int_list(value: str) -> list:
+    return [int(item) for item in value.split(",") if item]
+
+def float_list(value: str) -> list:
+    return [float(item) for item in value.split(",") if item]
+
+async def run_suite(args) -> dict:
+    stub = start_ollama_stub(args.ai_latency)
+    ollama_url = f"http://127.0.0.1:{stub.server_address[1]}"
+    websocket_rows, rest_rows = [], []
+    try:
+        for index, tick_rate in enumerate(args.tick_rates):
+            with tempfile.TemporaryDirectory() as data_dir:
+                app = AppProcess(tick_rate, ollama_url, data_dir)
+                try:
+                    app.wait_ready()
+                    for clients in args.clients:
+                        for fmt in args.formats:
+                            row = await WebSocketLoad(app, clients, fmt).run(app, tick_rate, args.warmup, args.duration)
+                            websocket_rows.append(row)
+                            if not args.json:
+                                print(f"  ws  {tick_rate:>5g}/s {clients:>5} clients {fmt:>8}: "
+                                      f"{row['messages_per_second']:>9,.0f} msg/s  p99 {row['latency_ms']['p99']} ms  "
+                                      f"cpu {row['server_cpu_percent']}%", file=sys.stderr)
+                    #rest numbers do not depend on the tick rate much, measure them once
+                    if index == 0:
+                        for path in REST_ENDPOINTS:
+                            row = await rest_load(app, path, args.concurrency, args.duration)
+                            rest_rows.append(row)
+                            if not args.json:
+                                print(f"  GET {path}: {row['requests_per_second']:,.0f} req/s", file=sys.stderr)
+                finally:
+                    app.stop()
+    finally:
+        stub.shutdown()
+
+    return {
+        "benchmark": "load_test",
+        "timestamp": datetime.now().isoformat(),
+        "commit": git_commit(),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {
+            "clients": args.clients, "tick_rates": args.tick_rates, "formats": args.formats,
+            "duration": args.duration, "warmup": args.warmup, "concurrency": args.concurrency,
+            "ai_latency": args.ai_latency
+        },
+        "websocket": websocket_rows,
+        "rest": rest_rows
+    }
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int_list, default=[10, 100], help="concurrent /ws clients, comma separated")
+    parser.add_argument("--tick-rates", type=float_list, default=[1.0, 10.0], help="simulator ticks per second")
+    parser.add_argument("--formats", type=lambda value: value.split(","), default=["json"],
+                        help=f"wire formats ({', '.join(wire.WIRE_FORMATS)})")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds measured per case")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds before measuring")
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent REST requests")
+    parser.add_argument("--ai-latency", type=float, default=0.2, help="seconds the stub takes per generation")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args()
+    for fmt in args.formats:
+        wire.check_format(fmt)
+
+    results = asyncio.run(run_suite(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'tick/s':>7} {'clients':>8} {'format':>8} {'msg/s':>10} {'delivered':>10} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'cpu %':>6} {'rss MB':>7}")
+    for row in results["websocket"]:
+        latency = row["latency_ms"]
+        print(f"{row['tick_rate']:>7g} {row['clients']:>8} {row['format']:>8} {row['messages_per_second']:>10,.0f} "
+              f"{row['delivery_ratio']:>10.1%} {latency['p50']:>8} {latency['p99']:>8} "
+              f"{row['server_cpu_percent']:>6} {row['server_rss_mb']:>7}")
+    print()
+    print(f"{'endpoint':>18} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'cpu %':>6}  status codes")
+    for row in results["rest"]:
+        latency = row["latency_ms"]
+        print(f"{row['endpoint']:>18} {row['requests_per_second']:>8,.0f} {latency['p50']:>8} {latency['p99']:>8} "
+              f"{row['server_cpu_percent']:>6}  {row['status_codes']}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bytes per client per hour of the /ws metrics stream in each wire format.
+
+An hour of metrics messages is generated with the real simulator random
+walk (one tick every 2 s, an incident every 10 minutes) and encoded the
+way the connection manager does it:
+
+  json     the default format, full JSON object every tick
+  compact  short keys, keyframe + deltas, JSON text
+  msgpack  compact frames as MessagePack (only when it is installed)
+  packed   compact frames with packed float32 metric values
+
+"deflate" is the same stream through permessage-deflate with context
+takeover (zlib raw deflate, sync flush per message), which is what
+browsers negotiate by default. Every compact stream is decoded again and
+checked against the source messages.
+
+Usage: python benchmarks/wire_bytes.py [--hours 1] [--keyframe-interval 30] [--json]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import zlib
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "cloud_monitoring_dashboard", "backend"))
+#keep the benchmark off the on-disk metrics store
+os.environ.setdefault("METRICS_STORE_ENABLED", "false")
+
+import main  # noqa: E402
+import wire  # noqa: E402
+from frames import encode_json  # noqa: E402
+
+def generate_messages(ticks: int, interval: float) -> list:
+    random.seed(7)
+    simulator = main.MetricsSimulator(main.InProcessBroker())
+    started = time.time()
+    incident_ids = list(main.IncidentConfig.INCIDENTS)
+    messages = []
+    for tick in range(ticks):
+        now = started + tick * interval
+        if tick % int(600 / interval) == 300:
+            incident_id = random.choice(incident_ids)
+            incident = main.IncidentConfig.INCIDENTS[incident_id]
+            simulator.active_incidents[incident_id] = {
+                "start_time": now, "duration": random.randint(*incident.duration_range),
+                "severity": incident.severity
+            }
+        for incident_id, info in list(simulator.active_incidents.items()):
+            if now - info["start_time"] > info["duration"]:
+                del simulator.active_incidents[incident_id]
+
+        simulator._update_metrics()
+        metrics = main.Metrics(
+            cpu_usage=round(simulator.current_metrics["cpu_usage"], 1),
+            memory_usage=round(simulator.current_metrics["memory_usage"], 1),
+            api_latency=round(simulator.current_metrics["api_latency"], 1),
+            error_rate=round(simulator.current_metrics["error_rate"], 2),
+            timestamp=datetime.fromtimestamp(now).isoformat(),
+            active_incidents=list(simulator.active_incidents.keys())
+        )
+        messages.append({
+            "type": "metrics",
+            "data": metrics.to_dict(),
+            "incident_count": len(simulator.active_incidents),
+            "system_status": simulator._get_system_status(),
+            "ai_status": "mandatory_active"
+        })
+    return messages
+
+def deflated_size(payloads: list) -> int:
+    #one compressor per connection, the trailing 00 00 ff ff is not sent (rfc 7692)
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    total = 0
+    for payload in payloads:
+        data = payload.encode("utf-8") if isinstance(payload, str) else payload
+        total += len(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+    return total
+
+def decode(fmt: str, payload):
+    if fmt == "packed":
+        return wire.unpack(payload)
+    if fmt == "msgpack":
+        return wire.msgpack.unpackb(payload)
+    return json.loads(payload)
+
+def verify(fmt: str, payloads: list, messages: list):
+    decoder = wire.CompactDecoder()
+    for payload, message in zip(payloads, messages):
+        state = decoder.apply(decode(fmt, payload))
+        expected = wire.compact_fields(message)
+        for key, value in expected.items():
+            if fmt == "packed" and key in wire.PACKED_KEYS:
+                assert abs(state[key] - value) <= abs(value) * 1e-6, (fmt, key, state[key], value)
+            else:
+                assert state[key] == value, (fmt, key, state[key], value)
+
+def bench(fmt: str, messages: list, keyframe_interval: int) -> dict:
+    started = time.process_time()
+    if fmt == "json":
+        payloads = [encode_json(message) for message in messages]
+    else:
+        encoder = wire.StreamEncoder(fmt, keyframe_interval)
+        payloads = [encoder.encode(message).text for message in messages]
+    elapsed = time.process_time() - started
+    if fmt != "json":
+        verify(fmt, payloads, messages)
+    raw = sum(len(payload.encode("utf-8") if isinstance(payload, str) else payload) for payload in payloads)
+    return {"bytes": raw, "deflate_bytes": deflated_size(payloads), "us_per_tick": elapsed / len(messages) * 1e6}
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hours", type=float, default=1.0, help="stream length")
+    parser.add_argument("--interval", type=float, default=2.0, help="seconds between ticks")
+    parser.add_argument("--keyframe-interval", type=int, default=30, help="frames per keyframe")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    ticks = int(args.hours * 3600 / args.interval)
+    messages = generate_messages(ticks, args.interval)
+    formats = [fmt for fmt in wire.WIRE_FORMATS if fmt != "msgpack" or wire.msgpack is not None]
+    results = {}
+    for fmt in formats:
+        row = bench(fmt, messages, args.keyframe_interval)
+        row["bytes_per_hour"] = row["bytes"] / args.hours
+        row["deflate_bytes_per_hour"] = row["deflate_bytes"] / args.hours
+        results[fmt] = row
+
+    if args.json:
+        print(json.dumps({"benchmark": "wire_bytes", "ticks": ticks, "interval": args.interval,
+                          "keyframe_interval": args.keyframe_interval, "results": results}, indent=2))
+        return
+
+    baseline = results["json"]["bytes_per_hour"]
+    print(f"{ticks} ticks every {args.interval:g} s, keyframe every {args.keyframe_interval} frames, per client")
+    print(f"{'format':>8} {'KB/hour':>9} {'vs json':>8} {'deflate KB/h':>13} {'vs json':>8} {'us/tick':>8}")
+    for fmt, row in results.items():
+        print(f"{fmt:>8} {row['bytes_per_hour'] / 1024:>9.1f} {row['bytes_per_hour'] / baseline:>8.0%} "
+              f"{row['deflate_bytes_per_hour'] / 1024:>13.1f} {row['deflate_bytes_per_hour'] / baseline:>8.0%} "
+              f"{row['us_per_tick']:>8.1f}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - Rolling Aggregates
+Author: Zakariae Elbouzidi
+
+Sliding-window count, mean, min, max and p50/p95/p99 per metric, kept up
+to date incrementally so the server computes them once per tick for all
+viewers instead of every dashboard recomputing them from the history.
+
+Each window is a ring of time slots (window / slots seconds wide). A
+sample updates its slot and the window's quantile sketch in O(1); when
+time moves past a slot, the slot is evicted and its sketch counts are
+subtracted from the window's. Reads combine at most `slots` slot
+summaries plus the sketch buckets, so they do not depend on the sample
+rate. The window edge moves in whole slots, so a "1m" window covers
+between 1m - 1 slot and 1m of samples.
+
+Percentiles come from a DDSketch-style log-bucket sketch: every value
+within a factor (1 + accuracy) of a bucket's boundaries shares it, so
+quantiles have a relative error of at most `accuracy` (1% by default)
+whatever the distribution, and the sketch of a slot can be subtracted
+from the window's, which rank-based sketches cannot do.
+"""
+
+import math
+import os
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from history import METRIC_NAMES, METRIC_PRECISION
+
+QUANTILES = (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+
+#values at or below this count as zero, the log buckets cannot hold them
+MIN_POSITIVE = 1e-9
+
+def window_label(seconds: float) -> str:
+    """60 -> "1m", 3600 -> "1h", 45 -> "45s"."""
+    for unit, size in (("h", 3600), ("m", 60)):
+        if seconds >= size and seconds % size == 0:
+            return f"{int(seconds // size)}{unit}"
+    return f"{seconds:g}s"
+
+def parse_windows(value: str) -> List[float]:
+    windows = sorted({float(item) for item in value.split(",") if item.strip()})
+    if not windows or windows[0] <= 0:
+        raise ValueError("Aggregate windows must be positive seconds")
+    return windows
+
+class QuantileSketch:
+    """Log-bucket counts with bounded relative error, mergeable and subtractable."""
+
+    def __init__(self, accuracy: float = 0.01):
+        if not 0.0 < accuracy < 1.0:
+            raise ValueError("Sketch accuracy must be in (0, 1)")
+        self.accuracy = accuracy
+        self.gamma = (1.0 + accuracy) / (1.0 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        #non-positive values, kept apart from the log buckets
+        self.zeros = 0
+        self.negatives: Dict[int, int] = {}
+        self.count = 0
+
+    def key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def bucket_value(self, key: int) -> float:
+        #the midpoint of bucket (gamma^(k-1), gamma^k] in relative terms
+        return 2.0 * self.gamma ** key / (self.gamma + 1.0)
+
+    def _store(self, value: float) -> Tuple[Optional[Dict[int, int]], int]:
+        if value > MIN_POSITIVE:
+            return self.buckets, self.key(value)
+        if value < -MIN_POSITIVE:
+            return self.negatives, self.key(-value)
+        return None, 0
+
+    def add(self, value: float, count: int = 1):
+        store, key = self._store(value)
+        if store is None:
+            self.zeros += count
+        else:
+            store[key] = store.get(key, 0) + count
+        self.count += count
+
+    def merge(self, other: "QuantileSketch", sign: int = 1):
+        """Add (sign=1) or subtract (sign=-1) another sketch with the same accuracy."""
+        for mine, theirs in ((self.buckets, other.buckets), (self.negatives, other.negatives)):
+            for key, count in theirs.items():
+                left = mine.get(key, 0) + sign * count
+                if left:
+                    mine[key] = left
+                else:
+                    del mine[key]
+        self.zeros += sign * other.zeros
+        self.count += sign * other.count
+
+    def quantiles(self, qs: Iterable[float]) -> List[Optional[float]]:
+        """Values at the given ranks (0..1) in one walk over the sorted buckets."""
+        if self.count <= 0:
+            return [None for _ in qs]
+        #ascending order: most negative first, then zeros, then positives
+        ordered = [(-self.bucket_value(key), count) for key, count in sorted(self.negatives.items(), reverse=True)]
+        if self.zeros:
+            ordered.append((0.0, self.zeros))
+        ordered.extend((self.bucket_value(key), count) for key, count in sorted(self.buckets.items()))
+
+        results = []
+        index, seen = 0, ordered[0][1]
+        for q in qs:
+            rank = q * (self.count - 1)
+            while seen <= rank and index < len(ordered) - 1:
+                index += 1
+                seen += ordered[index][1]
+            results.append(ordered[index][0])
+        return results
+
+class _Slot:
+    __slots__ = ("index", "count", "total", "minimum", "maximum", "sketch")
+
+    def __init__(self, index: int, accuracy: float):
+        self.index = index
+        self.count = 0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.sketch = QuantileSketch(accuracy)
+
+class WindowAggregate:
+    """One metric over one sliding time window."""
+
+    def __init__(self, window: float, slots: int = 30, accuracy: float = 0.01):
+        self.window = window
+        self.slot_width = window / slots
+        self.slots = slots
+        self.accuracy = accuracy
+        self._ring: "deque[_Slot]" = deque()
+        self.sketch = QuantileSketch(accuracy)
+
+    def _evict(self, newest_index: int):
+        ring = self._ring
+        while ring and ring[0].index <= newest_index - self.slots:
+            self.sketch.merge(ring.popleft().sketch, sign=-1)
+
+    def add(self, timestamp: float, value: float):
+        index = int(timestamp // self.slot_width)
+        ring = self._ring
+        if ring and index < ring[-1].index:
+            #late sample: its slot is still in the ring or it is too old to matter
+            slot = next((slot for slot in reversed(ring) if slot.index == index), None)
+            if slot is None:
+                if index <= ring[-1].index - self.slots:
+                    return
+                slot = _Slot(index, self.accuracy)
+                position = next(i for i, existing in enumerate(ring) if existing.index > index)
+                ring.insert(position, slot)
+        else:
+            if not ring or ring[-1].index != index:
+                ring.append(_Slot(index, self.accuracy))
+                self._evict(index)
+            slot = ring[-1]
+        slot.count += 1
+        slot.total += value
+        slot.minimum = min(slot.minimum, value)
+        slot.maximum = max(slot.maximum, value)
+        slot.sketch.add(value)
+        self.sketch.add(value)
+
+    def summary(self, now: Optional[float] = None, precision: int = 2) -> dict:
+        if now is not None:
+            self._evict(int(now // self.slot_width))
+        count = sum(slot.count for slot in self._ring)
+        if not count:
+            return {"count": 0, "mean": None, "min": None, "max": None, **{name: None for name, _ in QUANTILES}}
+        summary = {
+            "count": count,
+            "mean": round(sum(slot.total for slot in self._ring) / count, precision),
+            "min": round(min(slot.minimum for slot in self._ring), precision),
+            "max": round(max(slot.maximum for slot in self._ring), precision)
+        }
+        for (name, _), value in zip(QUANTILES, self.sketch.quantiles(q for _, q in QUANTILES)):
+            #a bucket midpoint can fall just outside the observed range
+            summary[name] = round(min(max(value, summary["min"]), summary["max"]), precision)
+        return summary
+
+class RollingAggregates:
+    """WindowAggregate per (window, metric), fed one sample dict at a time."""
+
+    def __init__(self, windows: Sequence[float] = (60.0, 300.0), metric_names: Sequence[str] = METRIC_NAMES,
+                 slots: int = 30, accuracy: float = 0.01):
+        self.windows = {window_label(window): window for window in sorted(windows)}
+        self.metric_names = tuple(metric_names)
+        self.slots = slots
+        self.accuracy = accuracy
+        self._aggregates = {
+            label: {name: WindowAggregate(window, slots, accuracy) for name in self.metric_names}
+            for label, window in self.windows.items()
+        }
+        self.samples = 0
+
+    def add(self, timestamp: float, values: dict):
+        for metrics in self._aggregates.values():
+            for name, aggregate in metrics.items():
+                value = values.get(name)
+                if value is not None:
+                    aggregate.add(timestamp, float(value))
+        self.samples += 1
+
+    def snapshot(self, now: float, windows: Optional[Sequence[str]] = None,
+                 metrics: Optional[Sequence[str]] = None) -> Dict[str, Dict[str, dict]]:
+        """{window label: {metric: summary}}, optionally only some windows or metrics."""
+        labels = self.windows if windows is None else windows
+        return {
+            label: {
+                name: aggregate.summary(now, METRIC_PRECISION.get(name, 2))
+                for name, aggregate in self._aggregates[label].items()
+                if metrics is None or name in metrics
+            }
+            for label in labels
+        }
+
+    def get_stats(self) -> dict:
+        return {
+            "window_seconds": self.windows,
+            "slots": self.slots,
+            "accuracy": self.accuracy,
+            "samples": self.samples
+        }
+
+def create_rolling_aggregates() -> RollingAggregates:
+    return RollingAggregates(
+        windows=parse_windows(os.getenv("AGGREGATE_WINDOWS", "60,300")),
+        slots=int(os.getenv("AGGREGATE_SLOTS", "30")),
+        accuracy=float(os.getenv("AGGREGATE_ACCURACY", "0.01"))
+    )
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - AI Analysis Jobs
+Author: Zakariae Elbouzidi
+
+Background queue for Ollama analyses. Triggering incidents used to
+await a whole generation before answering; now submit() returns a job
+right away and workers run the jobs, the results going out over the
+WebSocket.
+
+Jobs run by priority (lower first), oldest first within a priority.
+Every job has a key naming what it analyses, e.g. the current incident
+set: a newer job with the same key supersedes a queued one, which is
+dropped without running and hands its priority over if it was higher.
+A job that already runs is never superseded.
+
+With batch_size > 1 a worker takes up to batch_size queued jobs at once
+and hands them to the runner together, so several pending analyses can
+share one prompt and one model load instead of queueing behind each
+other.
+"""
+
+import asyncio
+import heapq
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SUPERSEDED = "superseded"
+FINISHED = (DONE, FAILED, SUPERSEDED)
+
+#lower runs first
+PRIORITIES = {"critical": 0, "multi_incident": 1, "incident": 2, "manual": 3}
+
+class AnalysisQueueFull(Exception):
+    """Raised by submit() when max_queued jobs are already waiting."""
+
+    def __init__(self, message: str, queue_depth: int):
+        super().__init__(message)
+        self.queue_depth = queue_depth
+
+class AnalysisJob:
+    """One requested analysis and its outcome."""
+
+    __slots__ = ("id", "key", "kind", "priority", "payload", "status", "seq", "created_at", "started_at",
+                 "finished_at", "result", "error", "superseded_by", "batch")
+
+    def __init__(self, key: Hashable, kind: str, payload: dict, seq: int):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.kind = kind
+        self.priority = PRIORITIES[kind]
+        self.payload = payload
+        self.status = QUEUED
+        self.seq = seq
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.superseded_by: Optional[str] = None
+        #ids of the jobs that ran in the same batch, this one included
+        self.batch: List[str] = []
+
+    def to_dict(self, include_result: bool = True) -> dict:
+        job = {
+            "id": self.id,
+            "kind": self.kind,
+            "priority": self.priority,
+            "status": self.status,
+            "incident_ids": self.payload.get("incident_ids", []),
+            "created_at": self.created_at,
+            "wait_ms": round(((self.started_at or self.finished_at or time.time()) - self.created_at) * 1000, 1)
+        }
+        if self.finished_at is not None and self.started_at is not None:
+            job["run_ms"] = round((self.finished_at - self.started_at) * 1000, 1)
+        if len(self.batch) > 1:
+            job["batch"] = self.batch
+        if self.superseded_by:
+            job["superseded_by"] = self.superseded_by
+        if self.error:
+            job["error"] = self.error
+        if include_result and self.result is not None:
+            job["result"] = self.result
+        return job
+
+#run(jobs) returns one result per job, in order; an exception fails the whole batch
+Runner = Callable[[List[AnalysisJob]], Awaitable[List[dict]]]
+
+class AnalysisQueue:
+    """Priority queue of analysis jobs with supersession, served by worker tasks."""
+
+    def __init__(self, run: Runner, on_update: Optional[Callable[[AnalysisJob], Awaitable[None]]] = None,
+                 workers: int = 1, batch_size: int = 1, max_queued: int = 50, keep_jobs: int = 200):
+        self.run = run
+        self.on_update = on_update
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.max_queued = max_queued
+        self.keep_jobs = keep_jobs
+        #(priority, order, push count, job), the push count keeps entries of equal order apart
+        self._heap: List[Tuple[int, int, int, AnalysisJob]] = []
+        self._queued: Dict[Hashable, AnalysisJob] = {}
+        self._seq = 0
+        self._ready = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        #every job by id, finished ones trimmed to keep_jobs
+        self.jobs: "OrderedDict[str, AnalysisJob]" = OrderedDict()
+        self.running = 0
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "superseded": 0,
+            "rejected": 0,
+            "batches": 0,
+            "batched_jobs": 0,
+            "max_wait_ms": 0.0,
+            "last_run_ms": 0.0
+        }
+
+    def __len__(self) -> int:
+        return len(self._queued)
+
+    async def submit(self, key: Hashable, kind: str, payload: dict) -> AnalysisJob:
+        """Queue a job, superseding a queued job with the same key. Raises AnalysisQueueFull."""
+        previous = self._queued.get(key)
+        if previous is None and len(self._queued) >= self.max_queued:
+            self.stats["rejected"] += 1
+            raise AnalysisQueueFull(f"{len(self._queued)} analyses already queued", len(self._queued))
+        self._seq += 1
+        job = AnalysisJob(key, kind, payload, self._seq)
+        if previous is not None:
+            #the newer snapshot runs instead, not later than the one it replaces would have
+            job.priority = min(job.priority, previous.priority)
+            job.seq = previous.seq
+            self._finish(previous, SUPERSEDED)
+            previous.superseded_by = job.id
+            self.stats["superseded"] += 1
+        self._queued[key] = job
+        self.jobs[job.id] = job
+        heapq.heappush(self._heap, (job.priority, job.seq, self._seq, job))
+        self.stats["submitted"] += 1
+        self._ready.set()
+        if previous is not None:
+            await self._notify(previous)
+        await self._notify(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        return self.jobs.get(job_id)
+
+    def _take(self) -> List[AnalysisJob]:
+        """Pop up to batch_size queued jobs, highest priority first, skipping superseded entries."""
+        jobs = []
+        while self._heap and len(jobs) < self.batch_size:
+            *_, job = heapq.heappop(self._heap)
+            if job.status != QUEUED:
+                continue
+            del self._queued[job.key]
+            jobs.append(job)
+        return jobs
+
+    def _finish(self, job: AnalysisJob, status: str):
+        job.status = status
+        job.finished_at = time.time()
+        finished = [job_id for job_id, other in self.jobs.items() if other.status in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.keep_jobs)]:
+            del self.jobs[job_id]
+
+    async def _notify(self, job: AnalysisJob):
+        if self.on_update is None:
+            return
+        try:
+            await self.on_update(job)
+        except Exception as e:
+            logger.warning(f"AI job update for {job.id} not published: {e}")
+
+    # ---- workers ----
+
+    def start(self):
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    async def _worker(self):
+        while True:
+            jobs = self._take()
+            if not jobs:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            await self._run_batch(jobs)
+
+    async def _run_batch(self, jobs: List[AnalysisJob]):
+        started = time.time()
+        ids = [job.id for job in jobs]
+        for job in jobs:
+            job.status = RUNNING
+            job.started_at = started
+            job.batch = ids
+            self.stats["max_wait_ms"] = max(self.stats["max_wait_ms"], round((started - job.created_at) * 1000, 1))
+            await self._notify(job)
+        if len(jobs) > 1:
+            self.stats["batches"] += 1
+            self.stats["batched_jobs"] += len(jobs)
+
+        self.running += len(jobs)
+        try:
+            results = await self.run(jobs)
+            if len(results) != len(jobs):
+                raise RuntimeError(f"runner returned {len(results)} results for {len(jobs)} jobs")
+            for job, result in zip(jobs, results):
+                job.result = result
+                self._finish(job, DONE)
+            self.stats["completed"] += len(jobs)
+        except asyncio.CancelledError:
+            #stop() while running: the jobs must not stay running forever
+            self._fail(jobs, "cancelled, the queue was stopped")
+            raise
+        except Exception as e:
+            logger.error(f"AI analysis job {', '.join(ids)} failed: {e}")
+            self._fail(jobs, str(e) or type(e).__name__)
+        finally:
+            self.running -= len(jobs)
+        self.stats["last_run_ms"] = round((time.time() - started) * 1000, 1)
+        for job in jobs:
+            await self._notify(job)
+
+    def _fail(self, jobs: List[AnalysisJob], error: str):
+        for job in jobs:
+            job.error = error
+            self._finish(job, FAILED)
+        self.stats["failed"] += len(jobs)
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "queued": len(self._queued),
+            "running": self.running,
+            "workers": self.workers,
+            "batch_size": self.batch_size,
+            "max_queued": self.max_queued
+        }
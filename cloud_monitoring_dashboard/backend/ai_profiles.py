@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - AI Model Profiles
+Author: Zakariae Elbouzidi
+
+Named Ollama settings for analyses: model, context size, prompt and
+answer budgets, temperature, keep-alive and timeout. Analysis kinds are
+routed to a profile, by default quick single-incident and manual
+analyses to "fast" and multi-incident and critical ones to "thorough",
+which gets a larger prompt budget and a longer answer.
+
+Ollama reloads a model whenever num_ctx changes, so the default profiles
+share one context size and differ in how much of it they use; profiles
+on the same model should keep it that way. keep_alive is sent with
+every request, which keeps the model loaded between analyses instead of
+paying the cold load again after Ollama's default 5 minutes.
+
+PromptBuilder fills a profile's prompt budget: required sections always
+go in, optional ones by priority while they fit, and the prompt keeps
+the order the sections were added in. Tokens are estimated at about 4
+characters each, close enough for English mixed with numbers.
+"""
+
+import json
+import math
+import os
+from dataclasses import asdict, dataclass, fields
+from typing import Dict, List, Optional, Tuple
+
+#characters per token for the budget estimate
+CHARS_PER_TOKEN = 4.0
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+@dataclass(frozen=True)
+class ModelProfile:
+    """One named set of Ollama generation settings."""
+    name: str
+    model: str
+    num_ctx: int = 2048
+    #prompt and answer budgets, both have to fit in num_ctx
+    prompt_tokens: int = 256
+    num_predict: int = 128
+    temperature: float = 0.1
+    #duration ("30m") or seconds ("600"), negative keeps the model loaded for good
+    keep_alive: str = "30m"
+    timeout: float = 60.0
+
+    def __post_init__(self):
+        if self.prompt_tokens <= 0 or self.num_predict <= 0:
+            raise ValueError(f"Profile {self.name}: prompt_tokens and num_predict must be positive")
+        if self.prompt_tokens + self.num_predict > self.num_ctx:
+            raise ValueError(f"Profile {self.name}: prompt_tokens + num_predict exceed num_ctx ({self.num_ctx})")
+
+    def options(self, answers: int = 1) -> dict:
+        """Ollama options; answers > 1 leaves room for a batch of answers, capped by the context."""
+        return {
+            "temperature": self.temperature,
+            "num_ctx": self.num_ctx,
+            "num_predict": min(self.num_predict * answers, self.num_ctx - self.prompt_tokens)
+        }
+
+    def request(self, prompt: str, answers: int = 1, **extra) -> dict:
+        """Body of an /api/generate call with this profile."""
+        return {
+            "model": self.model,
+            "prompt": prompt,
+            #ollama takes bare numbers as seconds but not as strings
+            "keep_alive": int(self.keep_alive) if self.keep_alive.lstrip("-").isdigit() else self.keep_alive,
+            "options": self.options(answers),
+            **extra
+        }
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+#settable per profile in AI_PROFILES
+PROFILE_FIELDS = tuple(field.name for field in fields(ModelProfile) if field.name != "name")
+
+class PromptBuilder:
+    """Packs prompt sections into a token budget by priority."""
+
+    def __init__(self, budget: int):
+        self.budget = budget
+        #(priority, text), priority 0 is required, then lower goes in first
+        self._sections: List[Tuple[int, str]] = []
+        self.tokens = 0
+        self.dropped = 0
+
+    def add(self, text: str, priority: int = 0) -> "PromptBuilder":
+        if text:
+            self._sections.append((priority, text.strip()))
+        return self
+
+    def build(self) -> str:
+        order = sorted(range(len(self._sections)), key=lambda index: (self._sections[index][0], index))
+        chosen = set()
+        used = 0
+        for index in order:
+            priority, text = self._sections[index]
+            #one more for the separator
+            cost = estimate_tokens(text) + 1
+            if priority and used + cost > self.budget:
+                continue
+            chosen.add(index)
+            used += cost
+        self.tokens = used
+        self.dropped = len(self._sections) - len(chosen)
+        return " ".join(text for index, (_, text) in enumerate(self._sections) if index in chosen)
+
+DEFAULT_ROUTES = {"critical": "thorough", "multi_incident": "thorough", "incident": "fast", "manual": "fast"}
+
+class ProfileRegistry:
+    """Profiles by name and the profile each analysis kind is routed to."""
+
+    def __init__(self, profiles: List[ModelProfile], routes: Dict[str, str], default: str = "fast"):
+        self.profiles = {profile.name: profile for profile in profiles}
+        missing = {name for name in [default, *routes.values()] if name not in self.profiles}
+        if missing:
+            raise ValueError(f"Unknown AI profiles: {', '.join(sorted(missing))}")
+        self.routes = dict(routes)
+        self.default = self.profiles[default]
+
+    def get(self, name: Optional[str]) -> ModelProfile:
+        """Profile by name, the default for None. Raises ValueError."""
+        if name is None:
+            return self.default
+        profile = self.profiles.get(name)
+        if profile is None:
+            raise ValueError(f"Unknown AI profile: {name} (known: {', '.join(self.profiles)})")
+        return profile
+
+    def route(self, kind: str) -> ModelProfile:
+        return self.profiles[self.routes.get(kind, self.default.name)]
+
+    def models(self) -> List[str]:
+        """Distinct models in use, the default profile's first."""
+        models = [self.default.model]
+        for profile in self.profiles.values():
+            if profile.model not in models:
+                models.append(profile.model)
+        return models
+
+    def warm_profiles(self) -> List[ModelProfile]:
+        """One profile per model to load it with, the default profile for its own model."""
+        chosen = {self.default.model: self.default}
+        for profile in self.profiles.values():
+            chosen.setdefault(profile.model, profile)
+        return list(chosen.values())
+
+    def to_dict(self) -> dict:
+        return {
+            "default": self.default.name,
+            "routes": self.routes,
+            "profiles": {name: profile.to_dict() for name, profile in self.profiles.items()}
+        }
+
+def parse_routes(value: str) -> Dict[str, str]:
+    """critical=thorough,incident=fast -> {"critical": "thorough", "incident": "fast"}"""
+    routes = {}
+    for item in value.split(","):
+        if item.strip():
+            kind, _, profile = item.partition("=")
+            if not profile.strip():
+                raise ValueError(f"AI profile route needs kind=profile: {item.strip()}")
+            routes[kind.strip()] = profile.strip()
+    return routes
+
+def build_profiles(model: str, keep_alive: str, overrides: Optional[dict] = None) -> List[ModelProfile]:
+    """The built-in fast and thorough profiles, with fields and extra profiles from overrides."""
+    specs = {
+        "fast": {"model": model, "num_ctx": 2048, "prompt_tokens": 128, "num_predict": 128,
+                 "temperature": 0.1, "keep_alive": keep_alive, "timeout": 60.0},
+        "thorough": {"model": model, "num_ctx": 2048, "prompt_tokens": 1024, "num_predict": 512,
+                     "temperature": 0.2, "keep_alive": keep_alive, "timeout": 180.0}
+    }
+    for name, override in (overrides or {}).items():
+        if not isinstance(override, dict):
+            raise ValueError(f"AI profile {name} must be an object")
+        unknown = set(override) - set(PROFILE_FIELDS)
+        if unknown:
+            raise ValueError(f"AI profile {name}: unknown fields {', '.join(sorted(unknown))}")
+        spec = {**specs.get(name, specs["fast"]), **override}
+        #keep_alive may be given as a json number
+        spec["keep_alive"] = str(spec["keep_alive"])
+        specs[name] = spec
+    return [ModelProfile(name=name, **spec) for name, spec in specs.items()]
+
+def create_profile_registry() -> ProfileRegistry:
+    overrides = os.getenv("AI_PROFILES", "").strip()
+    return ProfileRegistry(
+        build_profiles(
+            model=os.getenv("OLLAMA_MODEL", "llama3.2:1b"),
+            keep_alive=os.getenv("AI_KEEP_ALIVE", "30m"),
+            overrides=json.loads(overrides) if overrides else None
+        ),
+        routes={**DEFAULT_ROUTES, **parse_routes(os.getenv("AI_PROFILE_ROUTES", ""))},
+        default=os.getenv("AI_DEFAULT_PROFILE", "fast")
+    )
@@ -0,0 +1,620 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - Alert Rules
+Author: Zakariae Elbouzidi
+
+User-defined alert rules loaded from a JSON file:
+
+    {"rules": [
+        {"name": "high_cpu", "expr": "cpu_usage > 85", "for": 30, "severity": "warning"},
+        {"name": "latency_jump", "expr": "rate(api_latency) > 40"},
+        {"name": "saturated", "expr": "cpu_usage > 80 and memory_usage > 85", "for": 10,
+         "host": "*", "severity": "critical"}
+    ]}
+
+expr is a comparison of metrics, rate(metric) (change per second since
+the previous sample) and numbers, combined with + - * /, and, or, not.
+"host" is absent for the simulator's own metrics, "*" for every
+ingesting host, or one host name. "for" is how long the expression has
+to hold before the alert fires (pending until then).
+
+Rules are compiled once into an evaluation plan. A rule that is a
+comparison `term > number` (any of > >= < <=), or an `and` of such
+comparisons, is split into those threshold atoms. Each atom joins the
+threshold group of its scope, term and direction, sorted by threshold:
+the atoms that hold for a value are a prefix of the group, so a new
+sample costs one bisect per group and only the atoms between the old
+and the new boundary flip, however many rules the group has. A rule
+counts its true atoms per host and holds when all of them are. Other
+expressions become one Python function each, indexed by the metrics they
+read, and run for the samples that carry those metrics.
+
+Each (rule, host) goes inactive -> pending -> firing -> resolved. Only
+transitions are reported, so a firing alert is announced once until it
+resolves.
+"""
+
+import ast
+import heapq
+import json
+import logging
+import math
+import os
+import time
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Set, Tuple
+
+from history import METRIC_NAMES
+
+logger = logging.getLogger(__name__)
+
+SEVERITIES = ("info", "warning", "critical")
+ALL_HOSTS = "*"
+FUNCTIONS = ("rate",)
+COMPARISONS = {ast.Gt: ">", ast.GtE: ">=", ast.Lt: "<", ast.LtE: "<="}
+ARITHMETIC = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/"}
+MAX_RULES = 50000
+MAX_EXPRESSION_LENGTH = 500
+DEFAULT_RULES_FILE = os.path.join(os.path.dirname(__file__), "..", "alerts", "rules.json")
+
+#a term is ("value", metric) or ("rate", metric)
+Term = Tuple[str, str]
+#(term, direction, threshold) of one `term op number` comparison
+Atom = Tuple[Term, str, float]
+
+class RuleError(ValueError):
+    """A rule file or rule definition is invalid."""
+
+def compile_source(source: str) -> Callable[[dict], bool]:
+    #only whitelisted nodes reach this point, the namespace has no builtins
+    return eval(f"lambda t: {source}", {"__builtins__": {}, "nan": math.nan})
+
+class AlertRule:
+    """One compiled rule."""
+
+    __slots__ = ("id", "name", "expr", "duration", "severity", "host", "description",
+                 "terms", "source", "atoms", "evaluate")
+
+    def __init__(self, rule_id: int, spec: dict, metric_names: Sequence[str]):
+        if not isinstance(spec, dict):
+            raise RuleError("Each rule must be an object")
+        self.id = rule_id
+        self.name = spec.get("name")
+        if not isinstance(self.name, str) or not self.name:
+            raise RuleError("Each rule needs a name")
+        self.expr = spec.get("expr")
+        if not isinstance(self.expr, str) or not self.expr.strip() or len(self.expr) > MAX_EXPRESSION_LENGTH:
+            raise RuleError(f"Rule {self.name}: expr must be a non-empty string of at most "
+                            f"{MAX_EXPRESSION_LENGTH} characters")
+        try:
+            self.duration = float(spec.get("for", 0))
+        except (TypeError, ValueError):
+            raise RuleError(f"Rule {self.name}: for must be a number of seconds")
+        if not math.isfinite(self.duration) or self.duration < 0:
+            raise RuleError(f"Rule {self.name}: for must be a number of seconds")
+        self.severity = spec.get("severity", "warning")
+        if self.severity not in SEVERITIES:
+            raise RuleError(f"Rule {self.name}: severity must be one of {', '.join(SEVERITIES)}")
+        self.host = spec.get("host")
+        if self.host is not None and (not isinstance(self.host, str) or not self.host):
+            raise RuleError(f"Rule {self.name}: host must be a host name or \"*\"")
+        self.description = str(spec.get("description", ""))
+
+        try:
+            tree = ast.parse(self.expr.strip(), mode="eval").body
+        except SyntaxError as e:
+            raise RuleError(f"Rule {self.name}: cannot parse expr: {e.msg}")
+        self.terms: Set[Term] = set()
+        #python source of the expression over the term dict t
+        self.source = self._compile(tree, metric_names)
+        #threshold comparisons that must all hold, None for other expressions
+        self.atoms = self._as_atoms(tree, metric_names)
+        self.evaluate: Optional[Callable[[dict], bool]] = None
+        if self.atoms is None:
+            self.evaluate = compile_source(self.source)
+
+    @property
+    def metrics(self) -> Set[str]:
+        return {metric for _, metric in self.terms}
+
+    def _term(self, node: ast.AST, metric_names: Sequence[str]) -> Optional[Term]:
+        if isinstance(node, ast.Name):
+            if node.id not in metric_names:
+                raise RuleError(f"Rule {self.name}: unknown metric {node.id}")
+            return ("value", node.id)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS:
+            if len(node.args) != 1 or node.keywords or not isinstance(node.args[0], ast.Name):
+                raise RuleError(f"Rule {self.name}: {node.func.id}() takes one metric name")
+            metric = node.args[0].id
+            if metric not in metric_names:
+                raise RuleError(f"Rule {self.name}: unknown metric {metric}")
+            return (node.func.id, metric)
+        return None
+
+    def _compile(self, node: ast.AST, metric_names: Sequence[str]) -> str:
+        """Python source for node reading terms from the dict t, after checking every node."""
+        term = self._term(node, metric_names)
+        if term is not None:
+            self.terms.add(term)
+            return f"t[{term!r}]"
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            if not math.isfinite(node.value):
+                raise RuleError(f"Rule {self.name}: numbers must be finite")
+            return repr(float(node.value))
+        if isinstance(node, ast.BoolOp):
+            joiner = " and " if isinstance(node.op, ast.And) else " or "
+            return "(" + joiner.join(self._compile(value, metric_names) for value in node.values) + ")"
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub)):
+            operator = "not " if isinstance(node.op, ast.Not) else "-"
+            return f"({operator}{self._compile(node.operand, metric_names)})"
+        if isinstance(node, ast.BinOp) and type(node.op) in ARITHMETIC:
+            left, right = self._compile(node.left, metric_names), self._compile(node.right, metric_names)
+            if isinstance(node.op, ast.Div):
+                #a zero denominator makes the comparison false instead of raising
+                return f"(({left}) / ({right}) if ({right}) else nan)"
+            return f"({left} {ARITHMETIC[type(node.op)]} {right})"
+        if isinstance(node, ast.Compare) and all(type(op) in COMPARISONS for op in node.ops):
+            parts = [self._compile(node.left, metric_names)]
+            for op, comparator in zip(node.ops, node.comparators):
+                parts.append(f"{COMPARISONS[type(op)]} {self._compile(comparator, metric_names)}")
+            return "(" + " ".join(parts) + ")"
+        raise RuleError(f"Rule {self.name}: unsupported {type(node).__name__} in expr")
+
+    def _as_atoms(self, node: ast.AST, metric_names: Sequence[str]) -> Optional[List[Atom]]:
+        """Atoms of `term op number`, `number op term` or an `and` of those, else None."""
+        if isinstance(node, ast.BoolOp) and isinstance(node.op, ast.And):
+            atoms = []
+            for value in node.values:
+                inner = self._as_atoms(value, metric_names)
+                if inner is None:
+                    return None
+                atoms.extend(inner)
+            return atoms
+        if not isinstance(node, ast.Compare) or len(node.ops) != 1:
+            return None
+        op, left, right = type(node.ops[0]), node.left, node.comparators[0]
+        if isinstance(left, ast.Constant):
+            #5 < x is x > 5
+            left, right = right, left
+            op = {ast.Gt: ast.Lt, ast.GtE: ast.LtE, ast.Lt: ast.Gt, ast.LtE: ast.GtE}[op]
+        term = self._term(left, metric_names)
+        if term is None or not isinstance(right, ast.Constant) or isinstance(right.value, bool):
+            return None
+        return [(term, COMPARISONS[op], float(right.value))]
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "expr": self.expr,
+            "for": self.duration,
+            "severity": self.severity,
+            "host": self.host,
+            "description": self.description,
+            "plan": "threshold" if self.atoms is not None else "expression",
+            "metrics": sorted(self.metrics)
+        }
+
+    def signature(self) -> tuple:
+        """Rules with the same signature keep their alert state across a reload."""
+        return (self.name, self.expr.strip(), self.duration, self.host)
+
+class ThresholdGroup:
+    """
+    Atoms `term > c` (or >=) on one scope, sorted by c, with the id of the
+    rule each belongs to. `term < c` atoms are stored negated (-term > -c)
+    so every group reads the same way: the atoms holding for value v are
+    the first bisect(thresholds, v) ones.
+    """
+
+    __slots__ = ("scope", "term", "inclusive", "negated", "thresholds", "rule_ids")
+
+    def __init__(self, scope: Optional[str], term: Term, direction: str, atoms: List[Tuple[float, int]]):
+        self.scope = scope
+        self.term = term
+        self.inclusive = direction in (">=", "<=")
+        self.negated = direction in ("<", "<=")
+        sign = -1.0 if self.negated else 1.0
+        ordered = sorted((sign * threshold, rule_id) for threshold, rule_id in atoms)
+        self.thresholds = [threshold for threshold, _ in ordered]
+        self.rule_ids = [rule_id for _, rule_id in ordered]
+
+    def boundary(self, value: Optional[float]) -> int:
+        """Number of leading atoms that hold for value."""
+        if value is None or value != value:
+            return 0
+        if self.negated:
+            value = -value
+        return bisect_right(self.thresholds, value) if self.inclusive else bisect_left(self.thresholds, value)
+
+class RulePlan:
+    """Compiled rules of one file: threshold groups and indexed expressions per scope."""
+
+    def __init__(self, specs: List[dict], metric_names: Sequence[str] = METRIC_NAMES):
+        if len(specs) > MAX_RULES:
+            raise RuleError(f"At most {MAX_RULES} rules")
+        self.rules: List[AlertRule] = []
+        names = set()
+        for spec in specs:
+            rule = AlertRule(len(self.rules), spec, metric_names)
+            if rule.name in names:
+                raise RuleError(f"Duplicate rule name: {rule.name}")
+            names.add(rule.name)
+            self.rules.append(rule)
+        self.by_name = {rule.name: rule for rule in self.rules}
+
+        grouped: Dict[Tuple[Optional[str], Term, str], List[Tuple[float, int]]] = {}
+        self.expressions: Dict[Optional[str], Dict[str, List[AlertRule]]] = {}
+        for rule in self.rules:
+            if rule.atoms is not None:
+                for term, direction, threshold in rule.atoms:
+                    grouped.setdefault((rule.host, term, direction), []).append((threshold, rule.id))
+            else:
+                index = self.expressions.setdefault(rule.host, {})
+                for metric in rule.metrics:
+                    index.setdefault(metric, []).append(rule)
+        self.groups: Dict[Optional[str], List[ThresholdGroup]] = {}
+        self._affected: Dict[Tuple[Optional[str], frozenset], List[AlertRule]] = {}
+        for (scope, term, direction), atoms in grouped.items():
+            self.groups.setdefault(scope, []).append(ThresholdGroup(scope, term, direction, atoms))
+
+    def affected(self, scope: Optional[str], metrics: frozenset) -> List[AlertRule]:
+        """Expression rules of scope that read any of metrics, once each, memoized per metric set."""
+        key = (scope, metrics)
+        rules = self._affected.get(key)
+        if rules is None:
+            index = self.expressions.get(scope, {})
+            ids = {rule.id for metric in metrics for rule in index.get(metric, ())}
+            rules = self._affected[key] = [self.rules[rule_id] for rule_id in sorted(ids)]
+        return rules
+
+    def scopes(self, host: Optional[str]) -> Tuple[Optional[str], ...]:
+        """Rule scopes that apply to samples of host (None = the simulator)."""
+        return (None,) if host is None else (host, ALL_HOSTS)
+
+def load_rules(path: str, metric_names: Sequence[str] = METRIC_NAMES) -> RulePlan:
+    try:
+        with open(path, encoding="utf-8") as handle:
+            document = json.load(handle)
+    except OSError as e:
+        raise RuleError(f"Cannot read alert rules {path}: {e.strerror}")
+    except json.JSONDecodeError as e:
+        raise RuleError(f"Invalid JSON in {path}: {e}")
+    rules = document.get("rules") if isinstance(document, dict) else None
+    if not isinstance(rules, list):
+        raise RuleError(f"{path} must hold {{\"rules\": [...]}}")
+    return RulePlan(rules, metric_names)
+
+def term_label(term: Term) -> str:
+    kind, metric = term
+    return metric if kind == "value" else f"{kind}({metric})"
+
+class AlertState:
+    __slots__ = ("status", "since", "since_text", "fired_at", "value")
+
+    def __init__(self, status: str, since: float, since_text: str, value: dict):
+        self.status = status
+        self.since = since
+        self.since_text = since_text
+        self.fired_at: Optional[float] = None
+        #the rule's terms when the state last changed
+        self.value = value
+
+class AlertEngine:
+    """Evaluates a RulePlan on every sample and tracks pending/firing alerts per (rule, host)."""
+
+    def __init__(self, path: Optional[str] = None, metric_names: Sequence[str] = METRIC_NAMES):
+        self.path = path
+        self.metric_names = tuple(metric_names)
+        self.plan = RulePlan([], metric_names)
+        self._mtime: Optional[float] = None
+        #host -> rule id -> state, only for pending and firing alerts
+        self.states: Dict[Optional[str], Dict[int, AlertState]] = {}
+        #host -> boundary per threshold group, missing until the host's first sample under this plan
+        self._bounds: Dict[Optional[str], Dict[int, int]] = {}
+        #host -> number of true atoms per rule id
+        self._true_atoms: Dict[Optional[str], List[int]] = {}
+        #host -> (timestamp, values) of its previous sample, for rate()
+        self._previous: Dict[Optional[str], Tuple[float, Dict[str, float]]] = {}
+        #host -> heap of (deadline, rule id, since) for pending rules
+        self._deadlines: Dict[Optional[str], List[Tuple[float, int, float]]] = {}
+        #every event of one sample shares its timestamp, formatted once
+        self._timestamp_text: Tuple[float, str] = (math.nan, "")
+        self.stats = {
+            "samples": 0,
+            "rules_evaluated": 0,
+            "events": 0,
+            "reloads": 0,
+            "reload_errors": 0,
+            "last_error": None,
+            "last_eval_us": 0.0,
+            "max_eval_us": 0.0
+        }
+
+    # ---- loading ----
+
+    def load(self) -> List[dict]:
+        """
+        (Re)load the rule file and return the resolved events of firing alerts
+        whose rule went away. Raises RuleError and keeps the current rules
+        when the file is invalid.
+        """
+        if self.path is None:
+            raise RuleError("No alert rules file configured")
+        try:
+            mtime = os.path.getmtime(self.path)
+            plan = load_rules(self.path, self.metric_names)
+        except (OSError, RuleError) as e:
+            message = str(e) if isinstance(e, RuleError) else f"Cannot read alert rules {self.path}: {e.strerror}"
+            self.stats["reload_errors"] += 1
+            self.stats["last_error"] = message
+            logger.warning(f"Alert rules not loaded: {message}")
+            raise RuleError(message)
+        self._mtime = mtime
+        events = self.replace_plan(plan)
+        self.stats["reloads"] += 1
+        self.stats["last_error"] = None
+        logger.info(f"Loaded {len(plan.rules)} alert rules from {self.path}")
+        return events
+
+    def reload_if_changed(self) -> Optional[List[dict]]:
+        """load() when the file's mtime moved, None when nothing was reloaded."""
+        if self.path is None:
+            return None
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return None
+        if mtime == self._mtime:
+            return None
+        try:
+            return self.load()
+        except RuleError:
+            #remember the broken version so it is reported once, not on every poll
+            self._mtime = mtime
+            return None
+
+    def replace_plan(self, plan: RulePlan, timestamp: Optional[float] = None) -> List[dict]:
+        """
+        Swap the plan. Alerts of rules whose name, expr, for and host did not
+        change keep their state, firing alerts of the other rules resolve.
+        Each host gets one full evaluation on its next sample.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        events = []
+        carried: Dict[Optional[str], Dict[int, AlertState]] = {}
+        for host, states in self.states.items():
+            for rule_id, state in states.items():
+                old = self.plan.rules[rule_id]
+                new = plan.by_name.get(old.name)
+                if new is not None and new.signature() == old.signature():
+                    carried.setdefault(host, {})[new.id] = state
+                elif state.status == "firing":
+                    event = self._event(old, host, state, "resolved", timestamp)
+                    event["alert"]["reason"] = "rule_changed" if new is not None else "rule_removed"
+                    events.append(event)
+        self.plan = plan
+        self.states = carried
+        self._bounds.clear()
+        self._true_atoms.clear()
+        self._deadlines = {
+            host: [(state.since + plan.rules[rule_id].duration, rule_id, state.since)
+                   for rule_id, state in states.items() if state.status == "pending"]
+            for host, states in carried.items()
+        }
+        for heap in self._deadlines.values():
+            heapq.heapify(heap)
+        self.stats["events"] += len(events)
+        return events
+
+    # ---- evaluation ----
+
+    def _terms(self, host: Optional[str], timestamp: float, values: Mapping[str, float]) -> Dict[Term, float]:
+        current = {name: float(values[name]) for name in self.metric_names if values.get(name) is not None}
+        terms: Dict[Term, float] = {("value", name): value for name, value in current.items()}
+        previous = self._previous.get(host)
+        if previous is not None and timestamp > previous[0]:
+            elapsed = timestamp - previous[0]
+            for name, value in current.items():
+                if name in previous[1]:
+                    terms[("rate", name)] = (value - previous[1][name]) / elapsed
+        self._previous[host] = (timestamp, current)
+        return terms
+
+    def evaluate(self, host: Optional[str], timestamp: float, values: Mapping[str, float]) -> List[dict]:
+        """Apply one sample of host (None = the simulator) and return the alert transitions."""
+        started = time.perf_counter()
+        events: List[dict] = []
+        terms = self._terms(host, timestamp, values)
+        plan = self.plan
+        states = self.states.setdefault(host, {})
+        bounds = self._bounds.get(host)
+        if bounds is None:
+            #first sample under this plan: every group starts from no true atom
+            bounds = self._bounds[host] = {}
+            counts = self._true_atoms[host] = [0] * len(plan.rules)
+            #alerts carried over a reload are checked against the new counts
+            changed: Set[int] = set(states)
+        else:
+            counts = self._true_atoms[host]
+            changed = set()
+        evaluated = 0
+        present = frozenset(metric for kind, metric in terms if kind == "value")
+
+        for scope in plan.scopes(host):
+            for group in plan.groups.get(scope, ()):
+                key = id(group)
+                old = bounds.get(key, 0)
+                new = group.boundary(terms.get(group.term))
+                if new == old:
+                    continue
+                bounds[key] = new
+                if new > old:
+                    for rule_id in group.rule_ids[old:new]:
+                        counts[rule_id] += 1
+                        changed.add(rule_id)
+                else:
+                    for rule_id in group.rule_ids[new:old]:
+                        counts[rule_id] -= 1
+                        changed.add(rule_id)
+                evaluated += abs(new - old)
+
+            expressions = plan.affected(scope, present)
+            for rule in expressions:
+                try:
+                    holds = rule.evaluate(terms)
+                except KeyError:
+                    #a term is missing, e.g. rate() on the first sample
+                    holds = False
+                if holds:
+                    self._hold(rule, host, states, timestamp, terms, events)
+                elif rule.id in states:
+                    self._release(rule, host, states, timestamp, terms, events)
+            evaluated += len(expressions)
+
+        #decided after every group moved, so a rule whose atoms flip both ways in one sample does not flap
+        for rule_id in changed:
+            rule = plan.rules[rule_id]
+            if rule.atoms is None:
+                continue
+            if counts[rule_id] == len(rule.atoms):
+                self._hold(rule, host, states, timestamp, terms, events)
+            else:
+                self._release(rule, host, states, timestamp, terms, events)
+
+        self._promote(host, states, timestamp, events)
+        if not states:
+            del self.states[host]
+
+        elapsed = (time.perf_counter() - started) * 1e6
+        self.stats["samples"] += 1
+        self.stats["rules_evaluated"] += evaluated
+        self.stats["events"] += len(events)
+        self.stats["last_eval_us"] = round(elapsed, 1)
+        self.stats["max_eval_us"] = max(self.stats["max_eval_us"], self.stats["last_eval_us"])
+        return events
+
+    def _format(self, timestamp: float) -> str:
+        if timestamp != self._timestamp_text[0]:
+            self._timestamp_text = (timestamp, datetime.fromtimestamp(timestamp).isoformat())
+        return self._timestamp_text[1]
+
+    def _value(self, rule: AlertRule, terms: Mapping[Term, float]) -> dict:
+        return {term_label(term): round(terms[term], 3) for term in sorted(rule.terms) if term in terms}
+
+    def _hold(self, rule: AlertRule, host: Optional[str], states: Dict[int, AlertState],
+              timestamp: float, terms: Mapping[Term, float], events: List[dict]):
+        if rule.id in states:
+            return
+        status = "firing" if rule.duration <= 0 else "pending"
+        state = states[rule.id] = AlertState(status, timestamp, self._format(timestamp), self._value(rule, terms))
+        if status == "firing":
+            state.fired_at = timestamp
+        else:
+            heapq.heappush(self._deadlines.setdefault(host, []), (timestamp + rule.duration, rule.id, timestamp))
+        events.append(self._event(rule, host, state, state.status, timestamp))
+
+    def _release(self, rule: AlertRule, host: Optional[str], states: Dict[int, AlertState],
+                 timestamp: float, terms: Mapping[Term, float], events: List[dict]):
+        state = states.pop(rule.id, None)
+        if state is None:
+            return
+        if state.status == "firing":
+            state.value = self._value(rule, terms)
+            events.append(self._event(rule, host, state, "resolved", timestamp))
+        #a pending alert that stops holding goes back to inactive without an event
+
+    def _promote(self, host: Optional[str], states: Dict[int, AlertState], timestamp: float, events: List[dict]):
+        heap = self._deadlines.get(host)
+        while heap and heap[0][0] <= timestamp:
+            _, rule_id, since = heapq.heappop(heap)
+            state = states.get(rule_id)
+            #stale entry: the alert was released, maybe pending again since
+            if state is None or state.status != "pending" or state.since != since:
+                continue
+            state.status = "firing"
+            state.fired_at = timestamp
+            events.append(self._event(self.plan.rules[rule_id], host, state, "firing", timestamp))
+        if heap is not None and not heap:
+            del self._deadlines[host]
+
+    def _event(self, rule: AlertRule, host: Optional[str], state: AlertState, status: str, timestamp: float) -> dict:
+        alert = {
+            "rule": rule.name,
+            "host": host,
+            "severity": rule.severity,
+            "expr": rule.expr,
+            "description": rule.description,
+            "value": state.value,
+            "since": state.since_text
+        }
+        if status == "resolved" and state.fired_at is not None:
+            alert["firing_for"] = round(timestamp - state.fired_at, 1)
+        return {"status": status, "alert": alert, "timestamp": self._format(timestamp)}
+
+    # ---- followers and reporting ----
+
+    def mirror(self, status: str, alert: dict):
+        """Follow the leader worker's alert events instead of evaluating."""
+        rule = self.plan.by_name.get(alert["rule"])
+        if rule is None:
+            return
+        host = alert["host"]
+        if status == "resolved":
+            states = self.states.get(host, {})
+            states.pop(rule.id, None)
+            if not states:
+                self.states.pop(host, None)
+            return
+        states = self.states.setdefault(host, {})
+        state = states.get(rule.id)
+        if state is None:
+            since = datetime.fromisoformat(alert["since"]).timestamp()
+            state = states[rule.id] = AlertState(status, since, alert["since"], alert["value"])
+        state.status = status
+        state.value = alert["value"]
+
+    def alerts(self, status: Optional[str] = None) -> List[dict]:
+        alerts = []
+        for host, states in self.states.items():
+            for rule_id, state in states.items():
+                if status is not None and state.status != status:
+                    continue
+                rule = self.plan.rules[rule_id]
+                alerts.append({
+                    "rule": rule.name,
+                    "host": host,
+                    "status": state.status,
+                    "severity": rule.severity,
+                    "value": state.value,
+                    "since": state.since_text
+                })
+        return alerts
+
+    def count(self, status: str) -> int:
+        return sum(1 for states in self.states.values() for state in states.values() if state.status == status)
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "path": self.path,
+            "rules": len(self.plan.rules),
+            "threshold_groups": sum(len(groups) for groups in self.plan.groups.values()),
+            "expression_rules": sum(1 for rule in self.plan.rules if rule.atoms is None),
+            "pending": self.count("pending"),
+            "firing": self.count("firing")
+        }
+
+def create_alert_engine() -> Optional[AlertEngine]:
+    """Engine for ALERT_RULES_FILE, None with ALERT_RULES=false."""
+    if os.getenv("ALERT_RULES", "true").lower() != "true":
+        return None
+    engine = AlertEngine(os.getenv("ALERT_RULES_FILE", DEFAULT_RULES_FILE))
+    if os.path.exists(engine.path):
+        try:
+            engine.load()
+        except RuleError:
+            #reported in get_stats(), a fixed file is picked up by the next reload
+            pass
+    return engine
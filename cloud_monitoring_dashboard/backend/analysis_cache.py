@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - AI Analysis Cache
+Author: Zakariae Elbouzidi
+
+TTL + LRU cache in front of Ollama analyses. Two requests with the same
+active incidents and roughly the same CPU/memory (same bucket) get the
+same answer. Identical requests that arrive while a generation is still
+running wait on that generation instead of starting another one.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+CacheKey = Tuple
+
+def analysis_key(incident_ids: Sequence[str], metrics: Dict[str, float], multi_incident: bool,
+                 bucket: float) -> CacheKey:
+    """Sorted incident ids plus CPU and memory rounded down to the bucket width."""
+    return (
+        tuple(sorted(incident_ids)),
+        int(metrics["cpu_usage"] // bucket),
+        int(metrics["memory_usage"] // bucket),
+        multi_incident
+    )
+
+class AnalysisCache:
+    """LRU cache with per-entry TTL and single-flight for concurrent misses."""
+
+    def __init__(self, max_entries: int = 64, ttl: float = 120.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[CacheKey, Tuple[float, dict]]" = OrderedDict()
+        self._in_flight: Dict[CacheKey, asyncio.Task] = {}
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "saved_seconds": 0.0}
+        self._durations: Dict[CacheKey, float] = {}
+
+    def _lookup(self, key: CacheKey) -> Optional[dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            self._durations.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key: CacheKey, value: dict, duration: float):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        self._durations[key] = duration
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._durations.pop(evicted, None)
+            self.stats["evictions"] += 1
+
+    async def get_or_compute(self, key: CacheKey, compute: Callable[[], Awaitable[dict]]) -> Tuple[dict, str]:
+        """
+        Return (result, source) where source is "hit", "miss" or "coalesced".
+        Failures are not cached; coalesced callers see the same exception.
+        """
+        cached = self._lookup(key)
+        if cached is not None:
+            self.stats["hits"] += 1
+            self.stats["saved_seconds"] += self._durations.get(key, 0.0)
+            return cached, "hit"
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            started = time.monotonic()
+            #shield so one caller going away does not cancel the shared generation
+            result = await asyncio.shield(task)
+            self.stats["saved_seconds"] += time.monotonic() - started
+            return result, "coalesced"
+
+        self.stats["misses"] += 1
+        task = asyncio.ensure_future(self._run(key, compute))
+        self._in_flight[key] = task
+        return await asyncio.shield(task), "miss"
+
+    async def _run(self, key: CacheKey, compute: Callable[[], Awaitable[dict]]) -> dict:
+        started = time.monotonic()
+        try:
+            result = await compute()
+            self._store(key, result, time.monotonic() - started)
+            return result
+        finally:
+            self._in_flight.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._durations.clear()
+
+    def get_stats(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "saved_seconds": round(self.stats["saved_seconds"], 1),
+            "hit_ratio": round((self.stats["hits"] + self.stats["coalesced"]) / lookups, 3) if lookups else 0.0,
+            "entries": len(self._entries),
+            "in_flight": len(self._in_flight),
+            "ttl": self.ttl,
+            "max_entries": self.max_entries
+        }
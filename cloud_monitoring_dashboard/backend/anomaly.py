@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - Anomaly Detection
+Author: Zakariae Elbouzidi
+
+Scores the newest sample of every series against its recent window,
+for all metrics of all hosts in one batched numpy pass:
+
+    zscore  distance from the window mean in standard deviations
+    mad     distance from the window median in scaled median absolute
+            deviations, robust to spikes already inside the window
+    ewma    distance from an exponentially weighted mean, in weighted
+            standard deviations, so recent samples count more
+    rate    change per second against the rates seen in the window
+
+Windows are stacked into a (series, window) array padded with NaN for
+young series; there is no Python loop per series, only per host while
+gathering the views. A series turns anomalous when at least min_votes
+methods cross their threshold and recovers when none does, so one
+anomaly gives one start and one end event instead of a stream.
+
+Every scale has a floor of 1% of the series level, otherwise a flat
+series would flag the first decimal that moves.
+
+A host that stops sending samples never scores a recovery, so its open
+anomalies are ended by expire() once the host has been quiet for
+stale_after seconds; the caller owns the timer.
+"""
+
+import os
+import time
+import warnings
+from datetime import datetime
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from history import MetricsHistory, METRIC_NAMES
+
+METHODS = ("zscore", "mad", "ewma", "rate")
+
+#scaled mad estimates the standard deviation of normal data
+MAD_SCALE = 1.4826
+
+AnomalyKey = Tuple[Optional[str], str]
+
+def row_median(values: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    Median of each row ignoring NaN. np.sort puts NaN last, so the valid
+    values of a row come first; several times faster than np.nanmedian,
+    which falls back to masked arrays on short rows.
+    """
+    ordered = np.sort(values, axis=1)
+    rows = np.arange(len(values))
+    return (ordered[rows, np.maximum((counts - 1) // 2, 0)] + ordered[rows, np.maximum(counts // 2, 0)]) / 2
+
+def row_mean_std(values: np.ndarray, valid: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Mean and population standard deviation of each row over its valid cells."""
+    mean = np.where(valid, values, 0.0).sum(axis=1) / counts
+    std = np.sqrt((np.where(valid, values - mean[:, None], 0.0) ** 2).sum(axis=1) / counts)
+    return mean, std
+
+class AnomalyDetector:
+    """Batched rolling statistics with per-series start/end state."""
+
+    def __init__(self, metric_names: Sequence[str] = METRIC_NAMES, window: int = 60, min_samples: int = 20,
+                 alpha: float = 0.1, thresholds: Optional[Dict[str, float]] = None, min_votes: int = 3,
+                 relative_floor: float = 0.01, stale_after: float = 300.0):
+        if window < 3:
+            raise ValueError("Anomaly window needs at least 3 samples")
+        if not 0.0 < alpha <= 1.0:
+            raise ValueError("EWMA alpha must be in (0, 1]")
+        self.metric_names = tuple(metric_names)
+        self.window = window
+        self.min_samples = max(2, min(min_samples, window - 1))
+        self.alpha = alpha
+        self.thresholds = {"zscore": 4.0, "mad": 5.0, "ewma": 4.0, "rate": 5.0, **(thresholds or {})}
+        self.min_votes = max(1, min(min_votes, len(METHODS)))
+        self.relative_floor = relative_floor
+        self.stale_after = stale_after
+        #ewma weight of each baseline column, oldest first
+        self._weights = (1.0 - alpha) ** np.arange(window - 2, -1, -1, dtype=np.float64)
+        self._last_seen: Dict[Optional[str], float] = {}
+        self.active: Dict[AnomalyKey, dict] = {}
+        self.stats = {
+            "passes": 0,
+            "series_scored": 0,
+            "started": 0,
+            "ended": 0,
+            "expired": 0,
+            "last_pass_ms": 0.0,
+            "max_pass_ms": 0.0
+        }
+
+    def collect(self, histories: Mapping[Optional[str], MetricsHistory]):
+        """
+        Stack the window of every history that got a sample since the last
+        pass. Returns (hosts, values (hosts, metrics, window), timestamps
+        (hosts, window)) with NaN where a history is shorter than the window.
+        """
+        fresh = []
+        for host, history in histories.items():
+            if len(history) < 2:
+                continue
+            latest = history.timestamps(1)[0]
+            if latest != self._last_seen.get(host):
+                self._last_seen[host] = latest
+                fresh.append((host, history))
+        for host in [host for host in self._last_seen if host not in histories]:
+            del self._last_seen[host]
+
+        values = np.full((len(fresh), len(self.metric_names), self.window), np.nan)
+        timestamps = np.full((len(fresh), self.window), np.nan)
+        for index, (_, history) in enumerate(fresh):
+            n = min(len(history), self.window)
+            values[index, :, self.window - n:] = history.values(n)
+            timestamps[index, self.window - n:] = history.timestamps(n)
+        return [host for host, _ in fresh], values, timestamps
+
+    def score(self, values: np.ndarray, timestamps: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Score the last column of values (series, window) against the columns
+        before it. timestamps has the same shape. Returns one score array per
+        method plus "eligible", "expected" and "last".
+        """
+        with warnings.catch_warnings():
+            #all-NaN rows of young series are masked by "eligible" below
+            warnings.simplefilter("ignore", RuntimeWarning)
+            base, last = values[:, :-1], values[:, -1]
+            valid = ~np.isnan(base)
+            counts = valid.sum(axis=1)
+            eligible = (counts >= self.min_samples) & ~np.isnan(last) & ~np.isnan(values[:, -2])
+
+            mean, std = row_mean_std(base, valid, counts)
+            floor = self.relative_floor * np.abs(mean) + 1e-9
+            zscore = (last - mean) / np.maximum(std, floor)
+
+            median = row_median(base, counts)
+            mad = row_median(np.abs(base - median[:, None]), counts) * MAD_SCALE
+            robust = (last - median) / np.maximum(mad, floor)
+
+            weights = np.where(valid, self._weights, 0.0)
+            filled = np.where(valid, base, 0.0)
+            total = weights.sum(axis=1)
+            expected = (weights * filled).sum(axis=1) / total
+            variance = (weights * (filled - expected[:, None]) ** 2).sum(axis=1) / total
+            ewma = (last - expected) / np.maximum(np.sqrt(variance), floor)
+
+            steps = np.diff(timestamps, axis=1)
+            rates = np.diff(values, axis=1) / steps
+            past_rates = rates[:, :-1]
+            rates_valid = ~np.isnan(past_rates)
+            rate_mean, rate_std = row_mean_std(past_rates, rates_valid, rates_valid.sum(axis=1))
+            rate_floor = floor / row_median(steps, (~np.isnan(steps)).sum(axis=1))
+            rate = (rates[:, -1] - rate_mean) / np.maximum(rate_std, rate_floor)
+
+        scores = {"zscore": zscore, "mad": robust, "ewma": ewma, "rate": rate}
+        for method in METHODS:
+            scores[method] = np.where(eligible, np.nan_to_num(scores[method], nan=0.0, posinf=0.0, neginf=0.0), 0.0)
+        scores.update(eligible=eligible, expected=expected, last=last)
+        return scores
+
+    def update(self, hosts: Sequence[Optional[str]], values: np.ndarray, timestamps: np.ndarray) -> List[Tuple[str, dict]]:
+        """Score one batch from collect() and return ("start" | "end", anomaly) events."""
+        started = time.perf_counter()
+        metric_count = len(self.metric_names)
+        series = values.reshape(len(hosts) * metric_count, self.window)
+        scores = self.score(series, np.repeat(timestamps, metric_count, axis=0))
+
+        exceeded = np.stack([np.abs(scores[method]) > self.thresholds[method] for method in METHODS])
+        votes = exceeded.sum(axis=0)
+        anomalous = scores["eligible"] & (votes >= self.min_votes)
+
+        #rows of the series already active, found through their host
+        was_active = np.zeros(len(series), dtype=bool)
+        host_rows = {host: index * metric_count for index, host in enumerate(hosts)}
+        metric_rows = {name: index for index, name in enumerate(self.metric_names)}
+        for host, metric in self.active:
+            if host in host_rows:
+                was_active[host_rows[host] + metric_rows[metric]] = True
+
+        events = []
+        for row in np.flatnonzero(anomalous & ~was_active):
+            key = (hosts[row // metric_count], self.metric_names[row % metric_count])
+            timestamp = float(timestamps[row // metric_count, -1])
+            anomaly = self._describe(key, row, scores, exceeded[:, row], timestamp)
+            anomaly["started_at"] = datetime.fromtimestamp(timestamp).isoformat()
+            self.active[key] = {**anomaly, "_started": timestamp}
+            self.stats["started"] += 1
+            events.append(("start", anomaly))
+        for row in np.flatnonzero(was_active & scores["eligible"] & (votes == 0)):
+            key = (hosts[row // metric_count], self.metric_names[row % metric_count])
+            timestamp = float(timestamps[row // metric_count, -1])
+            anomaly = self._describe(key, row, scores, exceeded[:, row], timestamp)
+            begun = self.active.pop(key)
+            anomaly.update(started_at=begun["started_at"], duration=round(timestamp - begun["_started"], 1))
+            self.stats["ended"] += 1
+            events.append(("end", anomaly))
+
+        elapsed = (time.perf_counter() - started) * 1000
+        self.stats["passes"] += 1
+        self.stats["series_scored"] += len(series)
+        self.stats["last_pass_ms"] = round(elapsed, 3)
+        self.stats["max_pass_ms"] = max(self.stats["max_pass_ms"], self.stats["last_pass_ms"])
+        return events
+
+    def _describe(self, key: AnomalyKey, row: int, scores: Dict[str, np.ndarray],
+                  exceeded: np.ndarray, timestamp: float) -> dict:
+        value, expected = float(scores["last"][row]), float(scores["expected"][row])
+        return {
+            "host": key[0],
+            "metric": key[1],
+            "value": round(value, 3),
+            "expected": round(expected, 3),
+            "direction": "up" if value >= expected else "down",
+            "methods": [method for method, hit in zip(METHODS, exceeded) if hit],
+            "scores": {method: round(float(scores[method][row]), 2) for method in METHODS},
+            "timestamp": datetime.fromtimestamp(timestamp).isoformat()
+        }
+
+    def run(self, histories: Mapping[Optional[str], MetricsHistory]) -> List[Tuple[str, dict]]:
+        """collect() then update(), nothing to do when no history moved."""
+        hosts, values, timestamps = self.collect(histories)
+        if not hosts:
+            return []
+        return self.update(hosts, values, timestamps)
+
+    def expire(self, host: Optional[str]) -> List[Tuple[str, dict]]:
+        """End the open anomalies of a host that stopped sending samples, as "end" events."""
+        now = time.time()
+        events = []
+        for key in [key for key in self.active if key[0] == host]:
+            begun = self.active.pop(key)
+            anomaly = {name: value for name, value in begun.items() if not name.startswith("_")}
+            anomaly.update(timestamp=datetime.fromtimestamp(now).isoformat(),
+                           duration=round(now - begun["_started"], 1), stale=True)
+            self.stats["ended"] += 1
+            self.stats["expired"] += 1
+            events.append(("end", anomaly))
+        return events
+
+    def mirror(self, status: str, anomaly: dict):
+        """Follow the leader worker's anomaly events instead of scoring."""
+        key = (anomaly["host"], anomaly["metric"])
+        if status == "start":
+            started = datetime.fromisoformat(anomaly["started_at"]).timestamp()
+            self.active[key] = {**anomaly, "_started": started}
+        else:
+            self.active.pop(key, None)
+
+    def active_anomalies(self) -> List[dict]:
+        return [{name: value for name, value in anomaly.items() if not name.startswith("_")}
+                for anomaly in self.active.values()]
+
+    def has_active(self, host: Optional[str] = None) -> bool:
+        return any(anomaly_host == host for anomaly_host, _ in self.active)
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "active": len(self.active),
+            "window": self.window,
+            "min_samples": self.min_samples,
+            "alpha": self.alpha,
+            "thresholds": self.thresholds,
+            "min_votes": self.min_votes,
+            "stale_after": self.stale_after
+        }
+
+def create_anomaly_detector() -> Optional[AnomalyDetector]:
+    """Detector configured from the environment, None with ANOMALY_DETECTION=false."""
+    if os.getenv("ANOMALY_DETECTION", "true").lower() != "true":
+        return None
+    return AnomalyDetector(
+        window=int(os.getenv("ANOMALY_WINDOW", "60")),
+        min_samples=int(os.getenv("ANOMALY_MIN_SAMPLES", "20")),
+        alpha=float(os.getenv("ANOMALY_EWMA_ALPHA", "0.1")),
+        thresholds={method: float(os.getenv(f"ANOMALY_{method.upper()}_THRESHOLD", default))
+                    for method, default in (("zscore", "4"), ("mad", "5"), ("ewma", "4"), ("rate", "5"))},
+        min_votes=int(os.getenv("ANOMALY_MIN_VOTES", "3")),
+        stale_after=float(os.getenv("ANOMALY_STALE_SECONDS", "300"))
+    )
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - Pub/Sub Broker
+Author: Zakariae Elbouzidi
+
+Decouples the producer of WebSocket frames (simulator, incidents, AI
+insights) from the connection managers that fan them out, so the app can
+run as several uvicorn workers that all show the same world.
+
+Backends (BROKER_BACKEND):
+    inprocess   default, a single process publishing to its own subscribers
+    unix        workers on one host share a Unix domain socket. The worker
+                holding the leader lock (BROKER_SOCKET + ".lock") runs the
+                simulator and publishes every frame to the others; followers
+                fan the frames out to their own clients and forward incident
+                commands to the leader. When the leader exits, a follower
+                takes the lock and is promoted.
+
+Wire format on the socket, one line per message:
+    F<type>\\t<json>   frame, leader -> follower (already encoded, sent as is)
+    C<json>           command {"id", "op", "args"}, follower -> leader
+    R<json>           reply {"id", "result"} or {"id", "error"}, leader -> follower
+
+A ValueError on the leader is raised again as ValueError on the follower,
+exception types registered with register_error() as themselves (with
+the data they carry), anything else as BrokerCommandError. The socket
+is only accessible to the user running the workers.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple, Type, Union
+
+from frames import Frame, encode_json
+
+logger = logging.getLogger(__name__)
+
+#frames and replies can carry long ai insights
+LINE_LIMIT = 16 * 1024 * 1024
+
+Subscriber = Callable[[Frame], Awaitable[None]]
+
+#exception -> json data, and (message, data) -> exception
+ErrorCodec = Tuple[Type[Exception], Callable[[Exception], dict], Callable[[str, dict], Exception]]
+
+class BrokerCommandError(Exception):
+    """Raised when a command cannot reach the leader or failed there."""
+
+class InProcessBroker:
+    """Single-process broker: the publisher and every subscriber share the event loop."""
+
+    backend = "inprocess"
+
+    def __init__(self):
+        self.role = "leader"
+        self._subscribers: List[Subscriber] = []
+        self._handlers: Dict[str, Callable[..., Awaitable]] = {}
+        self._promoted: List[Callable[[], Awaitable[None]]] = []
+        self._errors: Dict[str, ErrorCodec] = {}
+        self.stats = {"published": 0, "received": 0, "commands": 0, "followers_dropped": 0}
+
+    @property
+    def is_leader(self) -> bool:
+        return self.role == "leader"
+
+    def subscribe(self, callback: Subscriber):
+        """Call callback(frame) for every published frame."""
+        self._subscribers.append(callback)
+
+    def handle(self, op: str, handler: Callable[..., Awaitable]):
+        """Register the leader-side handler of a command."""
+        self._handlers[op] = handler
+
+    def register_error(self, error_type: Type[Exception], encode: Callable[[Exception], dict],
+                       decode: Callable[[str, dict], Exception]):
+        """Let a command error reach followers as error_type instead of BrokerCommandError."""
+        self._errors[error_type.__name__] = (error_type, encode, decode)
+
+    def on_promoted(self, callback: Callable[[], Awaitable[None]]):
+        """Call callback() when this worker takes over as leader."""
+        self._promoted.append(callback)
+
+    async def start(self) -> str:
+        return self.role
+
+    async def stop(self):
+        pass
+
+    async def broadcast(self, message: Union[dict, Frame]):
+        """Encode once and publish to every worker."""
+        await self.publish(message if isinstance(message, Frame) else Frame.from_message(message))
+
+    async def publish(self, frame: Frame):
+        self.stats["published"] += 1
+        await self._deliver(frame)
+
+    async def _deliver(self, frame: Frame):
+        for callback in self._subscribers:
+            try:
+                await callback(frame)
+            except Exception as e:
+                logger.error(f"Broker subscriber failed: {e}")
+
+    async def request(self, op: str, args: dict):
+        """Run a command on the leader and return its result."""
+        self.stats["commands"] += 1
+        return await self._dispatch(op, args)
+
+    async def _dispatch(self, op: str, args: dict):
+        handler = self._handlers.get(op)
+        if handler is None:
+            raise BrokerCommandError(f"Unknown broker command: {op}")
+        return await handler(**args)
+
+    def get_stats(self) -> dict:
+        return {"backend": self.backend, "role": self.role, "pid": os.getpid(), **self.stats}
+
+class UnixSocketBroker(InProcessBroker):
+    """Leader/follower broker over a Unix domain socket, no external service needed."""
+
+    backend = "unix"
+
+    def __init__(self, path: str, request_timeout: float = 180.0, max_buffer: int = 4 * 1024 * 1024,
+                 reconnect_interval: float = 1.0):
+        super().__init__()
+        self.role = "starting"
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.request_timeout = request_timeout
+        self.max_buffer = max_buffer
+        self.reconnect_interval = reconnect_interval
+        self._lock_file = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._followers: Set[asyncio.StreamWriter] = set()
+        self._leader: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._stopping = False
+
+    async def start(self) -> str:
+        await self._join()
+        logger.info(f"📡 Broker {self.path}: this worker is the {self.role}")
+        return self.role
+
+    async def _join(self):
+        #lead if nobody holds the lock, otherwise follow; retry while the leader is still binding
+        while not self._stopping:
+            if self._take_lock():
+                await self._serve()
+                return
+            try:
+                await self._follow()
+                return
+            except OSError:
+                await asyncio.sleep(self.reconnect_interval)
+
+    def _take_lock(self) -> bool:
+        import fcntl
+        handle = open(self.lock_path, "a+")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        #the lock is released by the kernel if this process dies
+        self._lock_file = handle
+        return True
+
+    # ---- leader side ----
+
+    async def _serve(self):
+        if os.path.exists(self.path):
+            #left behind by a leader that crashed, we hold the lock now
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._on_follower, path=self.path, limit=LINE_LIMIT)
+        #commands run on the leader, only our own user may connect
+        os.chmod(self.path, 0o600)
+        self.role = "leader"
+
+    async def _on_follower(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._followers.add(writer)
+        logger.info(f"📡 Broker follower joined ({len(self._followers)} connected)")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line[:1] == b"C":
+                    asyncio.create_task(self._run_command(writer, json.loads(line[1:])))
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"Broker follower connection failed: {e}")
+        finally:
+            self._followers.discard(writer)
+            writer.close()
+
+    async def _run_command(self, writer: asyncio.StreamWriter, command: dict):
+        self.stats["commands"] += 1
+        reply = {"id": command["id"]}
+        try:
+            reply["result"] = await self._dispatch(command["op"], command.get("args", {}))
+        except Exception as e:
+            reply["error"] = str(e)
+            registered = self._encode_error(e)
+            if registered is not None:
+                reply["error_type"], reply["error_data"] = registered
+            elif isinstance(e, ValueError):
+                reply["value_error"] = True
+        self._send(writer, b"R" + encode_json(reply).encode("utf-8") + b"\n")
+
+    def _encode_error(self, error: Exception) -> Optional[Tuple[str, dict]]:
+        for name, (error_type, encode, _) in self._errors.items():
+            if isinstance(error, error_type):
+                return name, encode(error)
+        return None
+
+    def _send(self, writer: asyncio.StreamWriter, data: bytes):
+        if writer.transport.get_write_buffer_size() > self.max_buffer:
+            #a follower that stopped reading is cut off, it reconnects and catches up
+            self.stats["followers_dropped"] += 1
+            self._followers.discard(writer)
+            writer.close()
+            return
+        writer.write(data)
+
+    async def publish(self, frame: Frame):
+        if self._followers:
+            line = b"F" + (frame.type or "").encode("utf-8") + b"\t" + frame.text.encode("utf-8") + b"\n"
+            for writer in list(self._followers):
+                self._send(writer, line)
+        await super().publish(frame)
+
+    # ---- follower side ----
+
+    async def _follow(self):
+        reader, writer = await asyncio.open_unix_connection(self.path, limit=LINE_LIMIT)
+        self._leader = writer
+        self.role = "follower"
+        self._reader_task = asyncio.create_task(self._read_leader(reader))
+
+    async def _read_leader(self, reader: asyncio.StreamReader):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                kind = line[:1]
+                if kind == b"F":
+                    frame_type, _, text = line[1:-1].decode("utf-8").partition("\t")
+                    self.stats["received"] += 1
+                    await self._deliver(Frame(frame_type or None, text))
+                elif kind == b"R":
+                    reply = json.loads(line[1:])
+                    future = self._pending.get(reply["id"])
+                    if future is not None and not future.done():
+                        future.set_result(reply)
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"Broker leader connection failed: {e}")
+        finally:
+            self._leader = None
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(BrokerCommandError("Connection to the leader worker was lost"))
+
+        if self._stopping:
+            return
+        logger.warning("📡 Broker leader went away, re-electing...")
+        await asyncio.sleep(self.reconnect_interval)
+        await self._join()
+        if self.is_leader:
+            logger.info("📡 Promoted to broker leader")
+            for callback in self._promoted:
+                await callback()
+
+    async def request(self, op: str, args: dict):
+        if self.is_leader:
+            return await super().request(op, args)
+        if self._leader is None:
+            raise BrokerCommandError("No connection to the leader worker")
+
+        self._next_id += 1
+        command_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[command_id] = future
+        self._leader.write(b"C" + encode_json({"id": command_id, "op": op, "args": args}).encode("utf-8") + b"\n")
+        try:
+            reply = await asyncio.wait_for(future, timeout=self.request_timeout)
+        except asyncio.TimeoutError:
+            raise BrokerCommandError(f"Leader did not answer {op} within {self.request_timeout:.0f}s")
+        finally:
+            self._pending.pop(command_id, None)
+
+        if "error" in reply:
+            codec = self._errors.get(reply.get("error_type"))
+            if codec is not None:
+                raise codec[2](reply["error"], reply.get("error_data") or {})
+            if reply.get("value_error"):
+                raise ValueError(reply["error"])
+            raise BrokerCommandError(reply["error"])
+        return reply["result"]
+
+    async def stop(self):
+        self._stopping = True
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        if self._leader is not None:
+            self._leader.close()
+        for writer in list(self._followers):
+            writer.close()
+        if self._server is not None:
+            self._server.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def get_stats(self) -> dict:
+        return {**super().get_stats(), "socket": self.path, "followers": len(self._followers)}
+
+def create_broker() -> InProcessBroker:
+    backend = os.getenv("BROKER_BACKEND", "inprocess")
+    if backend == "unix":
+        return UnixSocketBroker(
+            os.getenv("BROKER_SOCKET", "/tmp/cloud-monitoring-broker.sock"),
+            request_timeout=float(os.getenv("BROKER_REQUEST_TIMEOUT", "180"))
+        )
+    if backend != "inprocess":
+        raise ValueError(f"Unknown broker backend: {backend}")
+    return InProcessBroker()
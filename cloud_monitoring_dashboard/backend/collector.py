@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - Host Metrics Collector
+Author: Zakariae Elbouzidi
+
+Samples real CPU, memory, disk I/O and network counters from /proc, plus
+CPU and RSS of a configured list of processes (METRICS_SOURCE=host).
+
+Every /proc file is opened once and re-read with seek(0), rates are
+deltas against the previous sample, and nothing spawns a subprocess, so
+one sample costs a few tens of microseconds. Linux only.
+"""
+
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+SECTOR_BYTES = 512
+
+class ProcFile:
+    """A /proc file kept open and re-read from the start on every sample."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._handle = open(path, "rb", buffering=0)
+
+    def read(self) -> bytes:
+        self._handle.seek(0)
+        #proc files report size 0, read in one go with a generous buffer
+        return self._handle.read(65536)
+
+    def close(self):
+        self._handle.close()
+
+def parse_pids(value: str) -> List[int]:
+    """Comma separated PIDs, "self" is this process."""
+    pids = []
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        pids.append(os.getpid() if part == "self" else int(part))
+    return pids
+
+class HostCollector:
+    """Incremental /proc sampler, rates are deltas against the previous sample."""
+
+    def __init__(self, pids: Iterable[int] = (), proc_root: str = "/proc", sys_root: str = "/sys"):
+        self.proc_root = proc_root
+        #disk names come from sysfs, point it at the same host as proc_root
+        self.sys_root = sys_root
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+        self._stat = ProcFile(os.path.join(proc_root, "stat"))
+        self._meminfo = ProcFile(os.path.join(proc_root, "meminfo"))
+        self._diskstats = ProcFile(os.path.join(proc_root, "diskstats"))
+        self._netdev = ProcFile(os.path.join(proc_root, "net", "dev"))
+        self.disks = self._whole_disks()
+        self.pids = list(pids)
+        self._pid_files: Dict[int, Optional[ProcFile]] = {pid: None for pid in self.pids}
+        self.samples = 0
+        self.total_cost = 0.0
+        #baseline read so the first sample already has rates
+        self._previous = self._read_counters()
+
+    def _whole_disks(self) -> Optional[set]:
+        #partitions and loop/ram devices would count the same bytes twice, and so would
+        #device-mapper (lvm, crypt) and md raid devices, which list the disks below them in slaves/
+        try:
+            names = os.listdir(os.path.join(self.sys_root, "block"))
+        except OSError:
+            return None
+        return {name for name in names if not name.startswith(("loop", "ram")) and not self._stacked(name)}
+
+    def _stacked(self, name: str) -> bool:
+        try:
+            return bool(os.listdir(os.path.join(self.sys_root, "block", name, "slaves")))
+        except OSError:
+            return False
+
+    def _read_counters(self) -> dict:
+        counters = {"time": time.monotonic()}
+
+        #aggregate cpu line: user nice system idle iowait irq softirq steal
+        fields = self._stat.read().split(b"\n", 1)[0].split()[1:9]
+        ticks = [int(value) for value in fields]
+        counters["cpu_total"] = sum(ticks)
+        counters["cpu_idle"] = ticks[3] + ticks[4]
+
+        mem_total = mem_available = None
+        for line in self._meminfo.read().split(b"\n"):
+            if line.startswith(b"MemTotal:"):
+                mem_total = int(line.split()[1])
+            elif line.startswith(b"MemAvailable:"):
+                mem_available = int(line.split()[1])
+            if mem_total is not None and mem_available is not None:
+                break
+        counters["mem_total_kb"] = mem_total
+        counters["mem_available_kb"] = mem_available
+
+        read_sectors = write_sectors = 0
+        for line in self._diskstats.read().split(b"\n"):
+            parts = line.split()
+            if len(parts) < 10:
+                continue
+            if self.disks is not None and parts[2].decode() not in self.disks:
+                continue
+            read_sectors += int(parts[5])
+            write_sectors += int(parts[9])
+        counters["disk_read"] = read_sectors * SECTOR_BYTES
+        counters["disk_write"] = write_sectors * SECTOR_BYTES
+
+        rx = tx = 0
+        for line in self._netdev.read().split(b"\n")[2:]:
+            name, _, data = line.partition(b":")
+            if not data or name.strip() == b"lo":
+                continue
+            parts = data.split()
+            rx += int(parts[0])
+            tx += int(parts[8])
+        counters["net_rx"] = rx
+        counters["net_tx"] = tx
+
+        counters["processes"] = {pid: self._read_process(pid) for pid in self.pids}
+        return counters
+
+    def _read_process(self, pid: int) -> Optional[dict]:
+        handle = self._pid_files.get(pid)
+        try:
+            if handle is None:
+                handle = self._pid_files[pid] = ProcFile(os.path.join(self.proc_root, str(pid), "stat"))
+            raw = handle.read()
+        except OSError:
+            raw = b""
+        if not raw:
+            #process exited, reopen on a later sample in case the pid comes back
+            if handle is not None:
+                handle.close()
+                self._pid_files[pid] = None
+            return None
+        #the command name may contain spaces, fields start after the closing paren
+        head, _, rest = raw.rpartition(b")")
+        fields = rest.split()
+        return {
+            "name": head.partition(b"(")[2].decode(errors="replace"),
+            "cpu_ticks": int(fields[11]) + int(fields[12]),
+            "rss": int(fields[21]) * self.page_size
+        }
+
+    def sample(self) -> dict:
+        """Current host metrics, rates are per second since the previous sample."""
+        started = time.perf_counter()
+        current = self._read_counters()
+        previous = self._previous
+        self._previous = current
+
+        result = {
+            "cpu_usage": 0.0,
+            "memory_usage": round(100.0 * (1 - current["mem_available_kb"] / current["mem_total_kb"]), 1),
+            "memory_available_mb": round(current["mem_available_kb"] / 1024, 1),
+            "disk_read_bps": None,
+            "disk_write_bps": None,
+            "net_rx_bps": None,
+            "net_tx_bps": None,
+            "processes": []
+        }
+        elapsed = current["time"] - previous["time"]
+        if elapsed > 0:
+            total = current["cpu_total"] - previous["cpu_total"]
+            idle = current["cpu_idle"] - previous["cpu_idle"]
+            if total > 0:
+                result["cpu_usage"] = round(100.0 * (total - idle) / total, 1)
+            for key, name in (("disk_read", "disk_read_bps"), ("disk_write", "disk_write_bps"),
+                              ("net_rx", "net_rx_bps"), ("net_tx", "net_tx_bps")):
+                result[name] = round(max(0, current[key] - previous[key]) / elapsed, 1)
+
+        for pid, process in current["processes"].items():
+            entry = {"pid": pid, "alive": process is not None}
+            if process is not None:
+                entry["name"] = process["name"]
+                entry["rss_mb"] = round(process["rss"] / (1024 * 1024), 1)
+                before = previous["processes"].get(pid)
+                if before is not None and elapsed > 0:
+                    seconds = (process["cpu_ticks"] - before["cpu_ticks"]) / self.clock_ticks
+                    entry["cpu_percent"] = round(100.0 * seconds / elapsed, 1)
+            result["processes"].append(entry)
+
+        self.samples += 1
+        self.total_cost += time.perf_counter() - started
+        return result
+
+    def get_stats(self) -> dict:
+        return {
+            "samples": self.samples,
+            "avg_cost_us": round(self.total_cost / self.samples * 1e6, 1) if self.samples else None,
+            "pids": self.pids,
+            "disks": sorted(self.disks) if self.disks is not None else None
+        }
+
+    def close(self):
+        for handle in [self._stat, self._meminfo, self._diskstats, self._netdev, *self._pid_files.values()]:
+            if handle is not None:
+                handle.close()
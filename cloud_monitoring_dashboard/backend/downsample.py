@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - Downsampling
+Author: Zakariae Elbouzidi
+
+Server-side reduction of metric series for the history API.
+Bucket aggregations (min/max/avg/last) are vectorized with numpy reduceat;
+lttb keeps the visual shape of a series for charts
+(Largest-Triangle-Three-Buckets, Steinarsson 2013).
+"""
+
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+AGGREGATIONS = ("min", "max", "avg", "last", "lttb")
+
+def bucket_aggregate(timestamps: np.ndarray, values: np.ndarray, start: float, step: float,
+                     agg: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Aggregate samples into fixed-width time buckets.
+    values may be 1-D or (series, samples); empty buckets are left out.
+    Returns bucket start times and aggregated values.
+    """
+    if len(timestamps) == 0:
+        return timestamps[:0], values[..., :0]
+
+    buckets = np.floor((timestamps - start) / step).astype(np.int64)
+    #first sample of every non-empty bucket (timestamps are sorted)
+    starts = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+    bucket_times = start + buckets[starts] * step
+
+    if agg == "min":
+        reduced = np.minimum.reduceat(values, starts, axis=-1)
+    elif agg == "max":
+        reduced = np.maximum.reduceat(values, starts, axis=-1)
+    elif agg == "avg":
+        counts = np.diff(np.append(starts, len(timestamps)))
+        reduced = np.add.reduceat(values, starts, axis=-1) / counts
+    elif agg == "last":
+        ends = np.append(starts[1:], len(timestamps)) - 1
+        reduced = values[..., ends]
+    else:
+        raise ValueError(f"Unknown aggregation: {agg}")
+
+    return bucket_times, reduced
+
+def lttb(timestamps: np.ndarray, values: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets.
+    Always keeps the first and last point.
+    """
+    count = len(timestamps)
+    if threshold >= count:
+        return np.arange(count)
+    if threshold < 3:
+        raise ValueError("lttb needs a threshold of at least 3 points")
+
+    #bucket edges for the points between first and last
+    edges = np.linspace(1, count - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = count - 1
+
+    previous = 0
+    for bucket in range(threshold - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        #average of the next bucket is the third triangle vertex
+        next_lo = hi
+        next_hi = edges[bucket + 2] if bucket + 2 < len(edges) else count
+        avg_x = timestamps[next_lo:next_hi].mean()
+        avg_y = values[next_lo:next_hi].mean()
+
+        prev_x, prev_y = timestamps[previous], values[previous]
+        areas = np.abs(
+            (prev_x - avg_x) * (values[lo:hi] - prev_y)
+            - (prev_x - timestamps[lo:hi]) * (avg_y - prev_y)
+        )
+        previous = lo + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+
+    return selected
+
+def downsample_series(timestamps: np.ndarray, values: np.ndarray, names: Sequence[str],
+                      start: float, end: float, agg: str, max_points: int,
+                      step: Optional[float] = None, precision: Optional[Dict[str, int]] = None) -> dict:
+    """
+    Reduce (series, samples) values over [start, end] to at most max_points
+    per series. step is widened when it would produce more buckets than that.
+    """
+    precision = precision or {}
+    series = {}
+
+    if agg == "lttb":
+        for index, name in enumerate(names):
+            keep = lttb(timestamps, values[index], max_points)
+            series[name] = {
+                "timestamps": np.round(timestamps[keep], 3).tolist(),
+                "values": np.round(values[index][keep], precision.get(name, 2)).tolist()
+            }
+        return {"step": None, "series": series}
+
+    min_step = (end - start) / max(max_points - 1, 1)
+    #an empty range still needs a non-zero bucket width
+    step = max(step or 0.0, min_step) or 1.0
+    bucket_times, reduced = bucket_aggregate(timestamps, values, start, step, agg)
+    bucket_times = np.round(bucket_times, 3).tolist()
+    for index, name in enumerate(names):
+        series[name] = {
+            "timestamps": bucket_times,
+            "values": np.round(reduced[index], precision.get(name, 2)).tolist()
+        }
+    return {"step": step, "series": series}
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - WebSocket Frames
+Author: Zakariae Elbouzidi
+
+Pre-encoded frames shared by the connection manager and the broker.
+A message is serialized once and the same text is queued for every
+subscriber, in this process or in other workers. The same JSON backend
+decodes bulk ingest payloads.
+"""
+
+import json
+from typing import Optional
+
+#optional faster json backend for websocket frames
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def encode_json(message: dict) -> str:
+    """Encode a message to JSON text, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(message).decode("utf-8")
+    return json.dumps(message)
+
+def decode_json(data: bytes):
+    """Decode JSON bytes or text, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+class Frame:
+    """
+    A pre-encoded WebSocket frame.
+    The payload is serialized once and the same text object is queued
+    for every subscriber. Frames built locally keep the source message so
+    subscription projections do not have to decode the text again.
+    """
+    __slots__ = ("type", "text", "message")
+
+    def __init__(self, type: Optional[str], text: str, message: Optional[dict] = None):
+        self.type = type
+        self.text = text
+        self.message = message
+
+    @classmethod
+    def from_message(cls, message: dict) -> "Frame":
+        return cls(message.get("type"), encode_json(message), message)
+
+    def decoded(self) -> dict:
+        return self.message if self.message is not None else decode_json(self.text)
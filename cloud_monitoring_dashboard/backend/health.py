@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - Health Prober
+Author: Zakariae Elbouzidi
+
+Checks Ollama and the simulator on a fixed schedule in the background and
+keeps the last result, so health endpoints answer from memory instead of
+making a live HTTP call to Ollama on every request.
+
+Liveness only says the process and its event loop are responsive.
+Readiness says the dashboard can serve data (simulator ticking); the AI
+status is reported alongside but does not fail readiness unless
+READINESS_REQUIRES_AI is set, so a slow model never gets the dashboard
+restarted by the orchestrator.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+class HealthProber:
+    """Periodic background probe of Ollama and the simulator."""
+
+    def __init__(self, ollama, simulator, models: Sequence[str], interval: float = 10.0,
+                 probe_timeout: float = 5.0, requires_ai: bool = False):
+        self.ollama = ollama
+        self.simulator = simulator
+        self.models = list(models)
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self.requires_ai = requires_ai
+        self._task: Optional[asyncio.Task] = None
+        self.ollama_state = {
+            "ollama_status": "unknown",
+            "model_available": False,
+            "latency_ms": None,
+            "error": None,
+            "checked_at": None
+        }
+        self._checked_monotonic: Optional[float] = None
+        self.probes = 0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self.probe_now()
+            await asyncio.sleep(self.interval)
+
+    async def probe_now(self):
+        """Run one Ollama probe and store the result."""
+        started = time.perf_counter()
+        state = {"ollama_status": "critical_error", "model_available": False, "error": None}
+        try:
+            response = await self.ollama.get("/api/tags", timeout=self.probe_timeout)
+            if response.status_code == 200:
+                state["ollama_status"] = "operational"
+                models = [model.get("name", "") for model in response.json().get("models", [])]
+                #every profile's model, a missing one would fail the analyses routed to it
+                state["model_available"] = all(any(model in name for name in models) for model in self.models)
+            else:
+                state["ollama_status"] = "error"
+                state["error"] = f"status {response.status_code}"
+        except Exception as e:
+            state["error"] = str(e) or type(e).__name__
+
+        state["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        state["checked_at"] = datetime.now().isoformat()
+        self.ollama_state = state
+        self._checked_monotonic = time.monotonic()
+        self.probes += 1
+
+    @property
+    def age(self) -> Optional[float]:
+        """Seconds since the last completed probe."""
+        if self._checked_monotonic is None:
+            return None
+        return time.monotonic() - self._checked_monotonic
+
+    def simulator_state(self) -> dict:
+        last_tick = getattr(self.simulator, "last_tick_at", None)
+        tick_age = None if last_tick is None else time.monotonic() - last_tick
+        #a tick older than a few intervals means the loop is stuck
+        interval = getattr(self.simulator, "tick_interval", self.simulator.update_interval)
+        stalled = tick_age is not None and tick_age > max(5 * interval, 10)
+        return {
+            #follower workers count as running while they mirror the leader
+            "simulator_running": self.simulator.is_running or self.simulator.mirroring,
+            "last_tick_age": None if tick_age is None else round(tick_age, 2),
+            "simulator_stalled": stalled
+        }
+
+    def snapshot(self) -> dict:
+        """Last probe result plus its age, no I/O."""
+        age = self.age
+        return {
+            **self.ollama_state,
+            "probe_age_seconds": None if age is None else round(age, 2),
+            "probe_stale": age is None or age > 3 * self.interval,
+            **self.simulator_state()
+        }
+
+    def readiness(self) -> dict:
+        simulator = self.simulator_state()
+        ai_ready = self.ollama_state["ollama_status"] == "operational" and self.ollama_state["model_available"]
+        ready = simulator["simulator_running"] and not simulator["simulator_stalled"]
+        if self.requires_ai:
+            ready = ready and ai_ready
+        return {"ready": ready, "ai_ready": ai_ready, "requires_ai": self.requires_ai, **simulator}
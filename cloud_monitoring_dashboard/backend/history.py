@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - Metrics History
+Author: Zakariae Elbouzidi
+
+Fixed-capacity, column-oriented ring buffer for metric samples.
+Each metric plus the timestamp is one row of a numpy array, so appends
+are O(1) and reads are slices without copying.
+
+The buffer is mirrored: every sample is written at slot i and at slot
+i + capacity. Any window of the most recent samples (up to the full
+capacity) is then a contiguous range, which keeps every read a plain
+numpy view even after the buffer has wrapped.
+
+Memory per sample (measured with benchmarks/history_memory.py, 64-bit CPython 3.11):
+    list of Metrics.to_dict() dicts   ~510 bytes, append O(n) with pop(0)
+    MetricsHistory                      88 bytes (2 x (5 float64 + 1 uint32)), append O(1)
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+#column order of the value rows, timestamp is row 0
+METRIC_NAMES = ("cpu_usage", "memory_usage", "api_latency", "error_rate")
+
+#rounding applied when samples are turned back into dicts
+METRIC_PRECISION = {"cpu_usage": 1, "memory_usage": 1, "api_latency": 1, "error_rate": 2}
+
+class MetricsHistory:
+    """
+    Ring buffer of metric samples with a timestamp column and an
+    active-incident bitmask column.
+    """
+
+    def __init__(self, capacity: int, incident_ids: Sequence[str] = (),
+                 metric_names: Sequence[str] = METRIC_NAMES):
+        if capacity <= 0:
+            raise ValueError("History capacity must be positive")
+        if len(incident_ids) > 32:
+            raise ValueError("At most 32 incident types fit in the incident bitmask")
+
+        self.capacity = capacity
+        self.metric_names = tuple(metric_names)
+        self.incident_ids = list(incident_ids)
+        self._incident_bits = {iid: 1 << index for index, iid in enumerate(self.incident_ids)}
+        self._rows = {name: index + 1 for index, name in enumerate(self.metric_names)}
+
+        #row 0 = unix timestamp, rows 1.. = metrics
+        self._data = np.zeros((len(self.metric_names) + 1, 2 * capacity), dtype=np.float64)
+        self._incidents = np.zeros(2 * capacity, dtype=np.uint32)
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes + self._incidents.nbytes
+
+    @property
+    def bytes_per_sample(self) -> float:
+        return self.nbytes / self.capacity
+
+    def append(self, timestamp: float, values: Dict[str, float], incidents: Sequence[str] = ()) -> int:
+        """Store one sample, overwriting the oldest one once full. Returns the incident mask."""
+        slot = self._next
+        mirror = slot + self.capacity
+
+        column = [timestamp]
+        column.extend(values[name] for name in self.metric_names)
+        self._data[:, slot] = column
+        self._data[:, mirror] = column
+        mask = self.encode_incidents(incidents)
+        self._incidents[slot] = self._incidents[mirror] = mask
+
+        self._next = (slot + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+        return mask
+
+    def extend(self, timestamps: np.ndarray, values: np.ndarray, masks: np.ndarray):
+        """Bulk append of (n,) timestamps, (metrics, n) values and (n,) incident masks."""
+        count = len(timestamps)
+        if count > self.capacity:
+            timestamps, values, masks = timestamps[-self.capacity:], values[:, -self.capacity:], masks[-self.capacity:]
+            count = self.capacity
+        if not count:
+            return
+
+        slots = (self._next + np.arange(count)) % self.capacity
+        for target in (slots, slots + self.capacity):
+            self._data[0, target] = timestamps
+            self._data[1:, target] = values
+            self._incidents[target] = masks
+
+        self._next = (self._next + count) % self.capacity
+        self._count = min(self.capacity, self._count + count)
+
+    def encode_incidents(self, incidents: Sequence[str]) -> int:
+        mask = 0
+        for incident_id in incidents:
+            mask |= self._incident_bits.get(incident_id, 0)
+        return mask
+
+    def decode_incidents(self, mask: int) -> List[str]:
+        return [iid for iid, bit in self._incident_bits.items() if mask & bit]
+
+    def _window(self, n: Optional[int] = None) -> slice:
+        """Slice covering the last n samples, oldest first."""
+        n = self._count if n is None else max(0, min(n, self._count))
+        end = self._next + self.capacity if self._count == self.capacity else self._next
+        return slice(end - n, end)
+
+    def timestamps(self, n: Optional[int] = None) -> np.ndarray:
+        """View of the last n timestamps, oldest first."""
+        return self._data[0, self._window(n)]
+
+    def series(self, name: str, n: Optional[int] = None) -> np.ndarray:
+        """View of the last n values of one metric, oldest first."""
+        return self._data[self._rows[name], self._window(n)]
+
+    def values(self, n: Optional[int] = None) -> np.ndarray:
+        """View of the last n samples of every metric, shape (metrics, n)."""
+        return self._data[1:, self._window(n)]
+
+    def incident_masks(self, n: Optional[int] = None) -> np.ndarray:
+        return self._incidents[self._window(n)]
+
+    def oldest_timestamp(self) -> Optional[float]:
+        if not self._count:
+            return None
+        return float(self._data[0, self._window().start])
+
+    def range_slice(self, start: Optional[float] = None, end: Optional[float] = None) -> slice:
+        """Window positions whose timestamps fall in [start, end]."""
+        window = self._window()
+        stamps = self._data[0, window]
+        lo = 0 if start is None else int(np.searchsorted(stamps, start, side="left"))
+        hi = len(stamps) if end is None else int(np.searchsorted(stamps, end, side="right"))
+        return slice(window.start + lo, window.start + max(lo, hi))
+
+    def range(self, start: Optional[float] = None, end: Optional[float] = None):
+        """Timestamp and (metrics, n) value views for samples in [start, end]."""
+        window = self.range_slice(start, end)
+        return self._data[0, window], self._data[1:, window]
+
+    def latest(self) -> Optional[dict]:
+        """Most recent sample in the Metrics.to_dict() layout."""
+        if not self._count:
+            return None
+        slot = (self._next - 1) % self.capacity
+        return self._sample(slot)
+
+    def last_samples(self, n: int) -> List[dict]:
+        window = self._window(n)
+        return [self._sample(slot) for slot in range(window.start, window.stop)]
+
+    def _sample(self, slot: int) -> dict:
+        sample = {
+            name: round(float(self._data[row, slot]), METRIC_PRECISION.get(name, 2))
+            for name, row in self._rows.items()
+        }
+        sample["timestamp"] = datetime.fromtimestamp(float(self._data[0, slot])).isoformat()
+        sample["active_incidents"] = self.decode_incidents(int(self._incidents[slot]))
+        return sample
+
+    def summary(self, seconds: float, now: float) -> Dict[str, dict]:
+        """Mean and peak of every metric over the trailing time window."""
+        window = self.range_slice(now - seconds, None)
+        if window.stop <= window.start:
+            return {}
+        block = self._data[1:, window]
+        means = block.mean(axis=1)
+        peaks = block.max(axis=1)
+        return {
+            name: {"avg": float(means[index]), "max": float(peaks[index])}
+            for index, name in enumerate(self.metric_names)
+        }
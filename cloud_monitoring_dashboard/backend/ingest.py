@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - Multi-host Ingestion
+Author: Zakariae Elbouzidi
+
+Accepts batches of metric samples pushed by other hosts and keeps one
+MetricsHistory ring buffer per host.
+
+Two payload shapes are accepted, in the same request if needed:
+
+    {"batches": [{"host": "web-1", "timestamps": [...],
+                  "cpu_usage": [...], "memory_usage": [...],
+                  "api_latency": [...], "error_rate": [...]}]}
+
+    {"samples": [{"host": "web-1", "timestamp": 1700000000.0,
+                  "cpu_usage": 12.5, "memory_usage": 40.1,
+                  "api_latency": 120.0, "error_rate": 0.4}, ...]}
+
+Columns become numpy arrays and are validated in bulk (finite, in range,
+inside the accepted time window); no per-sample objects are built. Valid
+samples go to a bounded pending queue drained by a writer task. When the
+queue fills up submit() raises IngestBackpressure, and above the high
+watermark every answer carries "backpressure": true so clients slow down
+before they get rejected. After each write the writer reports what it
+wrote to on_written, per host the (timestamps, values) slices in time
+order, which evaluates them for alerts and publishes them to subscribed
+clients.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from history import MetricsHistory, METRIC_NAMES
+
+logger = logging.getLogger(__name__)
+
+#accepted value range per metric, samples outside are rejected
+METRIC_BOUNDS = {
+    "cpu_usage": (0.0, 100.0),
+    "memory_usage": (0.0, 100.0),
+    "api_latency": (0.0, 600000.0),
+    "error_rate": (0.0, 100.0)
+}
+
+#errors listed back to the client per request
+MAX_REPORTED_ERRORS = 10
+
+#json numbers by exact type: bools and numeric strings are rejected, not coerced
+NUMBER_TYPES = frozenset((int, float))
+
+class IngestError(ValueError):
+    """The payload is malformed as a whole."""
+
+class IngestBackpressure(Exception):
+    """The pending queue is full; retry after the writer caught up."""
+
+    def __init__(self, message: str, pending: int, retry_after: float):
+        super().__init__(message)
+        self.pending = pending
+        self.retry_after = retry_after
+
+Batch = Tuple[str, np.ndarray, np.ndarray]
+#host -> (timestamps, values) slices in time order, what on_written gets
+Written = Dict[str, List[Tuple[np.ndarray, np.ndarray]]]
+
+class IngestPipeline:
+    """Bulk validation, bounded pending queue and per-host ring buffers."""
+
+    def __init__(self, metric_names: Sequence[str] = METRIC_NAMES, capacity_per_host: int = 1800,
+                 max_hosts: int = 500, max_pending: int = 500000, max_batch: int = 100000,
+                 max_age: float = 86400.0, max_skew: float = 300.0, high_watermark: float = 0.75,
+                 on_written: Optional[Callable[[Written], Awaitable[None]]] = None):
+        self.metric_names = tuple(metric_names)
+        self.on_written = on_written
+        #slices written since the last on_written call
+        self._written: Written = {}
+        self.capacity_per_host = capacity_per_host
+        self.max_hosts = max_hosts
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+        self.max_age = max_age
+        self.max_skew = max_skew
+        self.high_mark = int(max_pending * high_watermark)
+        self.low_mark = self.high_mark // 2
+        self.bounds = np.array([METRIC_BOUNDS.get(name, (-np.inf, np.inf)) for name in self.metric_names])
+        self.hosts: Dict[str, MetricsHistory] = {}
+        self._queue: "deque[Tuple[float, Batch]]" = deque()
+        self.pending = 0
+        self._has_data = asyncio.Event()
+        self._has_capacity = asyncio.Event()
+        self._has_capacity.set()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "requests": 0, "accepted": 0, "rejected": 0, "written": 0,
+            "out_of_order": 0, "rejected_hosts": 0, "backpressure_rejections": 0
+        }
+
+    # ---- parsing and validation ----
+
+    def _column(self, batch: dict, host: str, name: str) -> np.ndarray:
+        column = batch.get(name)
+        if not isinstance(column, list):
+            raise IngestError(f"batch for {host} needs {name} as a list")
+        #no dtype: strings, nulls and nested lists keep a non-numeric dtype instead of being converted
+        array = np.array(column)
+        if array.ndim != 1 or (len(array) and array.dtype.kind not in "iuf"):
+            raise IngestError(f"batch for {host} has non-numeric values in {name}")
+        return array.astype(np.float64)
+
+    def _column_batch(self, batch: dict) -> Batch:
+        if not isinstance(batch, dict):
+            raise IngestError("every batch must be an object")
+        host = batch.get("host")
+        if not isinstance(host, str) or not host:
+            raise IngestError("every batch needs a host")
+        timestamps = self._column(batch, host, "timestamps")
+        columns = [self._column(batch, host, name) for name in self.metric_names]
+        if any(len(column) != len(timestamps) for column in columns):
+            raise IngestError(f"batch for {host} has columns of different lengths")
+        values = np.array(columns, dtype=np.float64).reshape(len(columns), len(timestamps))
+        return host, timestamps, values
+
+    def _row_batches(self, samples: list, errors: List[str]) -> Tuple[List[Batch], int]:
+        #one pass to group rows per host, then each host is one columnar batch
+        names = self.metric_names
+        grouped: Dict[str, list] = {}
+        invalid = 0
+        for row in samples:
+            try:
+                host = row["host"]
+                values = (row["timestamp"], *[row[name] for name in names])
+            except (KeyError, TypeError):
+                host, values = None, None
+            if values is not None and type(host) is str and host and NUMBER_TYPES.issuperset(map(type, values)):
+                grouped.setdefault(host, []).append(values)
+                continue
+            invalid += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append(self._row_error(row))
+        batches = []
+        for host, rows in grouped.items():
+            table = np.array(rows, dtype=np.float64)
+            batches.append((host, table[:, 0], table[:, 1:].T))
+        return batches, invalid
+
+    def _row_error(self, row) -> str:
+        if not isinstance(row, dict):
+            return "sample must be an object"
+        host = row.get("host")
+        if not isinstance(host, str) or not host:
+            return "sample needs a host"
+        missing = [name for name in ("timestamp", *self.metric_names) if name not in row]
+        if missing:
+            return f"sample for {host} missing {', '.join(missing)}"
+        return f"sample for {host} has non-numeric values"
+
+    def _valid_mask(self, timestamps: np.ndarray, values: np.ndarray, now: float) -> np.ndarray:
+        mask = np.isfinite(timestamps) & np.isfinite(values).all(axis=0)
+        mask &= (timestamps >= now - self.max_age) & (timestamps <= now + self.max_skew)
+        mask &= ((values >= self.bounds[:, :1]) & (values <= self.bounds[:, 1:])).all(axis=0)
+        return mask
+
+    def submit(self, payload: dict, now: Optional[float] = None) -> dict:
+        """Validate a payload and queue its valid samples."""
+        if not isinstance(payload, dict):
+            raise IngestError("payload must be a JSON object")
+        now = time.time() if now is None else now
+        errors: List[str] = []
+
+        batches = payload.get("batches") or []
+        samples = payload.get("samples") or []
+        if not isinstance(batches, list):
+            raise IngestError("batches must be a list")
+        if not isinstance(samples, list):
+            raise IngestError("samples must be a list")
+
+        batches = [self._column_batch(batch) for batch in batches]
+        rejected = 0
+        if samples:
+            row_batches, rejected = self._row_batches(samples, errors)
+            batches.extend(row_batches)
+        total = sum(len(timestamps) for _, timestamps, _ in batches) + rejected
+        if not total:
+            raise IngestError("payload has no samples (use batches or samples)")
+        if total > self.max_batch:
+            raise IngestError(f"at most {self.max_batch} samples per request, got {total}")
+
+        self.stats["requests"] += 1
+        if self.pending + total > self.max_pending:
+            self.stats["backpressure_rejections"] += 1
+            raise IngestBackpressure(
+                f"ingest queue is full ({self.pending} samples pending)",
+                pending=self.pending, retry_after=1.0
+            )
+
+        accepted = 0
+        for host, timestamps, values in batches:
+            mask = self._valid_mask(timestamps, values, now)
+            valid = int(mask.sum())
+            if valid < len(timestamps):
+                rejected += len(timestamps) - valid
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append(f"{len(timestamps) - valid} samples for {host} out of range or not finite")
+                timestamps, values = timestamps[mask], values[:, mask]
+            if not valid:
+                continue
+            if valid > 1 and np.any(np.diff(timestamps) < 0):
+                order = np.argsort(timestamps, kind="stable")
+                timestamps, values = timestamps[order], values[:, order]
+            self._queue.append((time.monotonic(), (host, timestamps, values)))
+            self.pending += valid
+            accepted += valid
+
+        self.stats["accepted"] += accepted
+        self.stats["rejected"] += rejected
+        if accepted:
+            self._has_data.set()
+        if self.pending >= self.high_mark:
+            self._has_capacity.clear()
+        return {
+            "accepted": accepted,
+            "rejected": rejected,
+            "errors": errors,
+            "pending": self.pending,
+            "backpressure": self.pending >= self.high_mark
+        }
+
+    # ---- writer ----
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self._has_data.wait()
+            self._has_data.clear()
+            while self._queue:
+                #yield between chunks so request handlers keep running under load
+                self.drain(limit=50000)
+                if self.on_written and self._written:
+                    written, self._written = self._written, {}
+                    try:
+                        await self.on_written(written)
+                    except Exception as e:
+                        logger.warning(f"Ingest update publish failed: {e}")
+                await asyncio.sleep(0)
+
+    def drain(self, limit: Optional[int] = None) -> int:
+        """Write queued batches to the host series, returns samples written."""
+        written = 0
+        while self._queue and (limit is None or written < limit):
+            _, (host, timestamps, values) = self._queue.popleft()
+            self.pending -= len(timestamps)
+            written += self._write(host, timestamps, values)
+        if self.pending <= self.low_mark:
+            self._has_capacity.set()
+        return written
+
+    def _write(self, host: str, timestamps: np.ndarray, values: np.ndarray) -> int:
+        series = self.hosts.get(host)
+        if series is None:
+            if len(self.hosts) >= self.max_hosts:
+                self.stats["rejected_hosts"] += len(timestamps)
+                return 0
+            series = self.hosts[host] = MetricsHistory(self.capacity_per_host, metric_names=self.metric_names)
+        if len(series):
+            #ring buffers only grow forward in time
+            keep = timestamps > series.timestamps(1)[0]
+            if not keep.all():
+                self.stats["out_of_order"] += int((~keep).sum())
+                timestamps, values = timestamps[keep], values[:, keep]
+        series.extend(timestamps, values, np.zeros(len(timestamps), dtype=np.uint32))
+        self.stats["written"] += len(timestamps)
+        if self.on_written and len(timestamps):
+            self._written.setdefault(host, []).append((timestamps, values))
+        return len(timestamps)
+
+    async def wait_for_capacity(self):
+        """Wait until the writer brought the queue back under the low watermark."""
+        await self._has_capacity.wait()
+
+    @property
+    def lag_seconds(self) -> float:
+        """Age of the oldest batch still waiting for the writer."""
+        return time.monotonic() - self._queue[0][0] if self._queue else 0.0
+
+    def host_summaries(self) -> List[dict]:
+        return [
+            {"host": host, "samples": len(series), "latest": series.latest()}
+            for host, series in sorted(self.hosts.items())
+        ]
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "hosts": len(self.hosts),
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "high_watermark": self.high_mark,
+            "lag_seconds": round(self.lag_seconds, 3),
+            "bytes": sum(series.nbytes for series in self.hosts.values())
+        }
@@ -14,78 +14,101 @@ Built with FastAPI and WebSocket for real-time communication.
 import asyncio
 import json
 import logging
+import re
 import time
 import random
+import shutil
 import sys
+from collections import deque
 from datetime import datetime
-from typing import Dict, List, Optional
-from dataclasses import dataclass, asdict
+from typing import Callable, Dict, List, Mapping, Optional, Tuple, Union
+from dataclasses import asdict, dataclass
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Response
 from fastapi.templating import Jinja2Templates
 import uvicorn
-import httpx
 import os
 
+from history import MetricsHistory, METRIC_NAMES, METRIC_PRECISION
+from anomaly import create_anomaly_detector
+from aggregates import create_rolling_aggregates, window_label
+from alerts import RuleError, create_alert_engine
+from downsample import AGGREGATIONS, downsample_series
+from storage import MetricsStore, EVENT_START, EVENT_END
+from ollama_client import OllamaClient, OllamaBusyError
+from analysis_cache import AnalysisCache, analysis_key
+from ai_jobs import AnalysisJob, AnalysisQueue, AnalysisQueueFull, DONE
+from ai_profiles import ModelProfile, PromptBuilder, create_profile_registry, estimate_tokens
+from health import HealthProber
+from frames import Frame, decode_json, encode_json
+from broker import InProcessBroker, BrokerCommandError, create_broker
+from collector import HostCollector, parse_pids
+from ingest import IngestPipeline, IngestError, IngestBackpressure, Written
+from subscriptions import (Subscription, SubscriptionError, TopicIndex, HOST_PREFIX,
+                           PROJECTED_TYPES, RATE_LIMITED_TYPES, project_message)
+from provisioning import ModelProvisioner, ModelNotReadyError
+from scheduler import TickScheduler, create_tick_policy
+from telemetry import CONTENT_TYPE, FAST_BUCKETS, Histogram, Registry, RequestMetricsMiddleware
+from scenarios import ScenarioManager
+from timers import TimerHeap
+from wire import DEFAULT_FORMAT, DELTA_TYPES, StreamEncoder, WireFrame, check_format
+
 #logging setup
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 #ollama ai setup
 
+#shared pooled client for every ollama call
+ollama = OllamaClient()
+
 async def verify_ollama_required():
     """
     Verify that Ollama AI service is available and operational.
-    This is a mandatory component for the dashboard to function properly.
-    Without Ollama, the system will shut down to prevent degraded operation.
+    This is a mandatory component for the AI features of the dashboard.
+    Called by the model provisioner; AI analyses stay disabled until it passes.
     """
     try:
         logger.info("Verifying Ollama AI service availability...")
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
 #testing_ollama_connection
-            ollama_url = os.getenv("OLLAMA_URL", "http://localhost:11434")
-            response = await client.get(f"{ollama_url}/api/tags")
-            
-            if response.status_code != 200:
-                raise Exception(f"Ollama API returned status {response.status_code}")
-            
+        response = await ollama.get("/api/tags", timeout=30.0)
+        
+        if response.status_code != 200:
+            raise Exception(f"Ollama API returned status {response.status_code}")
+        
 #checking_llama_model
-            tags_data = response.json()
-            models = [model.get("name", "") for model in tags_data.get("models", [])]
-            
-            llama_available = any("llama3.2:1b" in model for model in models)
-            
-            if not llama_available:
-                raise Exception("Llama 3.2 1B model not found in Ollama")
-            
-#testing_model_response
-            test_response = await client.post(
-                f"{ollama_url}/api/generate",
-                json={
-                    "model": "llama3.2:1b",
-                    "prompt": "System test: please respond with 'OK'",
-                    "stream": False,
-                    "options": {"num_ctx": 1024}
-                },
+        tags_data = response.json()
+        models = [model.get("name", "") for model in tags_data.get("models", [])]
+        
+        missing = [name for name in ai_profiles.models() if not any(name in model for model in models)]
+        
+        if missing:
+            raise Exception(f"Model not found in Ollama: {', '.join(missing)}")
+        
+#testing_model_response, also loads each model with its profile's num_ctx and keep_alive
+#so the first analysis does not pay the cold load
+        for profile in ai_profiles.warm_profiles():
+            test_response = await ollama.generate(
+                profile.request("System test: please respond with 'OK'", stream=False),
                 timeout=90.0
             )
             
             if test_response.status_code != 200:
-                raise Exception("Llama model test failed")
-            
-            logger.info("Ollama AI service verified successfully")
-            return True
+                raise Exception(f"{profile.model} model test failed")
+        
+        logger.info("Ollama AI service verified successfully")
+        return True
             
     except Exception as e:
         logger.error(f"CRITICAL ERROR: Ollama AI service unavailable - {e}")
         logger.error("AI features disabled until Ollama is ready")
         logger.error("Required actions:")
         logger.error("   1. Install Ollama from https://ollama.ai")
-        logger.error("   2. Run: ollama pull llama3.2:1b")
+        logger.error(f"   2. Run: ollama pull {' '.join(ai_profiles.models())}")
         logger.error("   3. Start: ollama serve")
         logger.error("   4. AI will auto-connect when ready")
         
@@ -98,7 +121,8 @@ async def verify_ollama_required():
 class Metrics:
     """
     Represents real-time system metrics.
-    These metrics are simulated for demonstration purposes.
+    These metrics are simulated for demonstration purposes, or sampled
+    from /proc with METRICS_SOURCE=host (host carries the raw sample).
     """
     cpu_usage: float
     memory_usage: float
@@ -106,9 +130,19 @@ class Metrics:
     error_rate: float
     timestamp: str
     active_incidents: List[str]
+    host: Optional[dict] = None
     
     def to_dict(self):
-        return asdict(self)
+        #shallow build, asdict deep-copies every field
+        return {
+            "cpu_usage": self.cpu_usage,
+            "memory_usage": self.memory_usage,
+            "api_latency": self.api_latency,
+            "error_rate": self.error_rate,
+            "timestamp": self.timestamp,
+            "active_incidents": list(self.active_incidents),
+            **({"host": self.host} if self.host is not None else {})
+        }
 
 @dataclass
 class Incident:
@@ -159,67 +193,351 @@ class IncidentConfig:
 
 #websocket_manager
 
+#longest single extension of an active incident, seconds
+MAX_INCIDENT_EXTENSION = 3600
+
+#slow consumer policies for the per-connection outbound queue
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "coalesce", "disconnect")
+
+#frame types where only the newest one matters, others are never merged
+COALESCIBLE_TYPES = ("metrics", "heartbeat", "model_status")
+
+#let clients negotiate permessage-deflate on /ws (uvicorn default)
+WS_PER_MESSAGE_DEFLATE = os.getenv("WS_PER_MESSAGE_DEFLATE", "true").lower() == "true"
+
+#stream ai insights token by token over the websocket
+AI_STREAMING = os.getenv("AI_STREAMING", "true").lower() == "true"
+
+class ClientConnection:
+    """
+    A single WebSocket client with its own bounded outbound queue.
+    A dedicated writer task drains the queue so a slow socket never
+    blocks the broadcaster or the other clients.
+    """
+    
+    def __init__(self, websocket: WebSocket, manager: "ConnectionManager",
+                 max_queue: int, policy: str, send_timeout: float, wire_format: str = DEFAULT_FORMAT):
+        self.websocket = websocket
+        self.wire_format = wire_format
+        self.manager = manager
+        self.max_queue = max_queue
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.queue: deque = deque()
+        self.has_data = asyncio.Event()
+        self.writer_task: Optional[asyncio.Task] = None
+        self.closed = False
+        self.connected_at = time.time()
+        self.subscription = Subscription()
+        self._last_update: Dict[str, float] = {}
+        #last frame seq sent per compact stream, decides delta or keyframe
+        self._stream_seq: Dict[StreamEncoder, int] = {}
+        self.stats = {
+            "enqueued": 0,
+            "sent": 0,
+            "dropped": 0,
+            "coalesced": 0,
+            "rate_limited": 0,
+            "max_lag": 0,
+            "last_send_ms": 0.0,
+            "bytes_sent": 0,
+            "keyframes_resent": 0
+        }
+    
+    @property
+    def lag(self) -> int:
+        """Number of frames waiting in the outbound queue."""
+        return len(self.queue)
+    
+    def start(self):
+        self.writer_task = asyncio.create_task(self._writer_loop())
+    
+    def enqueue(self, frame: Frame, topic: Optional[str] = None) -> bool:
+        """
+        Queue a pre-encoded frame without blocking.
+        Returns False when the slow consumer policy asked for a disconnect.
+        """
+        if self.closed:
+            return False
+        
+        if self.subscription.max_rate and frame.type in RATE_LIMITED_TYPES:
+            #the next update supersedes this one, so over the client's rate it is skipped
+            now = time.monotonic()
+            key = topic or frame.type
+            if now - self._last_update.get(key, 0.0) < self.subscription.min_interval:
+                self.stats["rate_limited"] += 1
+                return True
+            self._last_update[key] = now
+        
+        if len(self.queue) >= self.max_queue:
+            if self.policy == "disconnect":
+                logger.warning(f"Slow WebSocket consumer disconnected (lag {len(self.queue)})")
+                self.manager.connection_stats["slow_consumer_disconnects"] += 1
+                self.close(close_socket=True)
+                return False
+            
+            if self.policy == "coalesce" and self._coalesce(frame):
+                return True
+            
+            #drop_oldest, or coalesce with nothing of the same type queued
+            self.queue.popleft()
+            self.stats["dropped"] += 1
+        
+        self.queue.append(frame)
+        self.stats["enqueued"] += 1
+        self.stats["max_lag"] = max(self.stats["max_lag"], len(self.queue))
+        self.has_data.set()
+        return True
+    
+    def _coalesce(self, frame: Frame) -> bool:
+        """Replace the newest queued frame of the same type with the latest one."""
+        if frame.type not in COALESCIBLE_TYPES:
+            return False
+        for index in range(len(self.queue) - 1, -1, -1):
+            if self.queue[index].type == frame.type:
+                del self.queue[index]
+                self.queue.append(frame)
+                self.stats["coalesced"] += 1
+                return True
+        return False
+    
+    async def _writer_loop(self):
+        try:
+            while not self.closed:
+                if not self.queue:
+                    self.has_data.clear()
+                    await self.has_data.wait()
+                #every frame queued by now goes out in this wakeup
+                while self.queue and not self.closed:
+                    frame = self.queue.popleft()
+                    payload = frame.text
+                    if isinstance(frame, WireFrame):
+                        payload = frame.payload_for(self._stream_seq.get(frame.stream))
+                        if frame.is_delta and payload is not frame.text:
+                            self.stats["keyframes_resent"] += 1
+                        self._stream_seq[frame.stream] = frame.seq
+                    started = time.perf_counter()
+                    await self._send(payload)
+                    #payload size before permessage-deflate
+                    self.stats["bytes_sent"] += len(payload)
+                    self.stats["last_send_ms"] = round((time.perf_counter() - started) * 1000, 2)
+                    self.stats["sent"] += 1
+                    self.manager.connection_stats["messages_sent"] += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.warning(f"WebSocket writer stopped: {e!r}")
+            self.close(close_socket=True)
+        finally:
+            self.close()
+    
+    async def _send(self, payload: Union[str, bytes]):
+        #the manager's deadline heap closes a send stuck past send_timeout, no loop timer per send
+        timers = self.manager.send_timers
+        timers.schedule(self, self.send_timeout)
+        try:
+            if isinstance(payload, bytes):
+                await self.websocket.send_bytes(payload)
+            else:
+                await self.websocket.send_text(payload)
+        finally:
+            timers.cancel(self)
+    
+    def close(self, close_socket: bool = False):
+        """Stop the writer task and detach from the manager."""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.clear()
+        self.has_data.set()
+        if self.writer_task and self.writer_task is not asyncio.current_task():
+            self.writer_task.cancel()
+        if close_socket:
+            #unblocks the receive loop in websocket_endpoint
+            asyncio.create_task(self._close_socket())
+        self.manager.disconnect(self.websocket)
+    
+    async def _close_socket(self):
+        try:
+            await self.websocket.close(code=1008)
+        except Exception:
+            pass
+    
+    def to_dict(self) -> dict:
+        connected_for = time.time() - self.connected_at
+        return {
+            "client": f"{self.websocket.client.host}:{self.websocket.client.port}" if self.websocket.client else None,
+            "connected_for": round(connected_for, 1),
+            "lag": self.lag,
+            "policy": self.policy,
+            "format": self.wire_format,
+            "bytes_per_hour": round(self.stats["bytes_sent"] * 3600 / max(connected_for, 1.0)),
+            "subscription": self.subscription.to_dict(),
+            **self.stats
+        }
+
 class ConnectionManager:
     """
     Manages WebSocket connections for real-time communication.
     Handles connection lifecycle, message broadcasting, and statistics.
+    Each connection gets a bounded outbound queue drained by its own writer
+    task, so broadcasting never waits on a slow client. Broadcasts are
+    routed through a topic index of the client subscriptions. Clients on
+    a compact wire format get metrics as keyframes and deltas.
     """
     
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    def __init__(self, max_queue: Optional[int] = None, policy: Optional[str] = None,
+                 send_timeout: Optional[float] = None):
+        self.active_connections: Dict[WebSocket, ClientConnection] = {}
+        self.index = TopicIndex()
+        #(topic, projection, format) -> delta state shared by those clients
+        self.encoders: Dict[tuple, StreamEncoder] = {}
+        self.keyframe_interval = int(os.getenv("WS_KEYFRAME_INTERVAL", "30"))
+        self.max_queue = max_queue or int(os.getenv("WS_QUEUE_SIZE", "64"))
+        self.policy = policy or os.getenv("WS_SLOW_CONSUMER_POLICY", "drop_oldest")
+        self.send_timeout = send_timeout or float(os.getenv("WS_SEND_TIMEOUT", "10"))
+        if self.policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy: {self.policy}")
+        #one deadline per send in flight, cheaper than an event loop timer per frame
+        self.send_timers = TimerHeap(self._send_timed_out)
         self.connection_stats = {
             "total_connections": 0,
             "active_connections": 0,
-            "messages_sent": 0
+            "messages_sent": 0,
+            "slow_consumer_disconnects": 0,
+            "send_timeouts": 0
         }
+        self.broadcast_seconds = Histogram("dashboard_broadcast_duration_seconds",
+                                           "Time to route, encode and enqueue one broadcast", ("type",),
+                                           buckets=FAST_BUCKETS)
     
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, wire_format: str = DEFAULT_FORMAT):
         """Accept a new WebSocket connection and update statistics."""
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.send_timers.start()
+        client = ClientConnection(websocket, self, self.max_queue, self.policy, self.send_timeout, wire_format)
+        self.active_connections[websocket] = client
+        self.index.add(client, client.subscription)
+        client.start()
         self.connection_stats["total_connections"] += 1
         self.connection_stats["active_connections"] = len(self.active_connections)
         logger.info(f"New WebSocket connection established. Total active: {len(self.active_connections)}")
         
 #welcome_message
-        await self.send_personal_message({
+        welcome = {
             "type": "connection",
             "status": "connected",
             "message": "Welcome to Cloud Monitoring Dashboard - AI analysis ready",
             "timestamp": datetime.now().isoformat()
-        }, websocket)
+        }
+        if wire_format != DEFAULT_FORMAT:
+            welcome["format"] = wire_format
+            welcome["keyframe_interval"] = self.keyframe_interval
+        await self.send_personal_message(welcome, websocket)
+    
+    async def _send_timed_out(self, client: ClientConnection):
+        """TimerHeap callback: a send has been stuck for send_timeout, drop the socket."""
+        if client.closed:
+            return
+        logger.warning(f"WebSocket send timed out after {self.send_timeout:g}s, closing")
+        self.connection_stats["send_timeouts"] += 1
+        client.close(close_socket=True)
     
     def disconnect(self, websocket: WebSocket):
         """Remove a WebSocket connection and update statistics."""
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        client = self.active_connections.pop(websocket, None)
+        if client is None:
+            return
+        self.index.remove(client)
+        client.close()
+        self._prune_encoders()
         self.connection_stats["active_connections"] = len(self.active_connections)
         logger.info(f"WebSocket connection closed. Remaining active: {len(self.active_connections)}")
     
     async def send_personal_message(self, message: dict, websocket: WebSocket):
-        """Send a message to a specific WebSocket connection."""
-        try:
-            await websocket.send_text(json.dumps(message))
-            self.connection_stats["messages_sent"] += 1
-        except Exception as e:
-            logger.error(f"Failed to send message to WebSocket: {e}")
+        """Queue a message for a specific WebSocket connection."""
+        client = self.active_connections.get(websocket)
+        if client is None:
+            logger.error("Failed to send message to WebSocket: connection not registered")
+            return
+        client.enqueue(Frame.from_message(message))
+    
+    def update_subscription(self, websocket: WebSocket, message: dict) -> dict:
+        """Apply a subscribe/unsubscribe message and re-index the client."""
+        client = self.active_connections.get(websocket)
+        if client is None:
+            raise SubscriptionError("connection not registered")
+        client.subscription.apply(message)
+        self.index.add(client, client.subscription)
+        self._prune_encoders()
+        return client.subscription.to_dict()
+    
+    def has_subscribers(self, topic: str) -> bool:
+        return self.index.has_subscribers(topic)
+    
+    def load(self) -> Tuple[int, float]:
+        """Connected clients and the fullest outbound queue as a fraction of max_queue."""
+        lag = max((client.lag for client in self.active_connections.values()), default=0)
+        return len(self.active_connections), lag / self.max_queue
+    
+    def _prune_encoders(self):
+        """Forget delta streams nobody listens to anymore."""
+        formats = {client.wire_format for client in self.active_connections.values()}
+        for key in list(self.encoders):
+            topic, projection, wire_format = key
+            if wire_format not in formats or not any(group == projection for group, _ in self.index.groups(topic)):
+                del self.encoders[key]
     
-    async def broadcast(self, message: dict):
-        """Send a message to all active WebSocket connections."""
+    def _wire_frame(self, topic: str, projection, wire_format: str, message: dict) -> WireFrame:
+        key = (topic, projection, wire_format)
+        encoder = self.encoders.get(key)
+        if encoder is None:
+            encoder = self.encoders[key] = StreamEncoder(wire_format, self.keyframe_interval)
+        return encoder.encode(message)
+    
+    async def broadcast(self, message: Union[dict, Frame], topic: Optional[str] = None):
+        """
+        Queue a message for the clients subscribed to its topic (its type by default).
+        The message is encoded once per distinct metric projection and the
+        same frame is shared by every queue of that group. Returns as soon as
+        every queue has the frame; writers send in parallel.
+        """
         if not self.active_connections:
             return
-            
-        disconnected = []
-        for connection in self.active_connections.copy():
-            try:
-                await connection.send_text(json.dumps(message))
-                self.connection_stats["messages_sent"] += 1
-            except Exception:
-                disconnected.append(connection)
-
-#cleanup_disconnected
-        for connection in disconnected:
-            self.disconnect(connection)
+        
+        started = time.perf_counter()
+        frame = message if isinstance(message, Frame) else Frame.from_message(message)
+        topic = topic or frame.type
+        #one frame per (projection, format), built on first use
+        encoded: Dict[tuple, Frame] = {}
+        for projection, clients in list(self.index.groups(topic)):
+            for client in list(clients):
+                wire_format = client.wire_format if frame.type in DELTA_TYPES else DEFAULT_FORMAT
+                target = encoded.get((projection, wire_format))
+                if target is None:
+                    projected = projection is not None and frame.type in PROJECTED_TYPES
+                    if wire_format != DEFAULT_FORMAT:
+                        source = project_message(frame.decoded(), projection) if projected else frame.decoded()
+                        target = self._wire_frame(topic, projection, wire_format, source)
+                    elif projected:
+                        target = Frame.from_message(project_message(frame.decoded(), projection))
+                    else:
+                        target = frame
+                    encoded[(projection, wire_format)] = target
+                client.enqueue(target, topic)
+        self.broadcast_seconds.labels(frame.type).observe(time.perf_counter() - started)
+    
+    def get_connection_stats(self) -> dict:
+        """Totals plus per-connection lag counters."""
+        return {
+            **self.connection_stats,
+            "policy": self.policy,
+            "max_queue": self.max_queue,
+            "topics": self.index.counts(),
+            "delta_streams": len(self.encoders),
+            "keyframe_interval": self.keyframe_interval,
+            "connections": [client.to_dict() for client in self.active_connections.values()]
+        }
 
 # ===============================================================================
 #metrics simulator
@@ -228,8 +546,27 @@ class ConnectionManager:
 class MetricsSimulator:
     """Metrics simulator with incidents"""
     
-    def __init__(self, connection_manager: ConnectionManager):
-        self.connection_manager = connection_manager
+    def __init__(self, publisher: InProcessBroker, store: Optional[MetricsStore] = None,
+                 collector: Optional[HostCollector] = None,
+                 audience: Optional[Callable[[], Tuple[int, float]]] = None,
+                 remote_histories: Optional[Callable[[], Mapping[str, MetricsHistory]]] = None):
+        self.publisher = publisher
+        #(clients, fullest queue fraction) for the adaptive tick rate
+        self.audience = audience
+        #ingested host series, scored for anomalies with the local one
+        self.remote_histories = remote_histories
+        self.anomaly_detector = create_anomaly_detector()
+        #user-defined rules from alerts/rules.json, see alerts.py
+        self.alert_engine = create_alert_engine()
+        #windowed mean/min/max/percentiles, computed once for every viewer
+        self.aggregates = create_rolling_aggregates()
+        #seconds between metrics frames that carry the aggregates, 0 = every frame
+        self.aggregate_frame_interval = float(os.getenv("AGGREGATE_FRAME_INTERVAL", "10"))
+        self._aggregates_sent_at = 0.0
+        self.store = store
+        #host mode: cpu and memory come from /proc instead of the random walk
+        self.collector = collector
+        self.host_sample: Optional[dict] = None
         self.active_incidents: Dict[str, dict] = {}
         self.base_metrics = {
             "cpu_usage": 25.0,
@@ -238,53 +575,238 @@ class MetricsSimulator:
             "error_rate": 1.2
         }
         self.current_metrics = self.base_metrics.copy()
-        self.metrics_history: List[Dict] = []
         self.is_running = False
-        self.update_interval = 2.0
+        #follower workers rebuild state from the leader's frames instead of simulating
+        self.mirroring = False
+        #a scenario replay owns the broadcast while it runs
+        self.paused = False
+        self.update_interval = float(os.getenv("SIMULATION_INTERVAL", "2.0"))
+        self.last_tick_at: Optional[float] = None
+        self.scheduler = TickScheduler(self.update_interval)
+        self.tick_policy = create_tick_policy(self.update_interval)
+        #incident expiry on monotonic deadlines instead of a scan per tick
+        self.incident_timers = TimerHeap(self.end_incident)
+        #per host, ends the open anomalies of a host that stopped sending samples
+        self.anomaly_timers = TimerHeap(self.expire_anomalies)
+        
+        #ring buffer sized from the retention window (default 1 hour) at the fastest tick rate,
+        #adaptive mode ticks faster during incidents, when the history matters most
+        self.history_retention = float(os.getenv("METRICS_RETENTION_SECONDS", "3600"))
+        self.metrics_history = MetricsHistory(
+            capacity=max(1, int(self.history_retention / self.tick_policy.min_interval)),
+            incident_ids=list(IncidentConfig.INCIDENTS.keys())
+        )
         
     def start_simulation(self):
         if self.is_running:
             return
         self.is_running = True
         logger.info("Starting metrics simulator with mandatory AI")
+        #incidents mirrored from a previous leader have no timer yet
+        for incident_id, state in self.active_incidents.items():
+            if incident_id not in self.incident_timers:
+                self.incident_timers.schedule(incident_id, state["start_time"] + state["duration"] - time.time())
+        self.incident_timers.start()
+        if self.anomaly_detector is not None:
+            for host in {host for host, _ in self.anomaly_detector.active}:
+                if host not in self.anomaly_timers:
+                    self.anomaly_timers.schedule(host, self.anomaly_detector.stale_after)
+            self.anomaly_timers.start()
         asyncio.create_task(self._simulation_loop())
     
     def stop_simulation(self):
         self.is_running = False
+        self.scheduler.wake()
         logger.info("Stopping simulator")
     
+    @property
+    def tick_interval(self) -> float:
+        """Interval of the current tick, differs from update_interval in adaptive mode."""
+        return self.scheduler.interval
+    
+    def wake(self):
+        """Re-evaluate the tick interval now instead of at the end of a slow idle tick."""
+        if self.tick_policy.adaptive:
+            self.scheduler.wake()
+    
+    def _audience(self) -> Tuple[int, float]:
+        return self.audience() if self.audience else (1, 0.0)
+    
+    def get_tick_stats(self) -> dict:
+        return {**self.tick_policy.to_dict(), **self.scheduler.get_stats()}
+    
     async def _simulation_loop(self):
+        self.scheduler.reset()
         while self.is_running:
+            clients, _ = self._audience()
+            await self.scheduler.wait(self.tick_policy.interval(clients, len(self.active_incidents)))
+            if not self.is_running:
+                break
+            self.last_tick_at = time.monotonic()
+            if self.paused:
+                continue
             try:
                 self._update_metrics()
                 
+                now = time.time()
                 metrics = Metrics(
                     cpu_usage=round(self.current_metrics["cpu_usage"], 1),
                     memory_usage=round(self.current_metrics["memory_usage"], 1),
                     api_latency=round(self.current_metrics["api_latency"], 1),
                     error_rate=round(self.current_metrics["error_rate"], 2),
-                    timestamp=datetime.now().isoformat(),
-                    active_incidents=list(self.active_incidents.keys())
+                    timestamp=datetime.fromtimestamp(now).isoformat(),
+                    active_incidents=list(self.active_incidents.keys()),
+                    host=self.host_sample
                 )
                 
-                self.metrics_history.append(metrics.to_dict())
-                if len(self.metrics_history) > 100:
-                    self.metrics_history.pop(0)
-                
-                await self.connection_manager.broadcast({
-                    "type": "metrics",
-                    "data": metrics.to_dict(),
-                    "incident_count": len(self.active_incidents),
-                    "system_status": self._get_system_status(),
-                    "ai_status": "active"  #ai always active
-                })
+                metrics_data = metrics.to_dict()
+                incident_mask = self.metrics_history.append(now, metrics_data, metrics.active_incidents)
+                self.aggregates.add(now, metrics_data)
+                if self.store:
+                    self._persist(self.store.append_sample, now, metrics_data, incident_mask)
+                if self.anomaly_detector is not None:
+                    await self._detect_anomalies()
+                if self.alert_engine is not None:
+                    await self.publish_alerts(self.alert_engine.evaluate(None, now, metrics_data))
                 
-                await self._manage_active_incidents()
-                await asyncio.sleep(self.update_interval)
+                _, lag = self._audience()
+                if self.tick_policy.should_broadcast(lag):
+                    frame = {
+                        "type": "metrics",
+                        "data": metrics_data,
+                        "incident_count": len(self.active_incidents),
+                        "system_status": self._get_system_status(),
+                        "ai_status": ai_status_label()
+                    }
+                    if now - self._aggregates_sent_at >= self.aggregate_frame_interval:
+                        #clients keep the last aggregates they got; compact streams carry them
+                        #over between frames (wire.STICKY_KEYS), sending them only when they change
+                        frame["aggregates"] = self.aggregates.snapshot(now)
+                        self._aggregates_sent_at = now
+                    await self.publisher.broadcast(frame)
+                else:
+                    #clients are behind, the next tick supersedes this one
+                    self.scheduler.stats["coalesced_broadcasts"] += 1
                 
             except Exception as e:
+                #the scheduler paces retries, no extra sleep needed
                 logger.error(f"Simulation error: {e}")
-                await asyncio.sleep(1)
+    
+    async def _detect_anomalies(self):
+        """Score the newest sample of every local and ingested series, publish start/end events."""
+        histories = {None: self.metrics_history}
+        if self.remote_histories:
+            histories.update(self.remote_histories())
+        detector = self.anomaly_detector
+        hosts, values, timestamps = detector.collect(histories)
+        if not hosts:
+            return
+        events = detector.update(hosts, values, timestamps)
+        #every fresh sample pushes back the expiry of the host's open anomalies
+        for host in hosts:
+            if detector.has_active(host):
+                self.anomaly_timers.schedule(host, detector.stale_after)
+            else:
+                self.anomaly_timers.cancel(host)
+        await self.publish_anomalies(events)
+    
+    async def expire_anomalies(self, host: Optional[str]):
+        """Timer callback: end the open anomalies of a host that went quiet."""
+        events = self.anomaly_detector.expire(host)
+        if events:
+            logger.info(f"📈 {len(events)} anomalies on {host or 'the simulator'} expired, no samples "
+                        f"for {self.anomaly_detector.stale_after:.0f}s")
+        await self.publish_anomalies(events)
+    
+    async def publish_anomalies(self, events: List[Tuple[str, dict]]):
+        """Broadcast anomaly transitions, one frame per start/end."""
+        for status, anomaly in events:
+            where = f" on {anomaly['host']}" if anomaly["host"] else ""
+            if status == "start":
+                logger.warning(f"📈 Anomaly{where}: {anomaly['metric']} at {anomaly['value']} "
+                               f"(expected {anomaly['expected']}, {', '.join(anomaly['methods'])})")
+            await self.publisher.broadcast({
+                "type": "anomaly",
+                "status": status,
+                "anomaly": anomaly,
+                "timestamp": datetime.now().isoformat()
+            })
+    
+    async def publish_alerts(self, events: List[dict]):
+        """Broadcast alert transitions, one frame per pending/firing/resolved change."""
+        for event in events:
+            alert = event["alert"]
+            if event["status"] == "firing":
+                where = f" on {alert['host']}" if alert["host"] else ""
+                logger.warning(f"🔔 Alert {alert['rule']}{where} firing ({alert['severity']}): {alert['value']}")
+            await self.publisher.broadcast({"type": "alert", **event})
+    
+    def _persist(self, write, *args):
+        """Write to the on-disk store without letting disk errors stop the simulation."""
+        try:
+            write(*args)
+        except OSError as e:
+            logger.warning(f"Metrics store write failed: {e}")
+    
+    def replay_history(self):
+        """Refill the in-memory history from the on-disk store after a restart."""
+        if self.store is None:
+            return
+        now = time.time()
+        timestamps, values, masks = self.store.read_samples(
+            now - self.history_retention, now
+        )
+        self.metrics_history.extend(timestamps, values, masks)
+        #only the samples inside the longest aggregate window still count
+        recent = timestamps >= now - max(self.aggregates.windows.values())
+        for timestamp, column in zip(timestamps[recent], values[:, recent].T):
+            self.aggregates.add(float(timestamp), dict(zip(self.metrics_history.metric_names, column)))
+        if len(timestamps):
+            logger.info(f"Replayed {len(timestamps)} metric samples from {self.store.directory}")
+    
+    def mirror(self, message: dict):
+        """Follow the leader worker's metrics and incidents from its published frames."""
+        if "scenario" in message:
+            #replayed frames have their own timeline, not the live one
+            return
+        if message["type"] == "metrics":
+            data = message["data"]
+            for name in self.base_metrics:
+                self.current_metrics[name] = data[name]
+            active = data["active_incidents"]
+            for incident_id in list(self.active_incidents):
+                if incident_id not in active:
+                    del self.active_incidents[incident_id]
+            for incident_id in active:
+                if incident_id not in self.active_incidents:
+                    #started before this worker joined, duration is not known
+                    incident = IncidentConfig.INCIDENTS[incident_id]
+                    self.active_incidents[incident_id] = {
+                        "start_time": time.time(),
+                        "duration": incident.duration_range[1],
+                        "severity": incident.severity
+                    }
+            timestamp = datetime.fromisoformat(data["timestamp"]).timestamp()
+            self.metrics_history.append(timestamp, data, active)
+            self.aggregates.add(timestamp, data)
+            self.last_tick_at = time.monotonic()
+        elif message["type"] == "incident":
+            incident = message["incident"]
+            if message["status"] == "start":
+                self.active_incidents[incident["id"]] = {
+                    "start_time": time.time(),
+                    "duration": incident["duration"],
+                    "severity": incident["severity"]
+                }
+            elif message["status"] == "extended":
+                if incident["id"] in self.active_incidents:
+                    self.active_incidents[incident["id"]]["duration"] = incident["duration"]
+            else:
+                self.active_incidents.pop(incident["id"], None)
+        elif message["type"] == "anomaly" and self.anomaly_detector is not None:
+            self.anomaly_detector.mirror(message["status"], message["anomaly"])
+        elif message["type"] == "alert" and self.alert_engine is not None:
+            self.alert_engine.mirror(message["status"], message["alert"])
     
     def _update_metrics(self):
         #reset to base + natural variation
@@ -293,6 +815,12 @@ class MetricsSimulator:
             variation = random.uniform(-3, 3)
             self.current_metrics[metric] = max(0, base_value + variation)
         
+        if self.collector is not None:
+            #latency and error rate have no host counterpart and stay simulated
+            self.host_sample = self.collector.sample()
+            self.current_metrics["cpu_usage"] = self.host_sample["cpu_usage"]
+            self.current_metrics["memory_usage"] = self.host_sample["memory_usage"]
+        
         #impact of active incidents
         for incident_id in self.active_incidents:
             incident = IncidentConfig.INCIDENTS[incident_id]
@@ -310,15 +838,6 @@ class MetricsSimulator:
         self.current_metrics["api_latency"] = min(self.current_metrics["api_latency"], 2000)
         self.current_metrics["error_rate"] = min(self.current_metrics["error_rate"], 20)
     
-    async def _manage_active_incidents(self):
-        expired = []
-        for incident_id in self.active_incidents:
-            if time.time() - self.active_incidents[incident_id]["start_time"] >= self.active_incidents[incident_id]["duration"]:
-                expired.append(incident_id)
-        
-        for incident_id in expired:
-            await self.end_incident(incident_id)
-    
     async def trigger_incident(self, incident_id: str) -> dict:
         if incident_id not in IncidentConfig.INCIDENTS:
             raise ValueError(f"Unknown incident: {incident_id}")
@@ -334,10 +853,13 @@ class MetricsSimulator:
             "duration": duration,
             "severity": incident.severity
         }
+        self.incident_timers.schedule(incident_id, duration)
+        if self.store:
+            self._persist(self.store.append_event, time.time(), incident_id, EVENT_START, duration)
         
         logger.info(f"Incident: {incident.name} ({duration}s)")
         
-        await self.connection_manager.broadcast({
+        await self.publisher.broadcast({
             "type": "incident",
             "incident_type": incident_id,
             "status": "start",
@@ -351,6 +873,8 @@ class MetricsSimulator:
             },
             "timestamp": datetime.now().isoformat()
         })
+        #adaptive mode speeds up right away instead of after the current tick
+        self.wake()
         
         return {"status": "success", "incident": incident.name, "duration": duration}
     
@@ -367,9 +891,10 @@ class MetricsSimulator:
             except Exception as e:
                 results.append({"status": "error", "incident": incident_id, "error": str(e)})
         
-        #mandatory ai analysis if multiple incidents
+        #mandatory ai analysis if multiple incidents, queued so the response does not wait for it
+        ai_job = None
         if success_count >= 2:
-            await self._trigger_ai_analysis()
+            ai_job = await self._request_ai_analysis()
         
         logger.info(f"Multi-incident: {success_count}/{len(incident_ids)}")
         
@@ -377,28 +902,73 @@ class MetricsSimulator:
             "status": "completed",
             "triggered": success_count,
             "total": len(incident_ids),
-            "results": results
+            "results": results,
+            "ai_job": ai_job
         }
     
-    async def end_incident(self, incident_id: str):
+    async def extend_incident(self, incident_id: str, seconds: float) -> dict:
+        """Push the end of an active incident back by seconds."""
+        if incident_id not in self.active_incidents:
+            raise ValueError(f"Incident {incident_id} is not active")
+        if isinstance(seconds, bool) or not isinstance(seconds, (int, float)) or not 0 < seconds <= MAX_INCIDENT_EXTENSION:
+            raise ValueError(f"seconds must be between 0 and {MAX_INCIDENT_EXTENSION}")
+        
+        incident = IncidentConfig.INCIDENTS[incident_id]
+        self.incident_timers.extend(incident_id, seconds)
+        state = self.active_incidents[incident_id]
+        state["duration"] += seconds
+        remaining = round(self.incident_timers.remaining(incident_id), 1)
+        logger.info(f"Extended: {incident.name} (+{seconds}s, {remaining}s left)")
+        
+        await self.publisher.broadcast({
+            "type": "incident",
+            "incident_type": incident_id,
+            "status": "extended",
+            "incident": {
+                "id": incident_id,
+                "name": incident.name,
+                "emoji": incident.emoji,
+                "severity": incident.severity,
+                "duration": state["duration"],
+                "remaining": remaining
+            },
+            "timestamp": datetime.now().isoformat()
+        })
+        return {"status": "success", "incident": incident.name, "duration": state["duration"], "remaining": remaining}
+    
+    async def cancel_incident(self, incident_id: str) -> dict:
+        """End an active incident now."""
+        if incident_id not in self.active_incidents:
+            raise ValueError(f"Incident {incident_id} is not active")
+        await self.end_incident(incident_id, reason="cancelled")
+        return {"status": "success", "incident": IncidentConfig.INCIDENTS[incident_id].name}
+    
+    async def end_incident(self, incident_id: str, reason: str = "expired"):
         if incident_id not in self.active_incidents:
             return
         
         incident = IncidentConfig.INCIDENTS[incident_id]
         del self.active_incidents[incident_id]
+        self.incident_timers.cancel(incident_id)
+        if self.store:
+            self._persist(self.store.append_event, time.time(), incident_id, EVENT_END)
         
         logger.info(f"Resolved: {incident.name}")
         
-        await self.connection_manager.broadcast({
+        await self.publisher.broadcast({
             "type": "incident",
             "incident_type": incident_id,
             "status": "end",
+            "reason": reason,
             "incident": {"id": incident_id, "name": incident.name, "emoji": incident.emoji},
             "timestamp": datetime.now().isoformat()
         })
     
     def _get_system_status(self) -> str:
         if not self.active_incidents:
+            #no incident, but the local metrics moved away from their recent range
+            if self.anomaly_detector is not None and self.anomaly_detector.has_active(None):
+                return "attention"
             return "normal"
         
         critical_count = sum(1 for data in self.active_incidents.values() 
@@ -411,70 +981,346 @@ class MetricsSimulator:
         else:
             return "attention"
     
-    async def _trigger_ai_analysis(self):
+    async def _request_ai_analysis(self) -> Optional[dict]:
+        """Queue an analysis of the active incidents, the insight follows over the websocket."""
         try:
-            active_incidents = [IncidentConfig.INCIDENTS[iid].name 
-                              for iid in self.active_incidents.keys()]
-            
-            #mandatory ai - no fallback
-            analysis = await analyze_with_ollama_required(
-                incident_types=active_incidents,
-                metrics=self.current_metrics,
-                multi_incident=True
-            )
-            
-            await self.connection_manager.broadcast({
-                "type": "ai_insight", 
-                "insight": analysis,
-                "timestamp": datetime.now().isoformat()
-            })
-        except Exception as e:
-            logger.error(f"MANDATORY AI analysis error: {e}")
-            #no fallback - the error is critical
+            return await submit_analysis()
+        except ModelNotReadyError as e:
+            #model still provisioning, incidents run without an insight
+            logger.info(f"Skipping AI analysis: {e}")
+        except AnalysisQueueFull as e:
+            logger.warning(f"Skipping AI analysis: {e}")
+            return {"status": "rejected", "error": str(e)}
+        return None
 
 # ===============================================================================
 #mandatory ollama ai
 # ===============================================================================
 
-async def analyze_with_ollama_required(incident_types: List[str], metrics: dict, multi_incident: bool = False) -> dict:
+#ollama settings per analysis kind, see ai_profiles.py
+ai_profiles = create_profile_registry()
+
+#history windows offered to the prompt, most useful first; the rest is dropped when the budget is tight
+AI_PROMPT_WINDOWS = [float(window) for window in os.getenv("AI_PROMPT_WINDOWS", "300,60,900").split(",") if window.strip()]
+
+def analysis_kind(incident_ids: List[str]) -> str:
+    """critical, multi_incident, incident or manual: the job priority and the profile route"""
+    if len(incident_ids) >= 2:
+        critical = any(IncidentConfig.INCIDENTS[iid].severity == "CRITICAL" for iid in incident_ids)
+        return "critical" if critical else "multi_incident"
+    return "incident" if incident_ids else "manual"
+
+def history_summaries(history, now: float) -> Dict[float, dict]:
+    """Mean and peak of every metric per prompt window, windows without samples left out"""
+    summaries = {}
+    for window in AI_PROMPT_WINDOWS:
+        summary = history.summary(window, now)
+        if summary:
+            summaries[window] = summary
+    return summaries
+
+def format_history_summary(window: float, summary: dict) -> str:
+    """Trend sentence for the prompt, e.g. 'Last 5m: CPU avg 40.1% (peak 93.0%), ...'"""
+    cpu = summary["cpu_usage"]
+    memory = summary["memory_usage"]
+    latency = summary["api_latency"]
+    errors = summary["error_rate"]
+    return (f"Last {window_label(window)}: CPU avg {cpu['avg']:.1f}% (peak {cpu['max']:.1f}%), "
+            f"Memory avg {memory['avg']:.1f}% (peak {memory['max']:.1f}%), "
+            f"Latency avg {latency['avg']:.0f}ms (peak {latency['max']:.0f}ms), "
+            f"Errors avg {errors['avg']:.1f}% (peak {errors['max']:.1f}%).")
+
+def build_analysis_prompt(incident_ids: List[str], metrics: dict, multi_incident: bool = False,
+                          summaries: Optional[Dict[float, dict]] = None,
+                          budget: int = 128) -> Tuple[str, int]:
+    """
+    Prompt and its estimated tokens. The situation and the question always go in,
+    then by priority the first history window, the incident descriptions, the
+    current latency and error rate and the other windows, as long as they fit.
+    """
+    incidents = [IncidentConfig.INCIDENTS[iid] for iid in incident_ids]
+    names = [incident.name for incident in incidents]
+    current = f"CPU: {metrics['cpu_usage']:.1f}%, Memory: {metrics['memory_usage']:.1f}%."
+    builder = PromptBuilder(budget)
+    if multi_incident and len(names) >= 2:
+        builder.add(f"System has multiple incidents: {', '.join(names)}. {current}")
+        question = "Provide 3 quick fixes."
+    elif names:
+        builder.add(f"System incident: {names[0]}. {current}")
+        question = "Give 2 recommendations."
+    else:
+        builder.add(f"System status: {current}")
+        question = "Give 2 optimization tips."
+    builder.add(f"Latency: {metrics['api_latency']:.0f}ms, Errors: {metrics['error_rate']:.1f}%.", priority=3)
+    for index, (window, summary) in enumerate((summaries or {}).items()):
+        builder.add(format_history_summary(window, summary), priority=1 if index == 0 else 4 + index)
+    for incident in incidents:
+        builder.add(f"{incident.name} ({incident.severity}): {incident.description}.", priority=2)
+    builder.add(question)
+    return builder.build(), builder.tokens
+
+def analysis_result(profile: ModelProfile, analysis: str, prompt_tokens: int) -> dict:
+    return {
+        "title": "🤖 Ollama Llama AI Analysis",
+        "analysis": analysis,
+        "model": profile.model,
+        "profile": profile.name,
+        "prompt_tokens": prompt_tokens,
+        "confidence": 0.90,
+        "status": "mandatory_active"
+    }
+
+async def analyze_with_ollama_required(profile: ModelProfile, prompt: str, prompt_tokens: int) -> dict:
     """MANDATORY analysis with Ollama - No fallback mode"""
     
     try:
-        if multi_incident and len(incident_types) >= 2:
-            prompt = f"""System has multiple incidents: {', '.join(incident_types)}. CPU: {metrics['cpu_usage']:.1f}%, Memory: {metrics['memory_usage']:.1f}%. Provide 3 quick fixes."""
-        elif incident_types:
-            prompt = f"""System incident: {incident_types[0]}. CPU: {metrics['cpu_usage']:.1f}%, Memory: {metrics['memory_usage']:.1f}%. Give 2 recommendations."""
+        response = await ollama.generate(profile.request(prompt, stream=False), timeout=profile.timeout)
+        
+        if response.status_code == 200:
+            result = response.json()
+            return analysis_result(profile, result.get("response", "").strip(), prompt_tokens)
         else:
-            prompt = f"""System status: CPU {metrics['cpu_usage']:.1f}%, Memory {metrics['memory_usage']:.1f}%. Give 2 optimization tips."""
-
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            ollama_url = os.getenv("OLLAMA_URL", "http://localhost:11434")
-            response = await client.post(
-                f"{ollama_url}/api/generate",
-                json={
-                    "model": "llama3.2:1b",
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {"temperature": 0.1, "num_ctx": 256}
-                }
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                return {
-                    "title": "🤖 Ollama Llama AI Analysis",
-                    "analysis": result.get("response", "").strip(),
-                    "model": "llama3.2:1b",
-                    "confidence": 0.90,
-                    "status": "mandatory_active"
-                }
-            else:
-                raise Exception(f"Ollama API error: {response.status_code}")
+            raise Exception(f"Ollama API error: {response.status_code}")
     
+    except OllamaBusyError:
+        #queue full, let the caller answer with 429 instead of a generic failure
+        raise
     except Exception as e:
         logger.error(f"CRITICAL MANDATORY AI ERROR: {e}")
         raise Exception(f"Ollama AI unavailable: {e}")
 
+#minimum gap between streamed chunk frames, the first token is always sent at once
+AI_STREAM_FLUSH_SECONDS = float(os.getenv("AI_STREAM_FLUSH_MS", "50")) / 1000
+
+async def analyze_with_ollama_streaming(profile: ModelProfile, prompt: str, prompt_tokens: int, on_chunk) -> dict:
+    """
+    Streaming variant of analyze_with_ollama_required.
+    on_chunk(delta, seq) is awaited with batches of generated text as they arrive.
+    The result carries timing stats: time to first token, tokens/s and total time.
+    """
+    try:
+        started = time.perf_counter()
+        first_token_at = None
+        last_flush = 0.0
+        pending: List[str] = []
+        parts: List[str] = []
+        tokens = 0
+        seq = 0
+        final = {}
+        
+        async for chunk in ollama.stream_generate(profile.request(prompt), timeout=profile.timeout):
+            delta = chunk.get("response", "")
+            if delta:
+                tokens += 1
+                pending.append(delta)
+                parts.append(delta)
+                now = time.perf_counter()
+                if first_token_at is None:
+                    first_token_at = now
+                if seq == 0 or now - last_flush >= AI_STREAM_FLUSH_SECONDS:
+                    await on_chunk("".join(pending), seq)
+                    pending.clear()
+                    last_flush = now
+                    seq += 1
+            if chunk.get("done"):
+                final = chunk
+                break
+        
+        if pending:
+            await on_chunk("".join(pending), seq)
+        
+        total = time.perf_counter() - started
+        eval_count = final.get("eval_count") or tokens
+        eval_seconds = (final.get("eval_duration") or 0) / 1e9
+        if not eval_seconds and first_token_at is not None:
+            eval_seconds = time.perf_counter() - first_token_at
+        
+        return {
+            **analysis_result(profile, "".join(parts).strip(), prompt_tokens),
+            "stats": {
+                "time_to_first_token_ms": round((first_token_at - started) * 1000, 1) if first_token_at else None,
+                #a cold model shows up here, keep_alive keeps it near zero after the first analysis
+                "load_ms": round(final["load_duration"] / 1e6, 1) if final.get("load_duration") else None,
+                "tokens": eval_count,
+                "tokens_per_second": round(eval_count / eval_seconds, 1) if eval_seconds else None,
+                "total_ms": round(total * 1000, 1)
+            }
+        }
+    
+    except OllamaBusyError:
+        raise
+    except Exception as e:
+        logger.error(f"CRITICAL MANDATORY AI ERROR: {e}")
+        raise Exception(f"Ollama AI unavailable: {e}")
+
+#cache in front of ollama, keyed on profile + incident set + bucketed cpu/memory
+ai_cache = AnalysisCache(
+    max_entries=int(os.getenv("AI_CACHE_SIZE", "64")),
+    ttl=float(os.getenv("AI_CACHE_TTL", "120"))
+)
+AI_CACHE_BUCKET = float(os.getenv("AI_CACHE_BUCKET", "10"))
+
+async def analyze_cached(incident_ids: List[str], metrics: dict, multi_incident: bool = False,
+                         history_summaries: Optional[Dict[float, dict]] = None, on_chunk=None,
+                         profile: Optional[str] = None) -> dict:
+    """
+    analyze_with_ollama_required behind the TTL/LRU cache with single-flight.
+    With on_chunk the generation is streamed; cache hits and coalesced callers
+    only get the final result. profile overrides the one routed by analysis kind.
+    """
+    provisioner.ensure_ready()
+    resolved = ai_profiles.get(profile) if profile else ai_profiles.route(analysis_kind(incident_ids))
+    key = (resolved.name, *analysis_key(incident_ids, metrics, multi_incident, AI_CACHE_BUCKET))
+    #snapshot now, the simulator keeps mutating current_metrics while we wait
+    metrics = dict(metrics)
+    
+    async def compute():
+        prompt, prompt_tokens = build_analysis_prompt(incident_ids, metrics, multi_incident, history_summaries,
+                                                      budget=resolved.prompt_tokens)
+        if on_chunk is not None:
+            return await analyze_with_ollama_streaming(resolved, prompt, prompt_tokens, on_chunk)
+        return await analyze_with_ollama_required(resolved, prompt, prompt_tokens)
+    
+    analysis, source = await ai_cache.get_or_compute(key, compute)
+    return {**analysis, "cache": source}
+
+def build_batch_prompt(prompts: List[str]) -> str:
+    """Several analysis prompts as one, each answer expected under its [n] marker."""
+    numbered = " ".join(f"[{index}] {prompt}" for index, prompt in enumerate(prompts, 1))
+    return (f"Answer {len(prompts)} separate monitoring questions. {numbered} "
+            f"Start each answer with its marker, [1] to [{len(prompts)}].")
+
+def split_batch_answer(text: str, count: int) -> List[str]:
+    """The answer of each [n] section, or the whole text for every prompt if a marker is missing."""
+    parts = re.split(r"\[(\d+)\]", text)
+    sections = {}
+    for number, section in zip(parts[1::2], parts[2::2]):
+        sections.setdefault(int(number), section.strip())
+    if any(not sections.get(index) for index in range(1, count + 1)):
+        return [text.strip()] * count
+    return [sections[index] for index in range(1, count + 1)]
+
+async def analyze_batch(jobs: List[AnalysisJob]) -> List[dict]:
+    """One generation per profile for several queued analyses, split back into one result per job."""
+    #jobs only share a prompt with jobs of the same profile, results keep the queue's order
+    groups: Dict[str, List[int]] = {}
+    for index, job in enumerate(jobs):
+        payload = job.payload
+        profile = (ai_profiles.get(payload["profile"]) if payload.get("profile")
+                   else ai_profiles.route(analysis_kind(payload["incident_ids"])))
+        groups.setdefault(profile.name, []).append(index)
+    results: List[Optional[dict]] = [None] * len(jobs)
+    for name, indexes in groups.items():
+        answers = await analyze_profile_batch(ai_profiles.get(name), [jobs[index].payload for index in indexes])
+        for index, answer in zip(indexes, answers):
+            results[index] = answer
+    return results
+
+async def analyze_profile_batch(profile: ModelProfile, payloads: List[dict]) -> List[dict]:
+    """One generation for analyses that resolve to the same profile."""
+    #the profile's prompt budget is shared, minus the batch instructions
+    budget = (profile.prompt_tokens - estimate_tokens(build_batch_prompt([""] * len(payloads)))) // len(payloads)
+    prompts = [
+        build_analysis_prompt(payload["incident_ids"], payload["metrics"], payload["multi_incident"],
+                              payload["history_summaries"], budget=budget)[0]
+        for payload in payloads
+    ]
+    prompt = build_batch_prompt(prompts)
+    response = await ollama.generate(profile.request(prompt, answers=len(payloads), stream=False),
+                                     timeout=profile.timeout)
+    if response.status_code != 200:
+        raise Exception(f"Ollama API error: {response.status_code}")
+    answers = split_batch_answer(response.json().get("response", ""), len(payloads))
+    return [{**analysis_result(profile, answer, estimate_tokens(prompt)), "cache": "batch"} for answer in answers]
+
+async def run_analysis_jobs(jobs: List[AnalysisJob]) -> List[dict]:
+    """AnalysisQueue runner: one job streams through the cache, several share one prompt."""
+    provisioner.ensure_ready()
+    if len(jobs) > 1:
+        return await analyze_batch(jobs)
+    job = jobs[0]
+    
+    async def forward_chunk(delta: str, seq: int):
+        await broker.broadcast({
+            "type": "ai_insight_chunk",
+            "stream_id": job.id,
+            "seq": seq,
+            "delta": delta,
+            "done": False
+        })
+    
+    #mandatory ai - no fallback
+    analysis = await analyze_cached(**job.payload, on_chunk=forward_chunk if AI_STREAMING else None)
+    if AI_STREAMING and analysis.get("cache") == "miss":
+        await broker.broadcast({
+            "type": "ai_insight_chunk",
+            "stream_id": job.id,
+            "done": True,
+            "stats": analysis.get("stats"),
+            "timestamp": datetime.now().isoformat()
+        })
+    return [analysis]
+
+async def publish_job_update(job: AnalysisJob):
+    """Every status change as an ai_job frame, plus the full insight once a job is done"""
+    await broker.broadcast({
+        "type": "ai_job",
+        "job": job.to_dict(include_result=False),
+        "timestamp": datetime.now().isoformat()
+    })
+    if job.status == DONE:
+        #same frame as before the queue, clients that do not track jobs keep working
+        await broker.broadcast({
+            "type": "ai_insight",
+            "job_id": job.id,
+            "insight": job.result,
+            "timestamp": datetime.now().isoformat()
+        })
+
+#analyses run in the background on the leader worker, see ai_jobs.py
+ai_jobs = AnalysisQueue(
+    run=run_analysis_jobs,
+    on_update=publish_job_update,
+    workers=int(os.getenv("AI_JOB_WORKERS", "1")),
+    batch_size=int(os.getenv("AI_BATCH_SIZE", "1")),
+    max_queued=int(os.getenv("AI_JOB_QUEUE_SIZE", "50"))
+)
+
+async def submit_analysis(incident_ids: Optional[List[str]] = None, profile: Optional[str] = None) -> dict:
+    """
+    Queue an analysis of incident_ids, or of the active incidents when None.
+    A queued analysis of the same incidents is superseded; all analyses of
+    the active incidents share one key, the newest incident set wins.
+    """
+    provisioner.ensure_ready()
+    if profile is not None:
+        #raises ValueError, before anything is queued
+        ai_profiles.get(profile)
+    if incident_ids is None:
+        key = ("active",)
+        incident_ids = list(simulator.active_incidents)
+    else:
+        unknown = [iid for iid in incident_ids if iid not in IncidentConfig.INCIDENTS]
+        if unknown:
+            raise ValueError(f"Unknown incidents: {', '.join(map(str, unknown))}")
+        incident_ids = sorted(set(incident_ids))
+        key = ("incidents", *incident_ids)
+    job = await ai_jobs.submit(key, analysis_kind(incident_ids), {
+        "incident_ids": incident_ids,
+        #snapshot now, the simulator keeps mutating current_metrics while the job waits
+        "metrics": dict(simulator.current_metrics),
+        "multi_incident": len(incident_ids) >= 2,
+        "history_summaries": history_summaries(simulator.metrics_history, time.time()),
+        "profile": profile
+    })
+    return job.to_dict(include_result=False)
+
+async def analysis_jobs(job_id: Optional[str] = None):
+    if job_id is None:
+        return {"jobs": [job.to_dict(include_result=False) for job in ai_jobs.jobs.values()], **ai_jobs.get_stats()}
+    job = ai_jobs.get(job_id)
+    return job.to_dict() if job is not None else None
+
 # ===============================================================================
 #fastapi application
 # ===============================================================================
@@ -495,9 +1341,248 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+#self-instrumentation served by /metrics, the rest is registered once the components exist
+metrics_registry = Registry()
+http_request_seconds = metrics_registry.histogram(
+    "dashboard_http_request_duration_seconds", "REST handler latency", ("method", "route", "status")
+)
+app.add_middleware(RequestMetricsMiddleware, histogram=http_request_seconds)
+
+def create_metrics_store() -> Optional[MetricsStore]:
+    """On-disk metrics store, disabled with METRICS_STORE_ENABLED=false or when the directory is unusable."""
+    if os.getenv("METRICS_STORE_ENABLED", "true").lower() != "true":
+        return None
+    directory = os.getenv("METRICS_DATA_DIR", os.path.join(os.path.dirname(__file__), "..", "data"))
+    try:
+        return MetricsStore(
+            directory,
+            metric_names=METRIC_NAMES,
+            incident_ids=list(IncidentConfig.INCIDENTS.keys()),
+            retention_hours=float(os.getenv("METRICS_STORE_RETENTION_HOURS", "168"))
+        )
+    except (OSError, ValueError) as e:
+        logger.warning(f"Metrics store disabled: {e}")
+        return None
+
+def create_collector() -> Optional[HostCollector]:
+    """Host metrics collector for METRICS_SOURCE=host, None for the simulator."""
+    if os.getenv("METRICS_SOURCE", "simulator") != "host":
+        return None
+    try:
+        return HostCollector(pids=parse_pids(os.getenv("HOST_PIDS", "")))
+    except (OSError, ValueError) as e:
+        logger.warning(f"Host metrics unavailable, falling back to the simulator: {e}")
+        return None
+
 #global instances
 connection_manager = ConnectionManager()
-simulator = MetricsSimulator(connection_manager)
+ingest_pipeline = IngestPipeline(
+    capacity_per_host=int(os.getenv("INGEST_HOST_CAPACITY", "1800")),
+    max_hosts=int(os.getenv("INGEST_MAX_HOSTS", "500")),
+    max_pending=int(os.getenv("INGEST_MAX_PENDING", "500000")),
+    max_batch=int(os.getenv("INGEST_MAX_BATCH", "100000"))
+)
+
+async def publish_host_updates(written: Written):
+    """Alert rules over every written sample, then the latest sample of each host for its subscribers"""
+    engine = simulator.alert_engine
+    for host, slices in written.items():
+        if engine is not None:
+            #one evaluation per sample in time order, so no sample is skipped and rate() sees neighbours
+            names = ingest_pipeline.metric_names
+            for timestamps, values in slices:
+                for timestamp, row in zip(timestamps.tolist(), values.T.tolist()):
+                    await simulator.publish_alerts(engine.evaluate(host, timestamp, dict(zip(names, row))))
+        topic = HOST_PREFIX + host
+        if connection_manager.has_subscribers(topic):
+            await connection_manager.broadcast({
+                "type": "host_metrics",
+                "host": host,
+                "data": ingest_pipeline.hosts[host].latest()
+            }, topic=topic)
+
+ingest_pipeline.on_written = publish_host_updates
+broker = create_broker()
+#errors that map to their own status code keep their type on follower workers
+broker.register_error(ModelNotReadyError, lambda e: {"status": e.status}, lambda message, data: ModelNotReadyError(data["status"]))
+broker.register_error(AnalysisQueueFull, lambda e: {"queue_depth": e.queue_depth},
+                      lambda message, data: AnalysisQueueFull(message, data["queue_depth"]))
+#opened by the leader worker at startup, followers never write to disk
+metrics_store: Optional[MetricsStore] = None
+
+def simulation_audience() -> Tuple[int, float]:
+    """Clients of this worker plus follower workers, which are assumed to have clients."""
+    clients, lag = connection_manager.load()
+    return clients + broker.get_stats().get("followers", 0), lag
+
+simulator = MetricsSimulator(broker, collector=create_collector(), audience=simulation_audience,
+                             remote_histories=lambda: ingest_pipeline.hosts)
+
+def pause_simulation(paused: bool):
+    simulator.paused = paused
+
+def create_scenario_store(run_id: str, incident_ids: List[str]) -> Optional[MetricsStore]:
+    """Scenario runs get their own store directory next to the live segments"""
+    if metrics_store is None:
+        return None
+    return MetricsStore(
+        os.path.join(metrics_store.directory, "scenarios", run_id),
+        metric_names=METRIC_NAMES,
+        incident_ids=incident_ids,
+        retention_hours=metrics_store.retention_hours
+    )
+
+#declarative load-test timelines, see scenarios.py
+SCENARIO_DIR = os.getenv("SCENARIO_DIR", os.path.join(os.path.dirname(__file__), "..", "scenarios"))
+
+scenario_manager = ScenarioManager(
+    SCENARIO_DIR,
+    catalog={incident_id: asdict(incident) for incident_id, incident in IncidentConfig.INCIDENTS.items()},
+    publish=broker.broadcast,
+    pause=pause_simulation,
+    store_factory=create_scenario_store,
+    keep_runs=int(os.getenv("SCENARIO_KEEP_RUNS", "5")),
+    max_speed=float(os.getenv("SCENARIO_MAX_SPEED", "10000")),
+    #a run holds at most as many samples in memory as the live history
+    history_capacity=simulator.metrics_history.capacity
+)
+
+async def start_scenario(scenario: str, speed: float = 1.0, seed=None, persist: bool = True) -> dict:
+    return scenario_manager.start(scenario, speed, seed, persist)
+
+async def stop_scenario(run_id: str) -> dict:
+    return await scenario_manager.stop(run_id)
+
+async def scenario_status(run_id: Optional[str] = None):
+    if run_id is None:
+        return [run.to_dict() for run in scenario_manager.runs.values()]
+    return scenario_manager.get(run_id).to_dict()
+
+async def scenario_history(run_id: str, from_: Optional[str] = None, to: Optional[str] = None,
+                           step: Optional[float] = None, agg: str = "avg", metrics: Optional[str] = None,
+                           max_points: Optional[int] = None) -> dict:
+    run = scenario_manager.get(run_id)
+    #replayed timestamps run ahead of the wall clock, default to the end of the run
+    if to is None and run.last_timestamp is not None:
+        to = str(run.last_timestamp)
+    try:
+        return history_response(run.history, from_, to, step, agg, metrics, max_points, run.store)
+    except HTTPException as e:
+        #crosses the broker as a 400
+        raise ValueError(e.detail)
+
+async def mirror_frame(frame: Frame):
+    if not broker.is_leader and frame.type in ("metrics", "incident", "anomaly", "alert"):
+        simulator.mirror(frame.decoded())
+
+#every worker fans the published frames out to its own websocket clients
+broker.subscribe(connection_manager.broadcast)
+broker.subscribe(mirror_frame)
+broker.handle("trigger_incident", simulator.trigger_incident)
+broker.handle("trigger_multiple_incidents", simulator.trigger_multiple_incidents)
+broker.handle("extend_incident", simulator.extend_incident)
+broker.handle("cancel_incident", simulator.cancel_incident)
+broker.handle("start_scenario", start_scenario)
+broker.handle("stop_scenario", stop_scenario)
+broker.handle("scenario_status", scenario_status)
+broker.handle("scenario_history", scenario_history)
+
+async def reload_alert_rules() -> dict:
+    """Reload the rule file in the leader worker and publish the alerts it resolves"""
+    engine = simulator.alert_engine
+    if engine is None:
+        raise ValueError("Alert rules are disabled (ALERT_RULES=false)")
+    try:
+        events = engine.load()
+    except RuleError as e:
+        #crosses the broker as a 400
+        raise ValueError(str(e))
+    await simulator.publish_alerts(events)
+    return {"reloaded": True, "resolved": len(events), **engine.get_stats()}
+
+async def watch_alert_rules():
+    """Pick up edits of the rule file, in every worker so followers can mirror new rules"""
+    interval = float(os.getenv("ALERT_RELOAD_INTERVAL", "5"))
+    while True:
+        await asyncio.sleep(interval)
+        events = simulator.alert_engine.reload_if_changed()
+        if events and broker.is_leader:
+            await simulator.publish_alerts(events)
+
+broker.handle("reload_alerts", reload_alert_rules)
+broker.handle("submit_analysis", submit_analysis)
+broker.handle("analysis_jobs", analysis_jobs)
+alert_watch_task: Optional[asyncio.Task] = None
+health_prober = HealthProber(
+    ollama, simulator, models=ai_profiles.models(),
+    interval=float(os.getenv("HEALTH_PROBE_INTERVAL", "10")),
+    requires_ai=os.getenv("READINESS_REQUIRES_AI", "false").lower() == "true"
+)
+
+async def broadcast_model_status(status: dict):
+    await connection_manager.broadcast({"type": "model_status", **status})
+
+provisioner = ModelProvisioner(
+    ollama, models=ai_profiles.models(),
+    verify=verify_ollama_required,
+    on_update=broadcast_model_status,
+    retry_interval=float(os.getenv("MODEL_PROVISION_RETRY", "5"))
+)
+
+def register_metrics(registry: Registry):
+    """Histograms owned by the components, plus gauges and counters read at scrape time."""
+    for histogram in (connection_manager.broadcast_seconds, simulator.scheduler.tick_seconds,
+                      ollama.request_seconds, ollama.queue_wait_seconds):
+        registry.register(histogram)
+    clients = connection_manager.active_connections
+    history = simulator.metrics_history
+    registry.gauge("dashboard_websocket_connections", "Open WebSocket connections on this worker",
+                   lambda: len(clients))
+    registry.gauge("dashboard_websocket_queue_depth", "Frames waiting in all outbound queues",
+                   lambda: sum(client.lag for client in clients.values()))
+    registry.gauge("dashboard_websocket_queue_depth_max", "Frames waiting in the fullest outbound queue",
+                   lambda: max((client.lag for client in clients.values()), default=0))
+    registry.gauge("dashboard_history_samples", "Samples in the in-memory metrics history", lambda: len(history))
+    registry.gauge("dashboard_history_fill_ratio", "In-memory metrics history fill, 0 to 1",
+                   lambda: len(history) / history.capacity)
+    registry.gauge("dashboard_active_incidents", "Incidents currently active", lambda: len(simulator.active_incidents))
+    if simulator.anomaly_detector is not None:
+        registry.gauge("dashboard_active_anomalies", "Series currently flagged as anomalous",
+                       lambda: len(simulator.anomaly_detector.active))
+    if simulator.alert_engine is not None:
+        registry.gauge("dashboard_alerts_firing", "Alert rules currently firing, per host",
+                       lambda: simulator.alert_engine.count("firing"))
+        registry.gauge("dashboard_alerts_pending", "Alert rules holding but not firing yet, per host",
+                       lambda: simulator.alert_engine.count("pending"))
+        registry.gauge("dashboard_alert_eval_seconds", "Time the last sample took to evaluate all alert rules",
+                       lambda: simulator.alert_engine.stats["last_eval_us"] / 1e6)
+    registry.gauge("dashboard_ollama_in_flight", "Generations running on Ollama", lambda: ollama.in_flight)
+    registry.gauge("dashboard_ollama_queue_depth", "Generations waiting for a slot", lambda: ollama.waiting)
+    registry.gauge("dashboard_ai_ready", "1 once the model is provisioned and verified", lambda: int(provisioner.ready))
+    registry.counter_function("dashboard_websocket_connections_total", "WebSocket connections accepted",
+                              lambda: connection_manager.connection_stats["total_connections"])
+    registry.counter_function("dashboard_websocket_messages_sent_total", "Frames written to WebSocket clients",
+                              lambda: connection_manager.connection_stats["messages_sent"])
+    registry.counter_function("dashboard_websocket_slow_consumer_disconnects_total",
+                              "Clients disconnected by the slow consumer policy",
+                              lambda: connection_manager.connection_stats["slow_consumer_disconnects"])
+    registry.counter_function("dashboard_tick_overruns_total", "Simulation ticks that ran past the next deadline",
+                              lambda: simulator.scheduler.stats["overruns"])
+    registry.counter_function("dashboard_ollama_rejected_total", "Generations refused because the queue was full",
+                              lambda: ollama.stats["rejected"])
+    registry.gauge("dashboard_ai_jobs_queued", "AI analyses waiting for a worker", lambda: len(ai_jobs))
+    registry.counter_function("dashboard_ai_jobs_superseded_total", "Queued AI analyses replaced by a newer one",
+                              lambda: ai_jobs.stats["superseded"])
+    registry.counter_function("dashboard_ai_cache_hits_total", "Analyses served from the cache",
+                              lambda: ai_cache.stats["hits"])
+    registry.counter_function("dashboard_ai_cache_misses_total", "Analyses that went to Ollama",
+                              lambda: ai_cache.stats["misses"])
+
+register_metrics(metrics_registry)
+
+def ai_status_label() -> str:
+    """"active" once the model is verified, otherwise the provisioning state"""
+    return "active" if provisioner.ready else provisioner.state
 
 #directory configuration
 FRONTEND_DIR = os.path.join(os.path.dirname(__file__), "..", "frontend")
@@ -512,110 +1597,69 @@ else:
 #templates configuration
 templates = Jinja2Templates(directory=TEMPLATES_DIR)
 
-async def download_and_wait_for_ollama():
-    """Download model and wait for Ollama to be ready"""
-    logger.info("🚀 Starting Cloud Monitoring Dashboard Setup...")
-    logger.info("🔄 Initializing Ollama AI service...")
-    max_attempts = 120  #10 minutes with 5 second intervals
-    attempt = 0
-    
-    #wait for ollama to start
-    logger.info("⏳ Waiting for Ollama to start...")
-    while attempt < 60:  #wait up to 5 minutes for ollama to start
-        try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                ollama_url = os.getenv("OLLAMA_URL", "http://localhost:11434")
-                response = await client.get(f"{ollama_url}")
-                if response.status_code == 200:
-                    logger.info("✅ Ollama service is running")
-                    break
-        except:
-            pass
-        attempt += 1
-        await asyncio.sleep(5)
-    
-    if attempt >= 60:
-        logger.error("❌ TIMEOUT: Ollama service not starting")
-        return False
-    
-    #now download the model
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            ollama_url = os.getenv("OLLAMA_URL", "http://localhost:11434")
-            
-            #check if model exists
-            response = await client.get(f"{ollama_url}/api/tags")
-            if response.status_code == 200:
-                models = response.json().get("models", [])
-                if any("llama3.2:1b" in model.get("name", "") for model in models):
-                    logger.info("✅ Llama 3.2 1B model already present")
-                    return True
-            
-            logger.info("🔄 DOWNLOADING: Llama 3.2 1B model (1.4GB)")
-            logger.info("⏳ This may take 2-5 minutes - please wait...")
-            logger.info("📊 Progress will be shown below:")
-            
-            response = await client.post(f"{ollama_url}/api/pull", json={"name": "llama3.2:1b"})
-            if response.status_code == 200:
-                logger.info("✅ Model download started successfully")
-            else:
-                logger.warning(f"❌ Failed to start download: {response.status_code}")
-                return False
-    except Exception as e:
-        logger.warning(f"⚠️ Could not start download: {e}")
-        return False
-    
-    #now wait for model to be ready
-    attempt = 0
-    while attempt < max_attempts:
-        try:
-            await verify_ollama_required()
-            logger.info("✅ SUCCESS: Llama 3.2 1B model downloaded successfully!")
-            logger.info("🤖 AI is now ready for use")
-            logger.info("🚀 Dashboard will start automatically...")
-            return True
-        except Exception as e:
-            attempt += 1
-            if attempt == 1:
-                logger.info("⏳ Waiting for model to finish downloading and loading...")
-            
-            if attempt % 12 == 0:  #every minute
-                logger.info(f"⏳ Still waiting for AI model... ({attempt//12} minutes elapsed)")
-            
-            await asyncio.sleep(5)  #wait 5 seconds before next check
-    
-    logger.error("❌ TIMEOUT: Ollama AI not ready after 10 minutes")
-    return False
-
 @app.on_event("startup")
 async def startup_event():
+    global alert_watch_task
     logger.info("Starting Cloud Monitoring Dashboard with MANDATORY AI")
+    health_prober.start()
+    
+    #only the leader worker simulates and persists, followers mirror its frames
+    await broker.start()
+    if broker.is_leader:
+        await start_producer()
+    else:
+        simulator.mirroring = True
+        logger.info("👥 Following the leader worker's metrics over the broker")
     
-    #download and wait for ollama to be ready
-    if not await download_and_wait_for_ollama():
-        logger.error("❌ TIMEOUT: Ollama AI not ready after 10 minutes")
-        logger.error("💡 Please check your internet connection and try again")
-        raise Exception("Ollama AI not ready - dashboard cannot start")
+    ingest_pipeline.start()
+    if simulator.alert_engine is not None:
+        alert_watch_task = asyncio.create_task(watch_alert_rules())
     
-    #start simulator only after ollama is ready
+    #serve right away, the model is pulled and verified in the background
+    provisioner.start()
+    logger.info("🚀 Dashboard operational - AI model provisioning in the background")
+
+async def start_producer():
+    """Open the store and run the simulator in the leader worker"""
+    global metrics_store
+    metrics_store = simulator.store = create_metrics_store()
+    if metrics_store:
+        #runs of a previous process are not listed anymore
+        shutil.rmtree(os.path.join(metrics_store.directory, "scenarios"), ignore_errors=True)
+    #a promoted follower already holds the mirrored history
+    if simulator.metrics_history.oldest_timestamp() is None:
+        simulator.replay_history()
+    simulator.mirroring = False
     simulator.start_simulation()
-    logger.info("🚀 Full system operational - AI active")
+    ai_jobs.start()
+
+broker.on_promoted(start_producer)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Stopping API + AI")
     simulator.stop_simulation()
+    await simulator.incident_timers.stop()
+    await simulator.anomaly_timers.stop()
+    await connection_manager.send_timers.stop()
+    await ai_jobs.stop()
+    await scenario_manager.close()
+    await broker.stop()
+    await ingest_pipeline.stop()
+    if alert_watch_task is not None:
+        alert_watch_task.cancel()
+    await provisioner.stop()
+    await health_prober.stop()
+    if metrics_store:
+        metrics_store.close()
+    await ollama.aclose()
 
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
     """Home page with glassmorphism design"""
-    try:
-        #check system status for dynamic display
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            ollama_url = os.getenv("OLLAMA_URL", "http://localhost:11434")
-            response = await client.get(ollama_url)
-            ollama_status = "operational" if response.status_code == 200 else "error"
-    except:
+    #last background probe, no live call to ollama
+    ollama_status = health_prober.ollama_state["ollama_status"]
+    if ollama_status == "critical_error":
         ollama_status = "error"
     
     context = {
@@ -646,17 +1690,10 @@ async def api_documentation(request: Request):
     """API documentation with glassmorphism design"""
     return templates.TemplateResponse("docs.html", {"request": request})
 
-@app.get("/health")
-async def health_check():
-    #mandatory ai test
-    try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            ollama_url = os.getenv("OLLAMA_URL", "http://localhost:11434")
-            response = await client.get(ollama_url)
-            ollama_status = "operational" if response.status_code == 200 else "error"
-    except:
-        ollama_status = "critical_error"
-        
+def health_payload() -> dict:
+    """Health summary built from the last background probe"""
+    probe = health_prober.snapshot()
+    ollama_status = probe["ollama_status"]
     return {
         "status": "healthy" if ollama_status == "operational" else "degraded",
         "timestamp": datetime.now().isoformat(),
@@ -665,35 +1702,54 @@ async def health_check():
         "active_connections": len(connection_manager.active_connections),
         "ai_status": "mandatory",
         "ollama_status": ollama_status,
-        "model": "llama3.2:1b"
+        "model": ai_profiles.default.model,
+        "ai_model": provisioner.status(),
+        "probe": probe
     }
 
+@app.get("/health")
+async def health_check():
+    return health_payload()
+
 @app.get("/api/health")
 async def api_health_check():
     """API health check endpoint"""
-    try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            ollama_url = os.getenv("OLLAMA_URL", "http://localhost:11434")
-            response = await client.get(ollama_url)
-            ollama_status = "operational" if response.status_code == 200 else "error"
-    except:
-        ollama_status = "critical_error"
-        
     return {
-        "status": "healthy" if ollama_status == "operational" else "degraded",
-        "timestamp": datetime.now().isoformat(),
-        "simulator_running": simulator.is_running,
-        "active_incidents": len(simulator.active_incidents),
-        "active_connections": len(connection_manager.active_connections),
-        "ai_status": "mandatory",
-        "ollama_status": ollama_status,
-        "model": "llama3.2:1b"
+        **health_payload(),
+        "ai_queue": ollama.get_stats(),
+        "ai_cache": ai_cache.get_stats()
     }
 
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness: the process and event loop answer, independent of ollama"""
+    return {"status": "alive", "timestamp": datetime.now().isoformat()}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness: the simulator is ticking; ai only counts with READINESS_REQUIRES_AI=true"""
+    readiness = health_prober.readiness()
+    return JSONResponse(
+        status_code=200 if readiness["ready"] else 503,
+        content={**readiness, "timestamp": datetime.now().isoformat()}
+    )
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Self-instrumentation of this worker in the Prometheus text format"""
+    #set as a header, media_type would get a second charset appended
+    return Response(metrics_registry.render(), headers={"Content-Type": CONTENT_TYPE})
+
+@app.get("/api/ai/status")
+async def ai_model_status():
+    """Model provisioning state with download progress"""
+    return provisioner.status()
+
 @app.get("/api/metrics")
 async def get_current_metrics():
-    if simulator.metrics_history:
-        return simulator.metrics_history[-1]
+    latest = simulator.metrics_history.latest()
+    if latest:
+        return latest
     
     return {
         "cpu_usage": simulator.current_metrics["cpu_usage"],
@@ -705,17 +1761,186 @@ async def get_current_metrics():
         "ai_status": "mandatory_active"
     }
 
+#upper bound on points per series returned by the history api
+HISTORY_MAX_POINTS = int(os.getenv("HISTORY_MAX_POINTS", "500"))
+
+def parse_time_param(value: Optional[str], name: str) -> Optional[float]:
+    """Accept unix seconds or an ISO 8601 timestamp."""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be unix seconds or ISO 8601")
+
+@app.get("/api/host")
+async def get_host_metrics():
+    """Latest /proc sample and collector cost (METRICS_SOURCE=host)"""
+    if simulator.collector is None:
+        return {"enabled": False}
+    return {"enabled": True, "sample": simulator.host_sample, **simulator.collector.get_stats()}
+
+def history_response(history: MetricsHistory, from_: Optional[str], to: Optional[str], step: Optional[float],
+                     agg: str, metrics: Optional[str], max_points: Optional[int],
+                     store: Optional[MetricsStore] = None) -> dict:
+    """Downsample a time range of a MetricsHistory (and the on-disk store before it)"""
+    if agg not in AGGREGATIONS:
+        raise HTTPException(status_code=400, detail=f"agg must be one of {', '.join(AGGREGATIONS)}")
+    if step is not None and step <= 0:
+        raise HTTPException(status_code=400, detail="step must be positive")
+    
+    names = history.metric_names
+    if metrics:
+        names = tuple(name.strip() for name in metrics.split(",") if name.strip())
+        unknown = [name for name in names if name not in history.metric_names]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown metrics: {', '.join(unknown)}")
+    
+    end = parse_time_param(to, "to") or time.time()
+    start = parse_time_param(from_, "from")
+    if start is None:
+        stamps = history.timestamps()
+        start = float(stamps[0]) if len(stamps) else end
+    if start > end:
+        raise HTTPException(status_code=400, detail="from must be before to")
+    
+    limit = min(max_points or HISTORY_MAX_POINTS, HISTORY_MAX_POINTS)
+    limit = max(limit, 3)
+    
+    #ranges older than the in-memory window are read from the mmapped segments
+    oldest = history.oldest_timestamp()
+    if store and (oldest is None or start < oldest):
+        timestamps, values, _ = store.read_samples(start, end)
+    else:
+        timestamps, values = history.range(start, end)
+    rows = [history.metric_names.index(name) for name in names]
+    result = downsample_series(
+        timestamps, values[rows], names, start, end, agg, limit,
+        step=step, precision=METRIC_PRECISION
+    )
+    
+    return {
+        "from": start,
+        "to": end,
+        "agg": agg,
+        "samples": len(timestamps),
+        "max_points": limit,
+        **result
+    }
+
+@app.get("/api/metrics/history")
+async def get_metrics_history(
+    from_: Optional[str] = Query(None, alias="from"),
+    to: Optional[str] = None,
+    step: Optional[float] = None,
+    agg: str = "avg",
+    metrics: Optional[str] = None,
+    max_points: Optional[int] = None
+):
+    """Downsampled metric series for a time range (min/max/avg/last buckets or lttb)"""
+    return history_response(simulator.metrics_history, from_, to, step, agg, metrics, max_points, metrics_store)
+
+@app.get("/api/metrics/aggregates")
+async def get_metric_aggregates(window: Optional[str] = None, metrics: Optional[str] = None):
+    """Rolling count/mean/min/max/p50/p95/p99 per metric over each window ("1m", "5m")"""
+    aggregates = simulator.aggregates
+    windows = list(aggregates.windows)
+    if window:
+        windows = [name.strip() for name in window.split(",") if name.strip()]
+        unknown = [name for name in windows if name not in aggregates.windows]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown windows: {', '.join(unknown)}, "
+                                                        f"expected {', '.join(aggregates.windows)}")
+    names = None
+    if metrics:
+        names = tuple(name.strip() for name in metrics.split(",") if name.strip())
+        unknown = [name for name in names if name not in aggregates.metric_names]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown metrics: {', '.join(unknown)}")
+    now = time.time()
+    return {
+        "timestamp": datetime.fromtimestamp(now).isoformat(),
+        "windows": aggregates.snapshot(now, windows, names),
+        **aggregates.get_stats()
+    }
+
+@app.get("/api/incidents/history")
+async def get_incident_history(from_: Optional[str] = Query(None, alias="from"), to: Optional[str] = None):
+    """Incident start/end events from the on-disk store"""
+    if metrics_store is None:
+        raise HTTPException(status_code=404, detail="Metrics store is disabled")
+    end = parse_time_param(to, "to") or time.time()
+    start = parse_time_param(from_, "from") or end - 24 * 3600
+    return {"from": start, "to": end, "events": metrics_store.read_events(start, end)}
+
+@app.get("/api/storage")
+async def get_storage_stats():
+    """On-disk metrics store statistics"""
+    if metrics_store is None:
+        return {"enabled": False}
+    return {"enabled": True, **metrics_store.get_stats()}
+
+@app.get("/api/simulation/stats")
+async def get_simulation_stats():
+    """Tick scheduler statistics: interval, jitter, overruns and coalesced broadcasts"""
+    return {
+        "running": simulator.is_running,
+        "mirroring": simulator.mirroring,
+        **simulator.get_tick_stats(),
+        "incident_timers": simulator.incident_timers.get_stats(),
+        "anomaly_timers": simulator.anomaly_timers.get_stats()
+    }
+
+@app.get("/api/anomalies")
+async def get_anomalies():
+    """Series currently flagged by the anomaly detector, with its settings and pass timings"""
+    detector = simulator.anomaly_detector
+    if detector is None:
+        return {"enabled": False}
+    return {"enabled": True, "anomalies": detector.active_anomalies(), **detector.get_stats()}
+
+@app.get("/api/alerts")
+async def get_alerts(status: Optional[str] = None):
+    """Pending and firing alerts with the rule engine's stats, status=pending|firing filters"""
+    engine = simulator.alert_engine
+    if engine is None:
+        return {"enabled": False}
+    if status not in (None, "pending", "firing"):
+        raise HTTPException(status_code=400, detail="status must be pending or firing")
+    return {"enabled": True, "alerts": engine.alerts(status), **engine.get_stats()}
+
+@app.get("/api/alerts/rules")
+async def get_alert_rules():
+    """The loaded rules and how each one was compiled"""
+    engine = simulator.alert_engine
+    if engine is None:
+        return {"enabled": False}
+    return {"enabled": True, "path": os.path.abspath(engine.path),
+            "rules": [rule.to_dict() for rule in engine.plan.rules]}
+
+@app.post("/api/alerts/reload")
+async def reload_alerts():
+    """Reload the rule file now instead of at the next poll, 400 keeps the old rules"""
+    return await leader_request("reload_alerts", {})
+
 @app.get("/api/incidents")
 async def get_available_incidents():
     incidents = []
     for incident_id, incident in IncidentConfig.INCIDENTS.items():
+        #only the leader worker holds the timers
+        remaining = simulator.incident_timers.remaining(incident_id)
         incidents.append({
             "id": incident.id,
             "name": incident.name,
             "emoji": incident.emoji,
             "description": incident.description,
             "severity": incident.severity,
-            "active": incident_id in simulator.active_incidents
+            "active": incident_id in simulator.active_incidents,
+            "expires_in": None if remaining is None else round(remaining, 1)
         })
     
     return {"incidents": incidents, "active_count": len(simulator.active_incidents)}
@@ -727,9 +1952,11 @@ async def trigger_single_incident(incident_data: dict):
         raise HTTPException(status_code=400, detail="incident_id is required")
     
     try:
-        return await simulator.trigger_incident(incident_id)
+        return await broker.request("trigger_incident", {"incident_id": incident_id})
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except BrokerCommandError as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 @app.post("/api/incidents/trigger-multiple")
 async def trigger_multiple_incidents(incidents_data: dict):
@@ -737,29 +1964,220 @@ async def trigger_multiple_incidents(incidents_data: dict):
     if not incident_ids:
         raise HTTPException(status_code=400, detail="incident_ids are required")
     
-    return await simulator.trigger_multiple_incidents(incident_ids)
+    try:
+        return await broker.request("trigger_multiple_incidents", {"incident_ids": incident_ids})
+    except BrokerCommandError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.post("/api/incidents/{incident_id}/extend")
+async def extend_incident(incident_id: str, extension: dict):
+    """Push the end of an active incident back by {"seconds": n}"""
+    try:
+        return await broker.request("extend_incident", {"incident_id": incident_id, "seconds": extension.get("seconds")})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except BrokerCommandError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.post("/api/incidents/{incident_id}/cancel")
+async def cancel_incident(incident_id: str):
+    """Resolve an active incident before its deadline"""
+    try:
+        return await broker.request("cancel_incident", {"incident_id": incident_id})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except BrokerCommandError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.get("/api/scenarios")
+async def list_scenarios():
+    """Scenario files available for replay"""
+    return {"directory": os.path.abspath(SCENARIO_DIR), "scenarios": scenario_manager.list_scenarios()}
+
+async def leader_request(op: str, args: dict):
+    try:
+        return await broker.request(op, args)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except BrokerCommandError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.post("/api/scenarios/run", status_code=202)
+async def run_scenario(run_data: dict):
+    """Replay a scenario: {"scenario", "speed" (0 = as fast as possible), "seed", "persist"}"""
+    scenario = run_data.get("scenario")
+    if not scenario:
+        raise HTTPException(status_code=400, detail="scenario is required")
+    return await leader_request("start_scenario", {
+        "scenario": scenario,
+        "speed": run_data.get("speed", 1.0),
+        "seed": run_data.get("seed"),
+        "persist": bool(run_data.get("persist", True))
+    })
+
+@app.get("/api/scenarios/runs")
+async def list_scenario_runs():
+    return {"runs": await leader_request("scenario_status", {"run_id": None})}
+
+@app.get("/api/scenarios/runs/{run_id}")
+async def get_scenario_run(run_id: str):
+    return await leader_request("scenario_status", {"run_id": run_id})
+
+@app.post("/api/scenarios/runs/{run_id}/stop")
+async def stop_scenario_run(run_id: str):
+    return await leader_request("stop_scenario", {"run_id": run_id})
+
+@app.get("/api/scenarios/runs/{run_id}/history")
+async def get_scenario_history(
+    run_id: str,
+    from_: Optional[str] = Query(None, alias="from"),
+    to: Optional[str] = None,
+    step: Optional[float] = None,
+    agg: str = "avg",
+    metrics: Optional[str] = None,
+    max_points: Optional[int] = None
+):
+    """Downsampled series of a scenario run, same parameters as /api/metrics/history"""
+    return await leader_request("scenario_history", {
+        "run_id": run_id, "from_": from_, "to": to, "step": step,
+        "agg": agg, "metrics": metrics, "max_points": max_points
+    })
+
+@app.post("/api/ingest")
+async def ingest_samples(request: Request):
+    """Bulk metric samples from other hosts, columnar batches and/or sample rows"""
+    try:
+        payload = decode_json(await request.body())
+        result = ingest_pipeline.submit(payload)
+    except IngestBackpressure as e:
+        raise HTTPException(
+            status_code=429,
+            detail={"message": str(e), "pending": e.pending},
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
+    except IngestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValueError as e:
+        #malformed json
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+    return JSONResponse(status_code=202, content=result)
+
+@app.get("/api/ingest/stats")
+async def get_ingest_stats():
+    return ingest_pipeline.get_stats()
+
+@app.get("/api/hosts")
+async def get_hosts():
+    """Hosts that pushed samples, with their latest sample"""
+    return {"hosts": ingest_pipeline.host_summaries()}
+
+@app.get("/api/hosts/{host}/history")
+async def get_host_history(
+    host: str,
+    from_: Optional[str] = Query(None, alias="from"),
+    to: Optional[str] = None,
+    step: Optional[float] = None,
+    agg: str = "avg",
+    metrics: Optional[str] = None,
+    max_points: Optional[int] = None
+):
+    """Downsampled series of one ingested host, same parameters as /api/metrics/history"""
+    history = ingest_pipeline.hosts.get(host)
+    if history is None:
+        raise HTTPException(status_code=404, detail=f"Unknown host: {host}")
+    return {"host": host, **history_response(history, from_, to, step, agg, metrics, max_points)}
 
 @app.get("/api/ai/analyze")
-async def manual_ai_analysis():
-    """MANDATORY manual AI analysis"""
-    active_incidents = [IncidentConfig.INCIDENTS[iid].name 
-                       for iid in simulator.active_incidents.keys()]
+async def manual_ai_analysis(profile: Optional[str] = None):
+    """MANDATORY manual AI analysis, with the routed profile unless one is named"""
+    active_incidents = list(simulator.active_incidents.keys())
     
     try:
-        analysis = await analyze_with_ollama_required(
-            incident_types=active_incidents,
+        analysis = await analyze_cached(
+            incident_ids=active_incidents,
             metrics=simulator.current_metrics,
-            multi_incident=len(active_incidents) >= 2
+            multi_incident=len(active_incidents) >= 2,
+            history_summaries=history_summaries(simulator.metrics_history, time.time()),
+            profile=profile
         )
         
         return {"analysis": analysis, "timestamp": datetime.now().isoformat()}
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ModelNotReadyError as e:
+        raise HTTPException(
+            status_code=503,
+            detail={"message": str(e), "model": e.status},
+            headers={"Retry-After": str(int(provisioner.retry_interval))}
+        )
+    except OllamaBusyError as e:
+        raise HTTPException(
+            status_code=429,
+            detail={"message": str(e), "queue_depth": e.queue_depth},
+            headers={"Retry-After": str(int(e.retry_after))}
+        )
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Mandatory Ollama AI unavailable: {e}")
 
+@app.post("/api/ai/jobs", status_code=202)
+async def create_ai_job(job_data: dict):
+    """Queue an analysis: {"incident_ids": [...], "profile": ...} or {} for the active incidents; the insight arrives over /ws"""
+    incident_ids = job_data.get("incident_ids")
+    if incident_ids is not None and (not isinstance(incident_ids, list) or not incident_ids):
+        raise HTTPException(status_code=400, detail="incident_ids must be a non-empty list")
+    try:
+        return await broker.request("submit_analysis", {"incident_ids": incident_ids, "profile": job_data.get("profile")})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ModelNotReadyError as e:
+        raise HTTPException(
+            status_code=503,
+            detail={"message": str(e), "model": e.status},
+            headers={"Retry-After": str(int(provisioner.retry_interval))}
+        )
+    except AnalysisQueueFull as e:
+        raise HTTPException(status_code=429, detail={"message": str(e), "queue_depth": e.queue_depth},
+                            headers={"Retry-After": "5"})
+    except BrokerCommandError as e:
+        #followers get the leader's errors as text
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.get("/api/ai/profiles")
+async def list_ai_profiles():
+    """Model profiles and the profile each analysis kind is routed to"""
+    return ai_profiles.to_dict()
+
+@app.get("/api/ai/jobs")
+async def list_ai_jobs():
+    """Queued, running and recent analyses with the queue stats"""
+    return await leader_request("analysis_jobs", {"job_id": None})
+
+@app.get("/api/ai/jobs/{job_id}")
+async def get_ai_job(job_id: str):
+    job = await leader_request("analysis_jobs", {"job_id": job_id})
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired AI job: {job_id}")
+    return job
+
+@app.get("/api/connections")
+async def get_connections():
+    """WebSocket fan-out statistics of this worker with per-connection lag counters"""
+    return {**connection_manager.get_connection_stats(), "broker": broker.get_stats()}
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await connection_manager.connect(websocket)
+    #the wire format is fixed for the lifetime of the connection
+    try:
+        wire_format = check_format(websocket.query_params.get("format", DEFAULT_FORMAT))
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    await connection_manager.connect(websocket, wire_format)
+    #an idle adaptive simulator picks up the normal rate for the new client
+    simulator.wake()
+    #late joiners see the download progress without waiting for the next update
+    await connection_manager.send_personal_message({"type": "model_status", **provisioner.status()}, websocket)
     
     try:
         while True:
@@ -771,8 +2189,15 @@ async def websocket_endpoint(websocket: WebSocket):
                     await connection_manager.send_personal_message({
                         "type": "pong",
                         "timestamp": datetime.now().isoformat(),
-                        "ai_status": "mandatory_active"
+                        "ai_status": "mandatory_active" if provisioner.ready else provisioner.state
                     }, websocket)
+                elif message.get("type") in ("subscribe", "unsubscribe"):
+                    try:
+                        subscription = connection_manager.update_subscription(websocket, message)
+                        reply = {"type": "subscribed", "subscription": subscription}
+                    except SubscriptionError as e:
+                        reply = {"type": "error", "message": str(e)}
+                    await connection_manager.send_personal_message(reply, websocket)
                     
             except asyncio.TimeoutError:
                 await connection_manager.send_personal_message({
@@ -786,6 +2211,30 @@ async def websocket_endpoint(websocket: WebSocket):
         logger.error(f"WebSocket Error: {e}")
         connection_manager.disconnect(websocket)
 
+@app.websocket("/ws/ingest")
+async def ingest_websocket(websocket: WebSocket):
+    """Streaming ingest: one payload per message, one ingest_ack per payload"""
+    await websocket.accept()
+    seq = 0
+    try:
+        while True:
+            #stop reading while the writer is behind, tcp pushes back on the sender
+            await ingest_pipeline.wait_for_capacity()
+            data = await websocket.receive_text()
+            seq += 1
+            try:
+                ack = {"type": "ingest_ack", "seq": seq, **ingest_pipeline.submit(decode_json(data))}
+            except IngestBackpressure as e:
+                ack = {"type": "ingest_ack", "seq": seq, "accepted": 0, "error": str(e),
+                       "pending": e.pending, "backpressure": True}
+            except IngestError as e:
+                ack = {"type": "ingest_ack", "seq": seq, "accepted": 0, "error": str(e)}
+            except ValueError as e:
+                ack = {"type": "ingest_ack", "seq": seq, "accepted": 0, "error": f"Invalid JSON: {e}"}
+            await websocket.send_text(encode_json(ack))
+    except WebSocketDisconnect:
+        pass
+
 #static file server for the dashboard (must be after all routes)
 app.mount("/static", StaticFiles(directory=FRONTEND_DIR), name="static")
 
@@ -807,4 +2256,12 @@ if __name__ == "__main__":
 ╚═══════════════════════════════════════════════════════════════╝
     """)
     
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True) 
\ No newline at end of file
+    workers = int(os.getenv("UVICORN_WORKERS", "1"))
+    if workers > 1:
+        if broker.backend == "inprocess":
+            logger.warning("UVICORN_WORKERS > 1 with BROKER_BACKEND=inprocess: every worker runs its own simulator")
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=workers,
+                    ws_per_message_deflate=WS_PER_MESSAGE_DEFLATE)
+    else:
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True,
+                    ws_per_message_deflate=WS_PER_MESSAGE_DEFLATE)
\ No newline at end of file
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - Ollama Client
+Author: Zakariae Elbouzidi
+
+One app-scoped httpx client for every call to Ollama, so requests reuse
+pooled keep-alive connections instead of opening a new one each time.
+
+Generations go through a limiter: at most OLLAMA_MAX_CONCURRENT run at
+once and at most OLLAMA_MAX_QUEUE callers wait for a slot. Anyone beyond
+that gets OllamaBusyError straight away instead of hanging behind a
+queue of 120 s generations.
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from telemetry import Histogram
+
+class OllamaBusyError(Exception):
+    """Raised when the generation queue is full or the wait for a slot timed out."""
+
+    def __init__(self, message: str, queue_depth: int, retry_after: float):
+        super().__init__(message)
+        self.queue_depth = queue_depth
+        self.retry_after = retry_after
+
+class OllamaClient:
+    """Pooled HTTP client for the Ollama API with a generation limiter."""
+
+    def __init__(self, base_url: Optional[str] = None):
+        self.base_url = (base_url or os.getenv("OLLAMA_URL", "http://localhost:11434")).rstrip("/")
+        self.max_concurrent = int(os.getenv("OLLAMA_MAX_CONCURRENT", "1"))
+        self.max_queue = int(os.getenv("OLLAMA_MAX_QUEUE", "4"))
+        self.queue_timeout = float(os.getenv("OLLAMA_QUEUE_TIMEOUT", "30"))
+        self.limits = httpx.Limits(
+            max_connections=int(os.getenv("OLLAMA_MAX_CONNECTIONS", "10")),
+            max_keepalive_connections=int(os.getenv("OLLAMA_MAX_KEEPALIVE", "5")),
+            keepalive_expiry=float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY", "60"))
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self._slots = asyncio.Semaphore(self.max_concurrent)
+        self.waiting = 0
+        self.in_flight = 0
+        self.stats = {"generations": 0, "rejected": 0, "timed_out_waiting": 0, "errors": 0}
+        self.request_seconds = Histogram("dashboard_ollama_request_duration_seconds",
+                                         "Ollama HTTP request latency, streams until their last line", ("path",))
+        self.queue_wait_seconds = Histogram("dashboard_ollama_queue_wait_seconds",
+                                            "Time generations waited for a free slot")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        #created lazily so it binds to the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(base_url=self.base_url, limits=self.limits, timeout=30.0)
+        return self._client
+
+    async def get(self, path: str, timeout: float = 5.0) -> httpx.Response:
+        with self.request_seconds.labels(path).time():
+            return await self.client.get(path, timeout=timeout)
+
+    async def post(self, path: str, payload: dict, timeout: float = 30.0) -> httpx.Response:
+        with self.request_seconds.labels(path).time():
+            return await self.client.post(path, json=payload, timeout=timeout)
+
+    async def generate(self, payload: dict, timeout: float = 120.0) -> httpx.Response:
+        """POST /api/generate once a generation slot is free."""
+        async with self.generation_slot():
+            return await self.post("/api/generate", payload, timeout=timeout)
+
+    async def stream(self, path: str, payload: dict, timeout: Optional[float] = 120.0) -> AsyncIterator[dict]:
+        """POST with stream enabled and yield each NDJSON object, no generation slot."""
+        with self.request_seconds.labels(path).time():
+            async with self.client.stream("POST", path, json={**payload, "stream": True},
+                                          timeout=timeout) as response:
+                if response.status_code != 200:
+                    raise Exception(f"Ollama API error: {response.status_code}")
+                async for line in response.aiter_lines():
+                    if line.strip():
+                        yield json.loads(line)
+
+    async def stream_generate(self, payload: dict, timeout: float = 120.0) -> AsyncIterator[dict]:
+        """
+        POST /api/generate with stream enabled and yield each NDJSON object.
+        The generation slot is held until the stream ends.
+        """
+        async with self.generation_slot():
+            async for chunk in self.stream("/api/generate", payload, timeout=timeout):
+                yield chunk
+
+    def generation_slot(self) -> "_GenerationSlot":
+        """Async context manager holding one of the concurrent generation slots."""
+        return _GenerationSlot(self)
+
+    async def _acquire(self):
+        #admission is decided before the first await, so the check is atomic
+        if self.in_flight + self.waiting >= self.max_concurrent + self.max_queue:
+            self.stats["rejected"] += 1
+            raise OllamaBusyError(
+                f"AI generation queue is full ({self.waiting} waiting)",
+                queue_depth=self.waiting, retry_after=self.queue_timeout
+            )
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            if self._slots.locked():
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+            else:
+                #free slot, acquire() returns without suspending
+                await self._slots.acquire()
+        except asyncio.TimeoutError:
+            self.stats["timed_out_waiting"] += 1
+            raise OllamaBusyError(
+                f"No AI generation slot free after {self.queue_timeout:.0f}s",
+                queue_depth=self.waiting - 1, retry_after=self.queue_timeout
+            )
+        finally:
+            self.waiting -= 1
+            self.queue_wait_seconds.observe(time.perf_counter() - started)
+        self.in_flight += 1
+
+    def _release(self, failed: bool):
+        self.in_flight -= 1
+        self.stats["generations"] += 1
+        if failed:
+            self.stats["errors"] += 1
+        self._slots.release()
+
+    def get_stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            **self.stats
+        }
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+class _GenerationSlot:
+    def __init__(self, owner: OllamaClient):
+        self.owner = owner
+
+    async def __aenter__(self):
+        await self.owner._acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.owner._release(failed=exc_type is not None)
+        return False
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - Model Provisioning
+Author: Zakariae Elbouzidi
+
+Background task that waits for Ollama, pulls the models of the AI
+profiles that are missing and verifies them, while the dashboard is already serving. Pull progress is
+streamed from /api/pull and kept as state for the status endpoint and
+the WebSocket; AI features switch on once the state reaches "ready".
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+#provisioning states, in order
+STATES = ("waiting_for_ollama", "checking_model", "downloading", "verifying", "ready", "failed")
+
+class ModelNotReadyError(Exception):
+    """Raised when an AI feature is used before the model is provisioned."""
+
+    def __init__(self, status: dict):
+        super().__init__(describe_status(status))
+        self.status = status
+
+def describe_status(status: dict) -> str:
+    state = status["state"]
+    if state == "downloading" and status.get("percent") is not None:
+        return f"AI model is downloading ({status['percent']:.0f}%)"
+    if state == "failed":
+        return f"AI model provisioning failed: {status.get('error')}"
+    return f"AI model is not ready yet ({state.replace('_', ' ')})"
+
+class ModelProvisioner:
+    """Provision the Ollama models in the background and publish progress."""
+
+    def __init__(self, ollama, models: Sequence[str], verify: Callable[[], Awaitable[bool]],
+                 on_update: Optional[Callable[[dict], Awaitable[None]]] = None,
+                 retry_interval: float = 5.0, update_interval: float = 1.0):
+        self.ollama = ollama
+        self.models = list(models)
+        #shown in the status, "a, b" with several models
+        self.model = ", ".join(self.models)
+        self.verify = verify
+        self.on_update = on_update
+        self.retry_interval = retry_interval
+        self.update_interval = update_interval
+        self.state = "waiting_for_ollama"
+        self.detail = "Waiting for Ollama to start"
+        self.completed: Optional[int] = None
+        self.total: Optional[int] = None
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.ready_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_publish = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def status(self) -> dict:
+        percent = None
+        if self.total:
+            percent = round(100.0 * (self.completed or 0) / self.total, 1)
+        return {
+            "model": self.model,
+            "state": self.state,
+            "detail": self.detail,
+            "completed": self.completed,
+            "total": self.total,
+            "percent": percent,
+            "error": self.error,
+            "elapsed": round((self.ready_at or time.time()) - self.started_at, 1),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    def ensure_ready(self):
+        if not self.ready:
+            raise ModelNotReadyError(self.status())
+
+    async def _set(self, state: str, detail: str, force: bool = False):
+        changed = state != self.state
+        self.state = state
+        self.detail = detail
+        now = time.monotonic()
+        #progress lines arrive many times a second, publish at most once per interval
+        if self.on_update and (changed or force or now - self._last_publish >= self.update_interval):
+            self._last_publish = now
+            try:
+                await self.on_update(self.status())
+            except Exception as e:
+                logger.warning(f"Model status update failed: {e}")
+
+    async def run(self):
+        """Retry until the model is verified; never blocks the app startup."""
+        logger.info(f"🔄 Provisioning AI model {self.model} in the background...")
+        while not self.ready:
+            try:
+                await self._wait_for_ollama()
+                for model in await self._missing_models():
+                    await self._pull(model)
+                await self._set("verifying", "Loading model for a test generation")
+                await self.verify()
+                self.ready_at = time.time()
+                self.error = None
+                await self._set("ready", "AI model ready")
+                logger.info(f"✅ AI model {self.model} ready after {self.ready_at - self.started_at:.0f}s")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.error = str(e)
+                await self._set("failed", f"Retrying in {self.retry_interval:.0f}s", force=True)
+                logger.warning(f"⚠️ Model provisioning failed, retrying: {e}")
+                await asyncio.sleep(self.retry_interval)
+
+    async def _wait_for_ollama(self):
+        attempt = 0
+        started = time.monotonic()
+        logged_minutes = 0
+        while True:
+            try:
+                response = await self.ollama.get("/", timeout=5.0)
+                if response.status_code == 200:
+                    logger.info("✅ Ollama service is running")
+                    return
+            except Exception:
+                pass
+            attempt += 1
+            await self._set("waiting_for_ollama", f"Waiting for Ollama to start (attempt {attempt})")
+            #once per whole minute whatever the retry interval
+            minutes = int((time.monotonic() - started) // 60)
+            if minutes > logged_minutes:
+                logged_minutes = minutes
+                logger.info(f"⏳ Still waiting for Ollama... ({minutes} minutes elapsed)")
+            await asyncio.sleep(self.retry_interval)
+
+    async def _missing_models(self) -> List[str]:
+        await self._set("checking_model", f"Checking for {self.model}")
+        response = await self.ollama.get("/api/tags", timeout=30.0)
+        if response.status_code != 200:
+            raise Exception(f"Ollama API returned status {response.status_code}")
+        names = [model.get("name", "") for model in response.json().get("models", [])]
+        missing = []
+        for model in self.models:
+            if any(model in name for name in names):
+                logger.info(f"✅ {model} model already present")
+            else:
+                missing.append(model)
+        return missing
+
+    async def _pull(self, model: str):
+        logger.info(f"🔄 DOWNLOADING: {model} model")
+        await self._set("downloading", f"Starting download of {model}")
+        async for progress in self.ollama.stream("/api/pull", {"name": model}, timeout=None):
+            if progress.get("error"):
+                raise Exception(progress["error"])
+            if "total" in progress:
+                self.total = progress.get("total")
+                self.completed = progress.get("completed", 0)
+            await self._set("downloading", progress.get("status", "downloading"))
+            if progress.get("status") == "success":
+                break
+        logger.info(f"✅ {model} download complete")
@@ -0,0 +1,523 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - Scenario Replay
+Author: Zakariae Elbouzidi
+
+Declarative load-test scenarios: a timeline of incidents and metric
+curves in a JSON file, replayed deterministically from a seed and as
+fast as asked, through the same broadcast and storage paths as the
+live simulator.
+
+    {
+      "name": "incident-storm",
+      "duration": 3600, "interval": 2, "seed": 42, "noise": 3,
+      "baseline": {"cpu_usage": 25, "memory_usage": 45, "api_latency": 120, "error_rate": 1.2},
+      "curves": [
+        {"metric": "cpu_usage", "type": "ramp", "start": 600, "end": 900, "to": 40, "hold": true},
+        {"metric": "api_latency", "type": "step", "start": 1200, "end": 1500, "value": 300},
+        {"metric": "memory_usage", "type": "sine", "period": 900, "amplitude": 10}
+      ],
+      "incident_types": {"db_failover": {"name": "DB Failover", "severity": "HIGH",
+                                         "impact": {"api_latency": [400, 600]}}},
+      "incidents": [
+        {"at": 300, "incident": "cpu_spike", "duration": 120},
+        {"at": 1000, "incident": "db_failover"}
+      ]
+    }
+
+Times are scenario seconds. Curves are added to the baseline, incident
+impacts are applied like the simulator does (cpu and memory are raised
+to the impact, the other metrics get it added). A run writes to its
+own history ring buffer (and store directory), so a replay never mixes
+with the live series; the live simulator is paused while it runs. The
+ring buffer is no larger than the live one and keeps the latest ticks
+of a longer run, the store keeps all of them.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from history import MetricsHistory, METRIC_NAMES, METRIC_PRECISION
+from scheduler import TickScheduler
+from storage import EVENT_END, EVENT_START
+
+logger = logging.getLogger(__name__)
+
+CURVE_TYPES = ("ramp", "step", "sine")
+
+#same base values and caps as the live simulator
+DEFAULT_BASELINE = {"cpu_usage": 25.0, "memory_usage": 45.0, "api_latency": 120.0, "error_rate": 1.2}
+METRIC_LIMITS = {"cpu_usage": 98, "memory_usage": 95, "api_latency": 2000, "error_rate": 20}
+
+#metrics that an incident raises to its impact instead of adding to them
+LEVEL_METRICS = ("cpu_usage", "memory_usage")
+
+MAX_SCENARIO_TICKS = 1_000_000
+
+#the history incident bitmask is 32 bits wide
+MAX_INCIDENT_TYPES = 32
+
+class ScenarioError(ValueError):
+    """The scenario file or run request is invalid."""
+
+def _number(spec: dict, key: str, default=None, minimum: Optional[float] = None) -> float:
+    value = spec.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ScenarioError(f"{key} must be a number")
+    if minimum is not None and value < minimum:
+        raise ScenarioError(f"{key} must be at least {minimum}")
+    return float(value)
+
+def _object(value, what: str, default=None) -> dict:
+    """A JSON object or the default when absent, ScenarioError for anything else."""
+    if value is None:
+        return {} if default is None else default
+    if not isinstance(value, dict):
+        raise ScenarioError(f"{what} must be an object")
+    return value
+
+def _array(value, what: str) -> list:
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        raise ScenarioError(f"{what} must be a list")
+    return value
+
+def _pair(value, what: str) -> Tuple[float, float]:
+    """[low, high] of two numbers."""
+    if (not isinstance(value, list) or len(value) != 2
+            or any(isinstance(item, bool) or not isinstance(item, (int, float)) for item in value)):
+        raise ScenarioError(f"{what} must be [low, high] numbers")
+    if value[0] > value[1]:
+        raise ScenarioError(f"{what} low must not exceed high")
+    return float(value[0]), float(value[1])
+
+def check_seed(seed):
+    if isinstance(seed, bool) or not isinstance(seed, (int, str)):
+        raise ScenarioError("seed must be an integer or a string")
+    return seed
+
+class Curve:
+    """A ramp, step or sine added to one metric."""
+
+    def __init__(self, spec: dict):
+        spec = _object(spec, "every curve")
+        self.metric = spec.get("metric")
+        if self.metric not in METRIC_NAMES:
+            raise ScenarioError(f"curve metric must be one of {', '.join(METRIC_NAMES)}")
+        self.type = spec.get("type")
+        if self.type not in CURVE_TYPES:
+            raise ScenarioError(f"curve type must be one of {', '.join(CURVE_TYPES)}")
+        self.start = _number(spec, "start", 0.0)
+        self.end = _number(spec, "end", math.inf)
+        if self.end <= self.start:
+            raise ScenarioError("curve end must be after start")
+        if self.type == "ramp":
+            self.low = _number(spec, "from", 0.0)
+            self.high = _number(spec, "to")
+            if math.isinf(self.end):
+                raise ScenarioError("a ramp needs an end")
+            self.hold = bool(spec.get("hold", False))
+        elif self.type == "step":
+            self.value = _number(spec, "value")
+        else:
+            self.period = _number(spec, "period", minimum=0.001)
+            self.amplitude = _number(spec, "amplitude")
+            self.phase = _number(spec, "phase", 0.0)
+
+    def at(self, t: float) -> float:
+        if t < self.start:
+            return 0.0
+        if t >= self.end:
+            return self.high if self.type == "ramp" and self.hold else 0.0
+        if self.type == "ramp":
+            return self.low + (self.high - self.low) * (t - self.start) / (self.end - self.start)
+        if self.type == "step":
+            return self.value
+        return self.amplitude * math.sin(2 * math.pi * (t - self.start + self.phase) / self.period)
+
+class ScenarioTick:
+    __slots__ = ("t", "values", "active", "started", "ended")
+
+    def __init__(self, t: float, values: Dict[str, float], active: List[str],
+                 started: List[Tuple[str, float]], ended: List[str]):
+        self.t = t
+        self.values = values
+        self.active = active
+        self.started = started
+        self.ended = ended
+
+class Scenario:
+    """A validated timeline; samples() is a pure function of the scenario and the seed."""
+
+    def __init__(self, spec: dict, catalog: Dict[str, dict]):
+        if not isinstance(spec, dict):
+            raise ScenarioError("a scenario must be a JSON object")
+        self.name = str(spec.get("name") or "scenario")
+        self.description = str(spec.get("description", ""))
+        self.duration = _number(spec, "duration", minimum=0.001)
+        self.interval = _number(spec, "interval", 2.0, minimum=0.001)
+        if self.duration / self.interval > MAX_SCENARIO_TICKS:
+            raise ScenarioError(f"at most {MAX_SCENARIO_TICKS} ticks per scenario")
+        self.seed = check_seed(spec.get("seed", 0))
+        self.noise = _number(spec, "noise", 3.0, minimum=0.0)
+        baseline = _object(spec.get("baseline"), "baseline")
+        self.baseline = {name: _number(baseline, name, DEFAULT_BASELINE.get(name, 0.0)) for name in METRIC_NAMES}
+        self.curves = [Curve(curve) for curve in _array(spec.get("curves"), "curves")]
+
+        self.catalog = dict(catalog)
+        for incident_id, definition in _object(spec.get("incident_types"), "incident_types").items():
+            self.catalog[incident_id] = self._incident_type(incident_id, definition)
+        if len(self.catalog) > MAX_INCIDENT_TYPES:
+            raise ScenarioError(f"at most {MAX_INCIDENT_TYPES} incident types including the built-in ones")
+
+        self.incidents = []
+        for entry in _array(spec.get("incidents"), "incidents"):
+            entry = _object(entry, "every incidents entry")
+            incident_id = entry.get("incident")
+            if not isinstance(incident_id, str) or incident_id not in self.catalog:
+                raise ScenarioError(f"Unknown incident: {incident_id}")
+            at = _number(entry, "at", minimum=0.0)
+            duration = entry.get("duration")
+            if duration is not None:
+                duration = _number(entry, "duration", minimum=0.001)
+            self.incidents.append((at, incident_id, duration))
+        self.incidents.sort(key=lambda entry: entry[0])
+
+    @property
+    def incident_ids(self) -> List[str]:
+        return list(self.catalog)
+
+    @property
+    def ticks(self) -> int:
+        return int(math.ceil(self.duration / self.interval))
+
+    def _incident_type(self, incident_id: str, definition: dict) -> dict:
+        if not isinstance(definition, dict):
+            raise ScenarioError(f"incident type {incident_id} must be an object")
+        impact = {}
+        for metric, bounds in _object(definition.get("impact"), f"impact of {incident_id}").items():
+            if metric not in METRIC_NAMES:
+                raise ScenarioError(f"impact of {incident_id} must map metric names to [low, high]")
+            impact[metric] = _pair(bounds, f"impact {metric} of {incident_id}")
+        duration_range = _pair(definition.get("duration_range", [30, 60]), f"duration_range of {incident_id}")
+        if duration_range[0] < 1:
+            raise ScenarioError(f"duration_range of {incident_id} must be at least 1 second")
+        return {
+            "id": incident_id,
+            "name": str(definition.get("name", incident_id)),
+            "emoji": str(definition.get("emoji", "⚠️")),
+            "description": str(definition.get("description", "")),
+            "impact_metrics": impact,
+            "duration_range": (int(duration_range[0]), int(duration_range[1])),
+            "severity": str(definition.get("severity", "MEDIUM"))
+        }
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "duration": self.duration,
+            "interval": self.interval,
+            "ticks": self.ticks,
+            "seed": self.seed,
+            "incidents": len(self.incidents),
+            "curves": len(self.curves)
+        }
+
+    def samples(self, seed=None) -> Iterator[ScenarioTick]:
+        rng = random.Random(self.seed if seed is None else seed)
+        #durations left open in the file are drawn once, in timeline order
+        windows = []
+        for at, incident_id, duration in self.incidents:
+            if duration is None:
+                duration = rng.randint(*self.catalog[incident_id]["duration_range"])
+            windows.append((at, at + duration, incident_id, duration))
+
+        previous: List[str] = []
+        for tick in range(self.ticks):
+            t = tick * self.interval
+            values = {name: self.baseline[name] + rng.uniform(-self.noise, self.noise) for name in METRIC_NAMES}
+            for curve in self.curves:
+                values[curve.metric] += curve.at(t)
+
+            started = []
+            active = []
+            for start, end, incident_id, duration in windows:
+                if start > t:
+                    break
+                if t < end and incident_id not in active:
+                    active.append(incident_id)
+                    if incident_id not in previous:
+                        started.append((incident_id, duration))
+            for incident_id in active:
+                for metric, (low, high) in self.catalog[incident_id]["impact_metrics"].items():
+                    impact = rng.uniform(low, high)
+                    if metric in LEVEL_METRICS:
+                        values[metric] = max(values[metric], impact)
+                    else:
+                        values[metric] += impact
+
+            for name in METRIC_NAMES:
+                limited = min(max(values[name], 0.0), METRIC_LIMITS.get(name, math.inf))
+                values[name] = round(limited, METRIC_PRECISION.get(name, 2))
+            ended = [incident_id for incident_id in previous if incident_id not in active]
+            previous = active
+            yield ScenarioTick(t, values, active, started, ended)
+
+def load_scenario(path: str, catalog: Dict[str, dict]) -> Scenario:
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            spec = json.load(handle)
+    except ValueError as e:
+        #JSONDecodeError and UnicodeDecodeError
+        raise ScenarioError(f"{os.path.basename(path)} is not valid JSON: {e}")
+    return Scenario(spec, catalog)
+
+def system_status(active: List[str], catalog: Dict[str, dict]) -> str:
+    """Same rule as the simulator: two critical incidents = critical."""
+    if not active:
+        return "normal"
+    critical = sum(1 for incident_id in active if catalog[incident_id]["severity"] == "CRITICAL")
+    if critical >= 2:
+        return "critical"
+    return "warning" if critical else "attention"
+
+class ScenarioRun:
+    """One replay of a scenario at a given speed (0 = as fast as possible)."""
+
+    def __init__(self, scenario: Scenario, speed: float, seed, publish: Callable[[dict], Awaitable[None]],
+                 store=None, history_capacity: int = 1800):
+        self.id = uuid.uuid4().hex[:12]
+        self.scenario = scenario
+        self.speed = speed
+        self.seed = scenario.seed if seed is None else check_seed(seed)
+        self.publish = publish
+        self.store = store
+        #the latest ticks only, no bigger than the live buffer; a persisted run serves the rest from its store
+        self.history = MetricsHistory(max(1, min(scenario.ticks, history_capacity)),
+                                      incident_ids=scenario.incident_ids)
+        self.scheduler = TickScheduler(scenario.interval / speed) if speed else None
+        self.state = "pending"
+        self.error: Optional[str] = None
+        self.base_time = time.time()
+        self.last_timestamp: Optional[float] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"ticks": 0, "frames": 0, "publish_ms": 0.0, "max_publish_ms": 0.0}
+
+    def start(self, on_done: Callable[["ScenarioRun"], None]):
+        self.state = "running"
+        self.started_at = time.monotonic()
+        self._task = asyncio.create_task(self._run(on_done))
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _emit(self, message: dict):
+        started = time.perf_counter()
+        await self.publish(message)
+        elapsed = (time.perf_counter() - started) * 1000
+        self.stats["frames"] += 1
+        self.stats["publish_ms"] += elapsed
+        self.stats["max_publish_ms"] = max(self.stats["max_publish_ms"], round(elapsed, 3))
+
+    def _tag(self, t: float) -> dict:
+        return {"run_id": self.id, "name": self.scenario.name, "t": t, "speed": self.speed}
+
+    def _incident_frame(self, incident_id: str, status: str, timestamp: float, t: float,
+                        duration: Optional[float] = None) -> dict:
+        incident = self.scenario.catalog[incident_id]
+        details = {"id": incident_id, "name": incident["name"], "emoji": incident["emoji"]}
+        if status == "start":
+            details.update(description=incident["description"], severity=incident["severity"], duration=duration)
+        return {
+            "type": "incident",
+            "incident_type": incident_id,
+            "status": status,
+            "incident": details,
+            "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+            "scenario": self._tag(t)
+        }
+
+    async def _run(self, on_done: Callable[["ScenarioRun"], None]):
+        catalog = self.scenario.catalog
+        try:
+            for tick in self.scenario.samples(self.seed):
+                if self.scheduler is not None:
+                    await self.scheduler.wait()
+                elif self.stats["ticks"] % 50 == 0:
+                    #full speed still lets request handlers and socket writers run
+                    await asyncio.sleep(0)
+
+                timestamp = self.base_time + tick.t
+                mask = self.history.append(timestamp, tick.values, tick.active)
+                if self.store is not None:
+                    for incident_id, duration in tick.started:
+                        self.store.append_event(timestamp, incident_id, EVENT_START, duration)
+                    for incident_id in tick.ended:
+                        self.store.append_event(timestamp, incident_id, EVENT_END)
+                    self.store.append_sample(timestamp, tick.values, mask)
+                self.last_timestamp = timestamp
+
+                for incident_id, duration in tick.started:
+                    await self._emit(self._incident_frame(incident_id, "start", timestamp, tick.t, duration))
+                await self._emit({
+                    "type": "metrics",
+                    "data": {
+                        **tick.values,
+                        "timestamp": datetime.fromtimestamp(timestamp).isoformat(),
+                        "active_incidents": tick.active
+                    },
+                    "incident_count": len(tick.active),
+                    "system_status": system_status(tick.active, catalog),
+                    "ai_status": "scenario",
+                    "scenario": self._tag(tick.t)
+                })
+                for incident_id in tick.ended:
+                    await self._emit(self._incident_frame(incident_id, "end", timestamp, tick.t))
+                self.stats["ticks"] += 1
+            self.state = "finished"
+        except asyncio.CancelledError:
+            self.state = "stopped"
+            raise
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            logger.error(f"Scenario {self.scenario.name} failed: {e}")
+        finally:
+            self.finished_at = time.monotonic()
+            on_done(self)
+
+    def close(self):
+        """Drop the on-disk copy of the run."""
+        if self.store is not None:
+            self.store.close()
+            shutil.rmtree(self.store.directory, ignore_errors=True)
+            self.store = None
+
+    def to_dict(self) -> dict:
+        end = self.finished_at or time.monotonic()
+        wall = end - self.started_at if self.started_at else 0.0
+        ticks = self.stats["ticks"]
+        return {
+            "run_id": self.id,
+            "scenario": self.scenario.to_dict(),
+            "state": self.state,
+            "error": self.error,
+            "speed": self.speed,
+            "seed": self.seed,
+            "scenario_seconds": round(ticks * self.scenario.interval, 3),
+            "wall_seconds": round(wall, 3),
+            "ticks_per_second": round(ticks / wall, 1) if wall else 0.0,
+            "persisted": self.store is not None,
+            **self.stats,
+            "publish_ms": round(self.stats["publish_ms"], 3),
+            "scheduler": self.scheduler.get_stats() if self.scheduler else None
+        }
+
+class ScenarioManager:
+    """Scenario files of a directory and the last runs, one run at a time."""
+
+    def __init__(self, directory: str, catalog: Dict[str, dict], publish: Callable[[dict], Awaitable[None]],
+                 pause: Callable[[bool], None], store_factory: Optional[Callable[[str, List[str]], object]] = None,
+                 keep_runs: int = 5, max_speed: float = 10000.0, history_capacity: int = 1800):
+        self.directory = directory
+        self.catalog = catalog
+        self.publish = publish
+        self.pause = pause
+        self.store_factory = store_factory
+        self.keep_runs = keep_runs
+        self.max_speed = max_speed
+        self.history_capacity = history_capacity
+        self.runs: "OrderedDict[str, ScenarioRun]" = OrderedDict()
+        self.active: Optional[ScenarioRun] = None
+
+    def _path(self, name: str) -> str:
+        if not name or os.path.basename(name) != name or name.startswith("."):
+            raise ScenarioError(f"Invalid scenario name: {name!r}")
+        path = os.path.join(self.directory, name if name.endswith(".json") else name + ".json")
+        if not os.path.isfile(path):
+            raise ScenarioError(f"Unknown scenario: {name}")
+        return path
+
+    def list_scenarios(self) -> List[dict]:
+        scenarios = []
+        if not os.path.isdir(self.directory):
+            return scenarios
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                scenario = load_scenario(os.path.join(self.directory, filename), self.catalog)
+            except (OSError, ScenarioError) as e:
+                #one broken file must not hide the others
+                logger.warning(f"Skipping scenario {filename}: {e}")
+                continue
+            scenarios.append({"file": filename[:-5], **scenario.to_dict()})
+        return scenarios
+
+    def start(self, name: str, speed: float = 1.0, seed=None, persist: bool = True) -> dict:
+        if self.active is not None:
+            raise ScenarioError(f"Scenario run {self.active.id} is still running")
+        if isinstance(speed, bool) or not isinstance(speed, (int, float)) or not 0 <= speed <= self.max_speed:
+            raise ScenarioError(f"speed must be between 0 (as fast as possible) and {self.max_speed:g}")
+        scenario = load_scenario(self._path(name), self.catalog)
+
+        run = ScenarioRun(scenario, float(speed), seed, self.publish, history_capacity=self.history_capacity)
+        if persist and self.store_factory is not None:
+            try:
+                run.store = self.store_factory(run.id, scenario.incident_ids)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Scenario run {run.id} is not persisted: {e}")
+
+        self.runs[run.id] = run
+        while len(self.runs) > self.keep_runs:
+            _, evicted = self.runs.popitem(last=False)
+            evicted.close()
+        self.active = run
+        self.pause(True)
+        logger.info(f"Replaying scenario {scenario.name} ({scenario.ticks} ticks) at speed {speed:g}, run {run.id}")
+        run.start(self._finished)
+        return run.to_dict()
+
+    def _finished(self, run: ScenarioRun):
+        if self.active is run:
+            self.active = None
+            self.pause(False)
+        logger.info(f"Scenario run {run.id} {run.state} after {run.stats['ticks']} ticks")
+
+    def get(self, run_id: str) -> ScenarioRun:
+        run = self.runs.get(run_id)
+        if run is None:
+            raise ScenarioError(f"Unknown scenario run: {run_id}")
+        return run
+
+    async def stop(self, run_id: str) -> dict:
+        run = self.get(run_id)
+        await run.stop()
+        return run.to_dict()
+
+    async def close(self):
+        if self.active is not None:
+            await self.active.stop()
+        for run in self.runs.values():
+            run.close()
+        self.runs.clear()
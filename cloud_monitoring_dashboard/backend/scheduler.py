@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - Tick Scheduler
+Author: Zakariae Elbouzidi
+
+Monotonic clock for the simulation loop. Deadlines are anchored to the
+previous deadline, not to the end of the previous tick, so the time
+spent broadcasting and managing incidents does not add up as drift.
+A tick that runs past the next deadline counts as an overrun and the
+missed deadlines are skipped instead of being fired back to back.
+
+In adaptive mode (SIMULATION_TICK_MODE=adaptive) the interval follows
+the load:
+
+    idle      no client anywhere, slow ticks (SIMULATION_IDLE_INTERVAL)
+    incident  an incident is active, fast ticks (SIMULATION_INCIDENT_INTERVAL)
+    normal    the configured update interval
+
+and a tick whose broadcast would land on queues already filled above
+SIMULATION_LAG_THRESHOLD is computed and stored but not broadcast; the
+next tick supersedes it anyway.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from telemetry import FAST_BUCKETS, Histogram
+
+TICK_MODES = ("fixed", "adaptive")
+
+class TickScheduler:
+    """Drift-corrected tick deadlines with jitter and overrun statistics."""
+
+    def __init__(self, interval: float, clock: Callable[[], float] = time.monotonic, window: int = 300):
+        self.interval = interval
+        self.clock = clock
+        self._deadline: Optional[float] = None
+        self._wake = asyncio.Event()
+        #jitter of the last ticks, wake-up time minus deadline
+        self._jitter: "deque[float]" = deque(maxlen=window)
+        self._tick_started: Optional[float] = None
+        self.tick_seconds = Histogram("dashboard_tick_duration_seconds",
+                                      "Time from a tick's deadline wake-up to the next wait", buckets=FAST_BUCKETS)
+        self.stats = {
+            "ticks": 0,
+            "overruns": 0,
+            "skipped_ticks": 0,
+            "woken_early": 0,
+            "coalesced_broadcasts": 0,
+            "max_tick_ms": 0.0,
+            "last_tick_ms": 0.0
+        }
+
+    def reset(self):
+        """Make the next wait() return immediately and anchor the schedule there."""
+        self._deadline = None
+
+    def wake(self):
+        """Cut the current sleep short, e.g. when the interval should change now."""
+        self._wake.set()
+
+    async def wait(self, interval: Optional[float] = None):
+        """Finish the running tick and sleep until the next deadline."""
+        now = self.clock()
+        if interval is not None:
+            self.interval = interval
+        if self._tick_started is not None:
+            elapsed = now - self._tick_started
+            self.tick_seconds.observe(elapsed)
+            self.stats["last_tick_ms"] = round(elapsed * 1000, 2)
+            self.stats["max_tick_ms"] = max(self.stats["max_tick_ms"], self.stats["last_tick_ms"])
+
+        if self._deadline is None:
+            self._deadline = now
+        else:
+            self._deadline += self.interval
+            if self._deadline < now:
+                #the tick overran, skip what was missed and keep the phase
+                missed = int((now - self._deadline) // self.interval) + 1
+                self.stats["overruns"] += 1
+                self.stats["skipped_ticks"] += missed
+                self._deadline += missed * self.interval
+
+        delay = self._deadline - now
+        if delay > 0:
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                #woken on purpose, the schedule restarts from here
+                self.stats["woken_early"] += 1
+                self._deadline = self.clock()
+            except asyncio.TimeoutError:
+                pass
+
+        self._tick_started = self.clock()
+        self._jitter.append(self._tick_started - self._deadline)
+        self.stats["ticks"] += 1
+
+    def get_stats(self) -> dict:
+        jitter = sorted(self._jitter)
+        if jitter:
+            summary = {
+                "mean": round(sum(jitter) / len(jitter) * 1000, 3),
+                "p50": round(jitter[len(jitter) // 2] * 1000, 3),
+                "p99": round(jitter[min(len(jitter) - 1, int(len(jitter) * 0.99))] * 1000, 3),
+                "max": round(jitter[-1] * 1000, 3)
+            }
+        else:
+            summary = None
+        return {**self.stats, "interval": self.interval, "jitter_ms": summary}
+
+class AdaptiveTickPolicy:
+    """Picks the next tick interval and whether a tick is broadcast."""
+
+    def __init__(self, mode: str, base_interval: float, idle_interval: float,
+                 incident_interval: float, lag_threshold: float):
+        if mode not in TICK_MODES:
+            raise ValueError(f"Unknown tick mode: {mode}")
+        self.mode = mode
+        self.base_interval = base_interval
+        self.idle_interval = idle_interval
+        self.incident_interval = incident_interval
+        self.lag_threshold = lag_threshold
+        self.state = "normal"
+
+    @property
+    def adaptive(self) -> bool:
+        return self.mode == "adaptive"
+
+    def interval(self, clients: int, incidents: int) -> float:
+        if not self.adaptive:
+            self.state = "normal"
+        elif not clients:
+            self.state = "idle"
+        elif incidents:
+            self.state = "incident"
+        else:
+            self.state = "normal"
+        return {"idle": self.idle_interval, "incident": self.incident_interval}.get(self.state, self.base_interval)
+
+    @property
+    def min_interval(self) -> float:
+        """Shortest interval this policy can pick, what buffers sized in ticks must plan for."""
+        if not self.adaptive:
+            return self.base_interval
+        return min(self.base_interval, self.idle_interval, self.incident_interval)
+
+    def should_broadcast(self, lag: float) -> bool:
+        """lag is the fullest client queue as a fraction of its capacity."""
+        return not self.adaptive or lag < self.lag_threshold
+
+    def to_dict(self) -> dict:
+        return {
+            "mode": self.mode,
+            "state": self.state,
+            "base_interval": self.base_interval,
+            "idle_interval": self.idle_interval,
+            "incident_interval": self.incident_interval,
+            "lag_threshold": self.lag_threshold
+        }
+
+def create_tick_policy(base_interval: float) -> AdaptiveTickPolicy:
+    return AdaptiveTickPolicy(
+        os.getenv("SIMULATION_TICK_MODE", "fixed"),
+        base_interval,
+        idle_interval=float(os.getenv("SIMULATION_IDLE_INTERVAL", "10")),
+        incident_interval=float(os.getenv("SIMULATION_INCIDENT_INTERVAL", "0.5")),
+        lag_threshold=float(os.getenv("SIMULATION_LAG_THRESHOLD", "0.5"))
+    )
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - Persistent Metrics Store
+Author: Zakariae Elbouzidi
+
+Append-only, segment-based store for metric samples and incident events.
+
+Layout of the data directory:
+    store.json                    metric names and incident ids of the records
+    metrics-<hour>.seg            one segment per UTC hour of samples
+    events-<hour>.seg             one segment per UTC hour of incident events
+
+Every segment starts with a 16 byte header (magic, version, record size)
+followed by fixed-width little-endian records, each ending with a crc32
+of the record bytes before it. Reads memory-map the segments and view the
+records as numpy structured arrays, so range queries never build Python
+objects per sample.
+
+On open, the newest segment of each kind is checked: a partial trailing
+record or records with a bad checksum (torn write after a crash) are
+truncated away. Segments older than the retention window are deleted
+whenever the writer rolls to a new hour.
+
+Reads binary-search each segment, so records must be appended in time
+order. Stamps come from the wall clock, and after it steps backwards
+(NTP) a sample older than the last record is dropped and an incident
+event is written at the last record's time instead, both counted in
+get_stats().
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"CMDTS"
+VERSION = 1
+HEADER = struct.Struct("<5sBHQ")  #magic, version, record size, reserved
+SEGMENT_SECONDS = 3600
+
+EVENT_START = 1
+EVENT_END = 2
+
+def metrics_dtype(metric_count: int) -> np.dtype:
+    return np.dtype([
+        ("timestamp", "<f8"),
+        ("values", "<f8", (metric_count,)),
+        ("incidents", "<u4"),
+        ("crc", "<u4")
+    ])
+
+EVENT_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("incident", "<u2"),
+    ("kind", "<u1"),
+    ("reserved", "<u1"),
+    ("duration", "<f4"),
+    ("crc", "<u4")
+])
+
+class Segment:
+    """One hourly segment file: buffered appends and a lazily remapped read view."""
+
+    def __init__(self, path: str, dtype: np.dtype):
+        self.path = path
+        self.dtype = dtype
+        self._writer = None
+        self._map: Optional[mmap.mmap] = None
+        self._mapped_size = 0
+
+    @property
+    def size(self) -> int:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def append(self, record: bytes):
+        if self._writer is None:
+            fresh = self.size == 0
+            #unbuffered, so each record is one write() and lands on disk in order
+            self._writer = open(self.path, "ab", buffering=0)
+            if fresh:
+                self._writer.write(HEADER.pack(MAGIC, VERSION, self.dtype.itemsize, 0))
+        self._writer.write(record)
+
+    def records(self) -> np.ndarray:
+        """Zero-copy structured view of every complete record in the file."""
+        size = self.size
+        if size <= HEADER.size:
+            return np.empty(0, dtype=self.dtype)
+        if self._map is None or size != self._mapped_size:
+            self._unmap()
+            with open(self.path, "rb") as handle:
+                self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mapped_size = size
+        count = (self._mapped_size - HEADER.size) // self.dtype.itemsize
+        return np.frombuffer(self._map, dtype=self.dtype, count=count, offset=HEADER.size)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._unmap()
+
+    def _unmap(self):
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                #a numpy view still references the old map, let gc release it
+                pass
+            self._map = None
+            self._mapped_size = 0
+
+class SegmentSeries:
+    """All segments of one record kind, keyed by UTC hour."""
+
+    def __init__(self, directory: str, prefix: str, dtype: np.dtype):
+        self.directory = directory
+        self.prefix = prefix
+        self.dtype = dtype
+        self.segments: Dict[int, Segment] = {}
+        self.current_hour: Optional[int] = None
+        #newest stamp written, appends must not go below it
+        self.last_timestamp: Optional[float] = None
+
+        for name in os.listdir(directory):
+            if name.startswith(prefix + "-") and name.endswith(".seg"):
+                try:
+                    hour = int(name[len(prefix) + 1:-4])
+                except ValueError:
+                    continue
+                self.segments[hour] = Segment(os.path.join(directory, name), dtype)
+
+    def _path(self, hour: int) -> str:
+        return os.path.join(self.directory, f"{self.prefix}-{hour}.seg")
+
+    def append(self, timestamp: float, record: bytes) -> bool:
+        """Append a record, returns True when a new hourly segment was started."""
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            raise ValueError(f"{self.prefix} record at {timestamp} is older than the last one ({self.last_timestamp})")
+        self.last_timestamp = timestamp
+        hour = int(timestamp // SEGMENT_SECONDS)
+        rolled = hour != self.current_hour
+        if rolled:
+            if self.current_hour is not None and self.current_hour in self.segments:
+                self.segments[self.current_hour].close()
+            self.current_hour = hour
+            if hour not in self.segments:
+                self.segments[hour] = Segment(self._path(hour), self.dtype)
+        self.segments[hour].append(record)
+        return rolled
+
+    def read(self, start: float, end: float) -> np.ndarray:
+        """Records with start <= timestamp <= end, oldest first."""
+        first, last = int(start // SEGMENT_SECONDS), int(end // SEGMENT_SECONDS)
+        parts = []
+        for hour in sorted(h for h in self.segments if first <= h <= last):
+            records = self.segments[hour].records()
+            if not len(records):
+                continue
+            stamps = records["timestamp"]
+            lo = int(np.searchsorted(stamps, start, side="left"))
+            hi = int(np.searchsorted(stamps, end, side="right"))
+            if hi > lo:
+                parts.append(records[lo:hi])
+        if not parts:
+            return np.empty(0, dtype=self.dtype)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def newest_timestamp(self) -> Optional[float]:
+        for hour in sorted(self.segments, reverse=True):
+            records = self.segments[hour].records()
+            if len(records):
+                return float(records["timestamp"][-1])
+        return None
+
+    def recover_tail(self) -> int:
+        """Truncate a torn or corrupt tail in the newest segment, returns bytes dropped."""
+        if not self.segments:
+            return 0
+        segment = self.segments[max(self.segments)]
+        size = segment.size
+        if size < HEADER.size:
+            #header itself was torn, start the segment over
+            os.remove(segment.path)
+            del self.segments[max(self.segments)]
+            return size
+
+        with open(segment.path, "rb") as handle:
+            magic, version, record_size, _ = HEADER.unpack(handle.read(HEADER.size))
+        if magic != MAGIC or record_size != self.dtype.itemsize:
+            raise ValueError(f"{segment.path} is not a {self.prefix} segment of this layout")
+
+        complete = (size - HEADER.size) // record_size
+        keep = complete
+        records = segment.records()[:complete]
+        #walk back over records whose checksum does not match
+        while keep and not record_is_valid(records[keep - 1]):
+            keep -= 1
+        del records
+        segment.close()
+
+        valid_size = HEADER.size + keep * record_size
+        if valid_size != size:
+            os.truncate(segment.path, valid_size)
+        return size - valid_size
+
+    def drop_before(self, hour: int) -> List[str]:
+        removed = []
+        for old in [h for h in self.segments if h < hour]:
+            segment = self.segments.pop(old)
+            segment.close()
+            try:
+                os.remove(segment.path)
+                removed.append(segment.path)
+            except OSError as e:
+                logger.warning(f"Could not remove segment {segment.path}: {e}")
+        return removed
+
+    def close(self):
+        for segment in self.segments.values():
+            segment.close()
+
+def seal_record(record: np.ndarray) -> bytes:
+    """Fill in the crc field of a one-element record array and return its bytes."""
+    raw = record.tobytes()
+    record["crc"] = zlib.crc32(raw[:-4])
+    return record.tobytes()
+
+def record_is_valid(record) -> bool:
+    raw = record.tobytes()
+    return zlib.crc32(raw[:-4]) == int(record["crc"])
+
+class MetricsStore:
+    """
+    Persistent metrics and incident-event store.
+    Samples use the same column layout as MetricsHistory.
+    """
+
+    def __init__(self, directory: str, metric_names: Sequence[str], incident_ids: Sequence[str],
+                 retention_hours: float = 168):
+        self.directory = directory
+        self.metric_names = tuple(metric_names)
+        self.incident_ids = list(incident_ids)
+        self.retention_hours = retention_hours
+        self.stats = {"samples_written": 0, "events_written": 0, "segments_removed": 0, "recovered_bytes": 0,
+                      "out_of_order_samples": 0, "clamped_events": 0}
+
+        os.makedirs(directory, exist_ok=True)
+        self._check_meta()
+
+        self.sample_dtype = metrics_dtype(len(self.metric_names))
+        self.samples = SegmentSeries(directory, "metrics", self.sample_dtype)
+        self.events = SegmentSeries(directory, "events", EVENT_DTYPE)
+        self._sample_record = np.zeros(1, dtype=self.sample_dtype)
+        self._event_record = np.zeros(1, dtype=EVENT_DTYPE)
+
+        for series in (self.samples, self.events):
+            dropped = series.recover_tail()
+            if dropped:
+                logger.warning(f"Recovered {series.prefix} tail segment, dropped {dropped} torn bytes")
+                self.stats["recovered_bytes"] += dropped
+            series.last_timestamp = series.newest_timestamp()
+        self.enforce_retention()
+
+    def _check_meta(self):
+        path = os.path.join(self.directory, "store.json")
+        meta = {"version": VERSION, "metrics": list(self.metric_names), "incidents": self.incident_ids}
+        if os.path.exists(path):
+            with open(path) as handle:
+                existing = json.load(handle)
+            if existing.get("metrics") != meta["metrics"]:
+                raise ValueError(f"Metrics store at {self.directory} holds different metrics: {existing.get('metrics')}")
+            #new incident types are appended at the end, so old indices stay valid
+            known = existing.get("incidents", [])
+            if self.incident_ids[:len(known)] != known:
+                raise ValueError(f"Metrics store at {self.directory} was written with incidents {known}")
+        with open(path, "w") as handle:
+            json.dump(meta, handle)
+
+    def append_sample(self, timestamp: float, values: Dict[str, float], incident_mask: int):
+        last = self.samples.last_timestamp
+        if last is not None and timestamp < last:
+            #the clock stepped back, the next sample past the last record resumes the series
+            self.stats["out_of_order_samples"] += 1
+            return
+        record = self._sample_record
+        record["timestamp"] = timestamp
+        record["values"] = [values[name] for name in self.metric_names]
+        record["incidents"] = incident_mask
+        if self.samples.append(timestamp, seal_record(record)):
+            self.enforce_retention()
+        self.stats["samples_written"] += 1
+
+    def append_event(self, timestamp: float, incident_id: str, kind: int, duration: float = 0.0):
+        last = self.events.last_timestamp
+        if last is not None and timestamp < last:
+            #dropping a start or end would leave the incident open or missing on replay
+            self.stats["clamped_events"] += 1
+            timestamp = last
+        record = self._event_record
+        record["timestamp"] = timestamp
+        record["incident"] = self.incident_ids.index(incident_id)
+        record["kind"] = kind
+        record["duration"] = duration
+        self.events.append(timestamp, seal_record(record))
+        self.stats["events_written"] += 1
+
+    def read_samples(self, start: float, end: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Timestamps, (metrics, n) values and incident masks for [start, end]."""
+        records = self.samples.read(start, end)
+        return records["timestamp"], records["values"].T, records["incidents"]
+
+    def read_events(self, start: float, end: float) -> List[dict]:
+        records = self.events.read(start, end)
+        return [
+            {
+                "timestamp": float(record["timestamp"]),
+                "incident_id": self.incident_ids[int(record["incident"])],
+                "status": "start" if int(record["kind"]) == EVENT_START else "end",
+                "duration": float(record["duration"]) if int(record["kind"]) == EVENT_START else None
+            }
+            for record in records
+        ]
+
+    def oldest_timestamp(self) -> Optional[float]:
+        for hour in sorted(self.samples.segments):
+            records = self.samples.segments[hour].records()
+            if len(records):
+                return float(records["timestamp"][0])
+        return None
+
+    def enforce_retention(self, now: Optional[float] = None):
+        """Delete whole segments that fall completely outside the retention window."""
+        now = time.time() if now is None else now
+        cutoff_hour = int((now - self.retention_hours * 3600) // SEGMENT_SECONDS)
+        removed = self.samples.drop_before(cutoff_hour) + self.events.drop_before(cutoff_hour)
+        if removed:
+            logger.info(f"Metrics store retention removed {len(removed)} segments")
+            self.stats["segments_removed"] += len(removed)
+
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "directory": self.directory,
+            "segments": len(self.samples.segments) + len(self.events.segments),
+            "bytes_on_disk": sum(s.size for s in list(self.samples.segments.values()) + list(self.events.segments.values())),
+            "record_bytes": self.sample_dtype.itemsize
+        }
+
+    def close(self):
+        self.samples.close()
+        self.events.close()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - WebSocket Subscriptions
+Author: Zakariae Elbouzidi
+
+Per-client subscriptions for /ws and the topic index the connection
+manager routes broadcasts through.
+
+A topic is a message type ("metrics", "incident", ...) or "host:<name>"
+for the samples of an ingested host. Clients that never subscribe sit
+on the wildcard topic and get every message type but no host data, as
+before subscriptions existed.
+
+The index maps topic -> metric projection -> set of clients, so a
+broadcast only visits the clients of its topic and encodes one frame
+per distinct projection instead of filtering socket by socket.
+"""
+
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from history import METRIC_NAMES
+
+WILDCARD = "*"
+HOST_PREFIX = "host:"
+
+#message types a client can pick, clients on the wildcard also get types added later
+BROADCAST_TYPES = ("metrics", "incident", "anomaly", "alert", "ai_job", "ai_insight", "ai_insight_chunk", "model_status")
+
+#frames whose "data" can be cut down to the subscribed metrics
+PROJECTED_TYPES = ("metrics", "host_metrics")
+
+#frames dropped when they arrive faster than the client's max_rate
+RATE_LIMITED_TYPES = ("metrics", "host_metrics")
+
+#data keys kept in every projection
+PROJECTION_KEYS = ("timestamp", "active_incidents")
+
+#"host" is the raw /proc sample in host mode
+SUBSCRIBABLE_METRICS = METRIC_NAMES + ("host",)
+
+MAX_HOSTS_PER_CLIENT = 1000
+
+Projection = Optional[Tuple[str, ...]]
+
+class SubscriptionError(ValueError):
+    """Raised for a malformed subscribe/unsubscribe message."""
+
+def _string_list(message: dict, key: str) -> Optional[List[str]]:
+    value = message.get(key)
+    if value is None:
+        return None
+    if not isinstance(value, list) or not all(isinstance(item, str) and item for item in value):
+        raise SubscriptionError(f"{key} must be a list of strings")
+    return value
+
+class Subscription:
+    """What one client wants: message types, hosts, metric names and a max update rate."""
+
+    def __init__(self):
+        self.types: Optional[Set[str]] = None  #None = every type (wildcard)
+        self.hosts: Set[str] = set()
+        self.metrics: Projection = None  #None = every metric
+        self.max_rate: Optional[float] = None
+
+    @property
+    def min_interval(self) -> float:
+        return 1.0 / self.max_rate if self.max_rate else 0.0
+
+    def topics(self) -> List[str]:
+        types = [WILDCARD] if self.types is None else sorted(self.types)
+        return types + [HOST_PREFIX + host for host in sorted(self.hosts)]
+
+    def apply(self, message: dict):
+        """Update from a {"type": "subscribe" | "unsubscribe", ...} message, all or nothing."""
+        types = _string_list(message, "types")
+        hosts = _string_list(message, "hosts")
+        if types:
+            unknown = [name for name in types if name != WILDCARD and name not in BROADCAST_TYPES]
+            if unknown:
+                raise SubscriptionError(f"Unknown message types: {', '.join(unknown)}")
+
+        if message["type"] == "unsubscribe":
+            if types:
+                current = set(BROADCAST_TYPES) if self.types is None else self.types
+                self.types = current - set(types)
+            if hosts:
+                self.hosts -= set(hosts)
+            return
+
+        #validate everything before changing anything
+        new_hosts = self.hosts | set(hosts or ())
+        if len(new_hosts) > MAX_HOSTS_PER_CLIENT:
+            raise SubscriptionError(f"At most {MAX_HOSTS_PER_CLIENT} hosts per client")
+        metrics = self._parse_metrics(message["metrics"]) if "metrics" in message else self.metrics
+        max_rate = self._parse_rate(message["max_rate"]) if "max_rate" in message else self.max_rate
+
+        if types is not None:
+            if WILDCARD in types:
+                self.types = None
+            elif self.types is None:
+                #the first explicit list narrows the default wildcard
+                self.types = set(types)
+            else:
+                self.types |= set(types)
+        self.hosts = new_hosts
+        self.metrics = metrics
+        self.max_rate = max_rate
+
+    def _parse_metrics(self, value) -> Projection:
+        if value is None:
+            return None
+        if not isinstance(value, list) or not value:
+            raise SubscriptionError("metrics must be a non-empty list or null")
+        unknown = [name for name in value if name not in SUBSCRIBABLE_METRICS]
+        if unknown:
+            raise SubscriptionError(f"Unknown metrics: {', '.join(map(str, unknown))}")
+        #sorted so equal selections share one projection group
+        return tuple(sorted(set(value)))
+
+    def _parse_rate(self, value) -> Optional[float]:
+        if value is None:
+            return None
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+            raise SubscriptionError("max_rate must be a positive number of updates per second")
+        return float(value)
+
+    def to_dict(self) -> dict:
+        return {
+            "types": None if self.types is None else sorted(self.types),
+            "hosts": sorted(self.hosts),
+            "metrics": None if self.metrics is None else list(self.metrics),
+            "max_rate": self.max_rate
+        }
+
+def project_message(message: dict, metrics: Sequence[str]) -> dict:
+    """Copy of a metrics message whose data and aggregates only hold the given metrics."""
+    data = message.get("data")
+    if not isinstance(data, dict):
+        return message
+    projected = {**message, "data": {key: value for key, value in data.items()
+                                     if key in metrics or key in PROJECTION_KEYS}}
+    aggregates = message.get("aggregates")
+    if isinstance(aggregates, dict):
+        projected["aggregates"] = {window: {name: summary for name, summary in summaries.items() if name in metrics}
+                                   for window, summaries in aggregates.items()}
+    return projected
+
+class TopicIndex:
+    """topic -> projection -> subscribers."""
+
+    def __init__(self):
+        self._topics: Dict[str, Dict[Projection, Set]] = {}
+        self._keys: Dict[object, List[Tuple[str, Projection]]] = {}
+
+    def add(self, subscriber, subscription: Subscription):
+        self.remove(subscriber)
+        keys = []
+        for topic in subscription.topics():
+            projected = topic == WILDCARD or topic.startswith(HOST_PREFIX) or topic in PROJECTED_TYPES
+            projection = subscription.metrics if projected else None
+            self._topics.setdefault(topic, {}).setdefault(projection, set()).add(subscriber)
+            keys.append((topic, projection))
+        self._keys[subscriber] = keys
+
+    def remove(self, subscriber):
+        for topic, projection in self._keys.pop(subscriber, ()):
+            groups = self._topics[topic]
+            groups[projection].discard(subscriber)
+            if not groups[projection]:
+                del groups[projection]
+            if not groups:
+                del self._topics[topic]
+
+    def groups(self, topic: Optional[str]) -> Iterator[Tuple[Projection, Set]]:
+        """Projection groups subscribed to a topic, wildcard clients included for message types."""
+        if topic:
+            yield from self._topics.get(topic, {}).items()
+        if not topic or not topic.startswith(HOST_PREFIX):
+            yield from self._topics.get(WILDCARD, {}).items()
+
+    def has_subscribers(self, topic: str) -> bool:
+        return any(True for _ in self.groups(topic))
+
+    def counts(self) -> Dict[str, int]:
+        return {topic: sum(len(clients) for clients in groups.values())
+                for topic, groups in sorted(self._topics.items())}
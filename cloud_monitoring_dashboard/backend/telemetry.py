@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - Self Instrumentation
+Author: Zakariae Elbouzidi
+
+Counters, gauges and fixed-bucket histograms rendered in the Prometheus
+text exposition format (version 0.0.4) by GET /metrics.
+
+Every observation happens on the event loop thread, so the hot path is
+a bisect over the bucket bounds and two in-place additions, without
+locks or allocations. Gauges and the counters that mirror existing stats
+dicts are callbacks evaluated at scrape time and cost nothing between
+scrapes.
+"""
+
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+#seconds, from sub-millisecond broadcasts to multi-minute model pulls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+#seconds, for in-process work such as a broadcast or a simulation tick
+FAST_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_text(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metric:
+    """One metric family, optionally split by labels."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "Metric"] = {}
+
+    def labels(self, *values: str) -> "Metric":
+        """Child for one combination of label values, created on first use."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self) -> "Metric":
+        raise NotImplementedError
+
+    def _series(self) -> Iterable[Tuple[Tuple[str, ...], "Metric"]]:
+        if self.labelnames:
+            return list(self._children.items())
+        return [((), self)]
+
+    def samples(self, labelnames: Tuple[str, ...], labels: Tuple[str, ...]) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labels, child in self._series():
+            lines.extend(child.samples(self.labelnames, labels))
+        return lines
+
+class Counter(Metric):
+    """Monotonic total, incremented in place."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+
+    def _new_child(self) -> "Counter":
+        return Counter(self.name, self.documentation)
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def samples(self, labelnames: Tuple[str, ...], labels: Tuple[str, ...]) -> List[str]:
+        return [f"{self.name}{_label_text(labelnames, labels)} {_format_value(self.value)}"]
+
+class Gauge(Metric):
+    """Current value, either set directly or read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+        self.function = function
+
+    def _new_child(self) -> "Gauge":
+        return Gauge(self.name, self.documentation)
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self, labelnames: Tuple[str, ...], labels: Tuple[str, ...]) -> List[str]:
+        value = self.function() if self.function is not None else self.value
+        return [f"{self.name}{_label_text(labelnames, labels)} {_format_value(value)}"]
+
+class CounterFunction(Gauge):
+    """A counter whose total already lives elsewhere, e.g. in a get_stats() dict."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, function: Callable[[], float]):
+        super().__init__(name, documentation, function=function)
+
+class Histogram(Metric):
+    """Cumulative fixed-bucket histogram with sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(float(bound) for bound in buckets if bound != math.inf))
+        #one slot per bound plus +Inf, not cumulative until rendered
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+
+    def _new_child(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, buckets=self.bounds)
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def time(self) -> "_Timer":
+        """Context manager observing the seconds spent inside it."""
+        return _Timer(self)
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def samples(self, labelnames: Tuple[str, ...], labels: Tuple[str, ...]) -> List[str]:
+        lines = []
+        total = 0
+        for bound, count in zip(self.bounds + (math.inf,), self.counts):
+            total += count
+            le = 'le="' + _format_value(bound) + '"'
+            lines.append(f"{self.name}_bucket{_label_text(labelnames, labels, le)} {total}")
+        label_text = _label_text(labelnames, labels)
+        lines.append(f"{self.name}_sum{label_text} {_format_value(self.sum)}")
+        lines.append(f"{self.name}_count{label_text} {total}")
+        return lines
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+class Registry:
+    """The metric families served by one /metrics endpoint."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self.scrapes = 0
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics and self._metrics[metric.name] is not metric:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, function=function))
+
+    def counter_function(self, name: str, documentation: str, function: Callable[[], float]) -> CounterFunction:
+        return self.register(CounterFunction(name, documentation, function))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        self.scrapes += 1
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request by method, route template and
+    status. Requests that match no route are counted under "unmatched" so
+    scanners probing random paths cannot blow up the label set.
+    """
+
+    def __init__(self, app, histogram: Histogram):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            #the router stores the matched route in the scope it passes down,
+            #mounts such as /static only leave their prefix in root_path
+            route = scope.get("route")
+            path = getattr(route, "path", None) or scope.get("root_path") or "unmatched"
+            self.histogram.labels(scope["method"], path, str(status[0])).observe(time.perf_counter() - started)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - Deadline Timers
+Author: Zakariae Elbouzidi
+
+A min-heap of monotonic deadlines served by one asyncio task. Incident
+expiry used to be polled on every simulation tick, so an incident ended
+up to one tick late and the cost grew with every active incident. Here
+the task sleeps until the earliest deadline and fires exactly the keys
+that are due.
+
+schedule, extend and cancel are O(log n): a changed or cancelled key
+leaves its old heap entry behind, and the entry is skipped when it
+surfaces because its sequence number no longer matches. The heap is
+rebuilt when stale entries outnumber live ones.
+"""
+
+import asyncio
+import heapq
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class TimerHeap:
+    """Fires callback(key) once per key when its deadline passes."""
+
+    def __init__(self, callback: Callable[[Hashable], Awaitable[None]],
+                 clock: Callable[[], float] = time.monotonic):
+        self.callback = callback
+        self.clock = clock
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._deadlines: Dict[Hashable, Tuple[float, int]] = {}
+        self._seq = 0
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "scheduled": 0,
+            "fired": 0,
+            "extended": 0,
+            "cancelled": 0,
+            "max_lateness_ms": 0.0,
+            "last_lateness_ms": 0.0
+        }
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._deadlines
+
+    def _push(self, key: Hashable, deadline: float):
+        self._seq += 1
+        self._deadlines[key] = (deadline, self._seq)
+        heapq.heappush(self._heap, (deadline, self._seq, key))
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [(deadline, seq, key) for key, (deadline, seq) in self._deadlines.items()]
+            heapq.heapify(self._heap)
+        #the waiter only needs to wake up when the earliest deadline moved
+        if self._heap[0][1] == self._seq:
+            self._changed.set()
+
+    def schedule(self, key: Hashable, delay: float) -> float:
+        """Fire key after delay seconds, replacing a pending deadline. Returns the deadline."""
+        deadline = self.clock() + max(0.0, delay)
+        self._push(key, deadline)
+        self.stats["scheduled"] += 1
+        return deadline
+
+    def extend(self, key: Hashable, seconds: float) -> float:
+        """Move a pending deadline by seconds (negative shortens). Raises KeyError."""
+        deadline = self._deadlines[key][0] + seconds
+        self._push(key, deadline)
+        self.stats["extended"] += 1
+        if seconds < 0:
+            self._changed.set()
+        return deadline
+
+    def cancel(self, key: Hashable) -> bool:
+        """Drop a pending deadline without firing it."""
+        if self._deadlines.pop(key, None) is None:
+            return False
+        self.stats["cancelled"] += 1
+        return True
+
+    def remaining(self, key: Hashable) -> Optional[float]:
+        entry = self._deadlines.get(key)
+        return None if entry is None else max(0.0, entry[0] - self.clock())
+
+    def _next_deadline(self) -> Optional[float]:
+        heap = self._heap
+        while heap:
+            deadline, seq, key = heap[0]
+            if self._deadlines.get(key, (None, None))[1] == seq:
+                return deadline
+            heapq.heappop(heap)
+        return None
+
+    def pop_due(self, now: Optional[float] = None) -> List[Hashable]:
+        """Remove and return the keys whose deadline passed, earliest first."""
+        now = self.clock() if now is None else now
+        due = []
+        while True:
+            deadline = self._next_deadline()
+            if deadline is None or deadline > now:
+                break
+            _, _, key = heapq.heappop(self._heap)
+            del self._deadlines[key]
+            lateness = round((now - deadline) * 1000, 3)
+            self.stats["last_lateness_ms"] = lateness
+            self.stats["max_lateness_ms"] = max(self.stats["max_lateness_ms"], lateness)
+            due.append(key)
+        return due
+
+    # ---- waiter task ----
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            self._changed.clear()
+            deadline = self._next_deadline()
+            if deadline is None:
+                await self._changed.wait()
+                continue
+            delay = deadline - self.clock()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=delay)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+            for key in self.pop_due():
+                self.stats["fired"] += 1
+                try:
+                    await self.callback(key)
+                except Exception as e:
+                    logger.warning(f"Timer callback for {key!r} failed: {e}")
+
+    def get_stats(self) -> dict:
+        return {**self.stats, "pending": len(self._deadlines), "heap_entries": len(self._heap)}
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cloud Monitoring Dashboard - Compact Wire Formats
+Author: Zakariae Elbouzidi
+
+Opt-in encodings for the metrics frames of /ws, picked once per
+connection with ws://host:8000/ws?format=<name>:
+
+    json     full JSON object every tick, the default (dashboard.js)
+    compact  short keys, epoch milliseconds, keyframes and deltas as JSON text
+    msgpack  the compact frames as MessagePack binary messages
+    packed   the compact frames with the metric values as packed floats
+
+Every compact stream (a topic in one metric projection) numbers its
+frames with "q". A keyframe ("k": 1) carries every field, a delta only
+the fields that changed since frame q - 1. The writer of a connection
+that missed the previous frame of a stream (rate limit, dropped or
+coalesced frame) sends the keyframe of the current frame instead, so a
+client never has to ask for a resync. Sticky fields (the aggregates)
+are carried over from the previous frame when a message leaves them out,
+so they show up in a delta only when they change and every keyframe
+holds the latest value. Other message types stay JSON text frames in
+every format.
+
+Packed binary layout, little endian:
+
+    B flags (1 = keyframe, 2 = host stream) | I q | d timestamp (s)
+    B mask of METRIC_NAMES present | f per bit set | JSON of the other fields
+"""
+
+import json
+import struct
+from datetime import datetime
+from typing import Dict, Optional, Union
+
+from frames import Frame, encode_json
+from history import METRIC_NAMES
+
+#optional MessagePack encoder for format=msgpack
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+DEFAULT_FORMAT = "json"
+WIRE_FORMATS = ("json", "compact", "msgpack", "packed")
+
+#message types sent as keyframes and deltas
+DELTA_TYPES = {"metrics": "m", "host_metrics": "h"}
+
+#full key -> short key; top-level and data keys share one namespace
+SHORT_KEYS = {
+    "cpu_usage": "c",
+    "memory_usage": "m",
+    "api_latency": "l",
+    "error_rate": "e",
+    "timestamp": "ts",
+    "active_incidents": "i",
+    "incident_count": "n",
+    "system_status": "s",
+    "ai_status": "a",
+    "aggregates": "g",
+    "host": "p"  #raw /proc sample in host mode
+}
+PACKED_KEYS = tuple(SHORT_KEYS[name] for name in METRIC_NAMES)
+
+#fields repeated in every delta
+ALWAYS_SENT = ("t", "h", "ts")
+
+#fields only some frames carry (aggregates every AGGREGATE_FRAME_INTERVAL): a frame
+#without them keeps the last value, so they do not force keyframes
+STICKY_KEYS = ("g",)
+
+PACKED_HEADER = struct.Struct("<BIdB")
+FLAG_KEYFRAME = 1
+FLAG_HOST = 2
+
+Payload = Union[str, bytes]
+
+def check_format(name: str) -> str:
+    """Validate a ?format= value, raises ValueError."""
+    if name not in WIRE_FORMATS:
+        raise ValueError(f"Unknown format {name!r}, expected one of {', '.join(WIRE_FORMATS)}")
+    if name == "msgpack" and msgpack is None:
+        raise ValueError("format=msgpack needs the msgpack package on the server")
+    return name
+
+def _epoch_ms(timestamp) -> Optional[int]:
+    if isinstance(timestamp, str):
+        try:
+            return int(datetime.fromisoformat(timestamp).timestamp() * 1000)
+        except ValueError:
+            return None
+    if isinstance(timestamp, (int, float)):
+        return int(timestamp * 1000)
+    return None
+
+def compact_fields(message: dict) -> dict:
+    """Flatten a metrics or host_metrics message into short keys."""
+    fields = {"t": DELTA_TYPES[message["type"]]}
+    if message["type"] == "host_metrics":
+        fields["h"] = message.get("host")
+    for key, value in message.items():
+        if key not in ("type", "data", "host"):
+            fields[SHORT_KEYS.get(key, key)] = value
+    data = message.get("data")
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if key == "timestamp":
+                value = _epoch_ms(value)
+            fields[SHORT_KEYS.get(key, key)] = value
+    return fields
+
+def _pack(fields: dict, keyframe: bool) -> bytes:
+    mask = 0
+    rest = {}
+    for key, value in fields.items():
+        if key in PACKED_KEYS and isinstance(value, (int, float)):
+            mask |= 1 << PACKED_KEYS.index(key)
+        elif key not in ("t", "q", "ts"):
+            rest[key] = value
+    #values follow the bit order, not the dict order
+    values = [float(fields[key]) for bit, key in enumerate(PACKED_KEYS) if mask & (1 << bit)]
+    flags = (FLAG_KEYFRAME if keyframe else 0) | (FLAG_HOST if fields["t"] == "h" else 0)
+    timestamp = (fields.get("ts") or 0) / 1000.0
+    tail = json.dumps(rest, separators=(",", ":")).encode("utf-8") if rest else b""
+    return PACKED_HEADER.pack(flags, fields["q"], timestamp, mask) + struct.pack(f"<{len(values)}f", *values) + tail
+
+def serialize(fields: dict, fmt: str, keyframe: bool) -> Payload:
+    if fmt == "packed":
+        return _pack(fields, keyframe)
+    if keyframe:
+        fields = {**fields, "k": 1}
+    if fmt == "msgpack":
+        return msgpack.packb(fields)
+    return encode_json(fields)
+
+class WireFrame(Frame):
+    """
+    One frame of a compact stream.
+    text holds the delta (or the keyframe when there is no delta), the
+    keyframe payload is only serialized when a connection needs it.
+    """
+    __slots__ = ("stream", "seq", "is_delta", "_fields", "_fmt", "_keyframe")
+
+    def __init__(self, type: str, text: Payload, stream: "StreamEncoder", seq: int, is_delta: bool,
+                 fields: dict, fmt: str):
+        super().__init__(type, text)
+        self.stream = stream
+        self.seq = seq
+        self.is_delta = is_delta
+        self._fields = fields
+        self._fmt = fmt
+        self._keyframe: Optional[Payload] = None if is_delta else text
+
+    @property
+    def keyframe(self) -> Payload:
+        if self._keyframe is None:
+            self._keyframe = serialize(self._fields, self._fmt, keyframe=True)
+        return self._keyframe
+
+    def payload_for(self, last_seq: Optional[int]) -> Payload:
+        """The delta if the connection got frame seq - 1 of this stream, else the keyframe."""
+        if self.is_delta and last_seq == self.seq - 1:
+            return self.text
+        return self.keyframe
+
+class StreamEncoder:
+    """Keyframe/delta state of one stream in one format."""
+
+    def __init__(self, fmt: str, keyframe_interval: int = 30):
+        self.fmt = fmt
+        self.keyframe_interval = keyframe_interval
+        self.seq = 0
+        self._state: Optional[dict] = None
+        self._since_keyframe = 0
+        self.stats = {"keyframes": 0, "deltas": 0}
+
+    def encode(self, message: dict) -> WireFrame:
+        fields = compact_fields(message)
+        self.seq += 1
+        fields["q"] = self.seq
+        if self._state is not None:
+            for key in STICKY_KEYS:
+                if key not in fields and key in self._state:
+                    fields[key] = self._state[key]
+        previous, self._state = self._state, fields
+
+        #a field that appeared or vanished cannot be expressed as a delta
+        if (previous is None or self._since_keyframe + 1 >= self.keyframe_interval
+                or previous.keys() != fields.keys()):
+            self._since_keyframe = 0
+            self.stats["keyframes"] += 1
+            text = serialize(fields, self.fmt, keyframe=True)
+            return WireFrame(message["type"], text, self, self.seq, False, fields, self.fmt)
+
+        self._since_keyframe += 1
+        self.stats["deltas"] += 1
+        delta = {key: value for key, value in fields.items()
+                 if key == "q" or key in ALWAYS_SENT or previous[key] != value}
+        text = serialize(delta, self.fmt, keyframe=False)
+        return WireFrame(message["type"], text, self, self.seq, True, fields, self.fmt)
+
+class CompactDecoder:
+    """Rebuilds full field sets from decoded compact frames (unpack() for packed), as a client would."""
+
+    def __init__(self):
+        self.streams: Dict[tuple, dict] = {}
+
+    def apply(self, frame: dict) -> Optional[dict]:
+        """Returns the current fields of the frame's stream, None while waiting for a keyframe."""
+        stream = (frame["t"], frame.get("h"))
+        state = self.streams.get(stream)
+        if frame.get("k"):
+            state = {key: value for key, value in frame.items() if key != "k"}
+        elif state is None or frame["q"] != state["q"] + 1:
+            return None
+        else:
+            state = {**state, **frame}
+        self.streams[stream] = state
+        return state
+
+def unpack(payload: bytes) -> dict:
+    """Decode a packed binary frame into compact fields."""
+    flags, seq, timestamp, mask = PACKED_HEADER.unpack_from(payload)
+    keys = [key for bit, key in enumerate(PACKED_KEYS) if mask & (1 << bit)]
+    offset = PACKED_HEADER.size + 4 * len(keys)
+    values = struct.unpack_from(f"<{len(keys)}f", payload, PACKED_HEADER.size)
+    fields = {"t": "h" if flags & FLAG_HOST else "m", "q": seq, "ts": int(round(timestamp * 1000))}
+    fields.update(zip(keys, values))
+    if len(payload) > offset:
+        fields.update(json.loads(payload[offset:]))
+    if flags & FLAG_KEYFRAME:
+        fields["k"] = 1
+    return fields
@@ -41,6 +41,7 @@ class CloudMonitoringDashboard {
         this.connectWebSocket();
         this.loadAvailableIncidents();
         this.initializeCharts();
+        this.loadMetricsHistory();
         this.checkAIStatus();
         
 //fallback_when_websocket_down
@@ -155,16 +156,25 @@ class CloudMonitoringDashboard {
                 break;
             case 'metrics':
                 this.handleMetricsUpdate(message.data);
-                if (message.ai_status) {
+                if (message.ai_status === 'active') {
                     this.updateAIStatus('active');
                 }
                 break;
+            case 'model_status':
+                this.handleModelStatus(message);
+                break;
             case 'incident':
                 this.handleIncidentNotification(message);
                 break;
+            case 'ai_job':
+                this.handleAIJobUpdate(message.job);
+                break;
             case 'ai_insight':
                 this.handleAIInsight(message.insight);
                 break;
+            case 'ai_insight_chunk':
+                this.handleAIInsightChunk(message);
+                break;
             case 'pong':
                 //heartbeat response with ai status verification
                 if (message.ai_status === 'mandatory_active') {
@@ -183,7 +193,10 @@ class CloudMonitoringDashboard {
             const response = await fetch(`${this.API_BASE}/api/health`);
             const health = await response.json();
             
-            if (health.ai_status === 'mandatory' && health.ollama_status === 'operational') {
+            if (health.ai_model && health.ai_model.state !== 'ready' && health.ai_model.state !== 'failed') {
+                //model still downloading, the dashboard works without ai meanwhile
+                this.handleModelStatus(health.ai_model);
+            } else if (health.ai_status === 'mandatory' && health.ollama_status === 'operational') {
                 this.updateAIStatus('active');
                 //clear error display if ai is now working
                 if (this.aiStatus !== 'active') {
@@ -225,6 +238,10 @@ class CloudMonitoringDashboard {
                     statusText.textContent = 'MANDATORY AI Unavailable';
                     statusText.style.color = '#ef4444';
                     break;
+                case 'provisioning':
+                    statusText.textContent = this.modelProgressText || 'Preparing AI model...';
+                    statusText.style.color = '#f59e0b';
+                    break;
             }
         }
         
@@ -241,6 +258,28 @@ class CloudMonitoringDashboard {
         });
     }
 
+    handleModelStatus(status) {
+        //background model download, ai switches on once the state is ready
+        if (status.state === 'ready') {
+            if (this.aiStatus === 'provisioning') {
+                this.addLog('SUCCESS', `🤖 AI model ${status.model} ready`);
+            }
+            this.updateAIStatus('active');
+            return;
+        }
+        if (status.state === 'failed') {
+            this.modelProgressText = 'AI model setup failed, retrying...';
+        } else if (status.state === 'downloading' && status.percent !== null && status.percent !== undefined) {
+            this.modelProgressText = `Downloading AI model ${Math.round(status.percent)}%`;
+        } else {
+            this.modelProgressText = status.detail || 'Preparing AI model...';
+        }
+        if (this.aiStatus !== 'provisioning') {
+            this.addLog('INFO', `⏳ AI model ${status.model}: ${status.detail}`);
+        }
+        this.updateAIStatus('provisioning');
+    }
+
     // ===============================================================================
     //incident management
     // ===============================================================================
@@ -385,8 +424,10 @@ class CloudMonitoringDashboard {
             
             this.addLog('SUCCESS', `✅ ${result.triggered}/${result.total} incidents triggered successfully`);
             
-            if (result.triggered >= 2) {
-                this.addLog('AI', '🤖 Automatic AI analysis triggered for multi-incident');
+            if (result.ai_job && result.ai_job.id) {
+                this.addLog('AI', `🤖 AI analysis queued (job ${result.ai_job.id}, ${result.ai_job.kind})`);
+            } else if (result.ai_job && result.ai_job.status === 'rejected') {
+                this.addLog('WARNING', `AI analysis not queued: ${result.ai_job.error}`);
             }
             
             //reset selection
@@ -402,6 +443,17 @@ class CloudMonitoringDashboard {
         }
     }
 
+    handleAIJobUpdate(job) {
+        //queued and done need no log line, the insight itself follows
+        if (job.status === 'running' && job.wait_ms > 1000) {
+            this.addLog('AI', `🤖 AI analysis ${job.id} started after ${(job.wait_ms / 1000).toFixed(1)}s in queue`);
+        } else if (job.status === 'superseded') {
+            this.addLog('INFO', `AI analysis ${job.id} replaced by newer job ${job.superseded_by}`);
+        } else if (job.status === 'failed') {
+            this.addLog('ERROR', `AI analysis ${job.id} failed: ${job.error}`);
+        }
+    }
+
     handleIncidentNotification(message) {
         const { incident_type, status, incident } = message;
         
@@ -434,6 +486,32 @@ class CloudMonitoringDashboard {
         }
     }
 
+    async loadMetricsHistory() {
+        //seed the charts with server-side history after a reload
+        try {
+            const from = Date.now() / 1000 - 15 * 60;
+            const response = await fetch(`${this.API_BASE}/api/metrics/history?from=${from}&agg=last&max_points=100`);
+            if (!response.ok) return;
+            const history = await response.json();
+            const keys = Object.keys(history.series);
+            if (keys.length === 0) return;
+
+            const timestamps = history.series[keys[0]].timestamps;
+            const points = timestamps.map((ts, i) => {
+                const point = { timestamp: new Date(ts * 1000) };
+                keys.forEach(key => { point[key] = history.series[key].values[i]; });
+                return point;
+            });
+
+            //live updates may already have arrived, keep them after the history
+            this.metricsHistory = points.concat(this.metricsHistory).slice(-100);
+            this.updateCharts();
+            this.addLog('INFO', `📈 Loaded ${points.length} history points`);
+        } catch (error) {
+            console.error('Error loading metrics history:', error);
+        }
+    }
+
     handleMetricsUpdate(metrics) {
         this.currentMetrics = metrics;
         this.metricsHistory.push({
@@ -716,6 +794,15 @@ class CloudMonitoringDashboard {
             
             const response = await fetch(`${this.API_BASE}/api/ai/analyze`);
             
+            if (response.status === 503) {
+                const body = await response.json();
+                if (body.detail && body.detail.model) {
+                    this.handleModelStatus(body.detail.model);
+                    this.addLog('WARNING', `⏳ ${body.detail.message}`);
+                    return;
+                }
+            }
+            
             if (!response.ok) {
                 throw new Error(`API Error: ${response.status}`);
             }
@@ -737,6 +824,31 @@ class CloudMonitoringDashboard {
         }
     }
 
+    handleAIInsightChunk(message) {
+        //tokens stream in while the model is still generating, the full ai_insight follows
+        const aiContent = document.getElementById('aiContent');
+        if (!aiContent) return;
+
+        if (message.done) {
+            const stats = message.stats || {};
+            this.addLog('AI', `🤖 First token ${stats.time_to_first_token_ms} ms, ${stats.tokens_per_second} tokens/s, total ${stats.total_ms} ms`);
+            return;
+        }
+
+        let streamEl = document.getElementById(`ai-stream-${message.stream_id}`);
+        if (!streamEl) {
+            aiContent.innerHTML = `
+                <div class="ai-analysis animate-slide-in">
+                    <div class="ai-analysis-title">🤖 Ollama Llama AI Analysis</div>
+                    <div class="ai-analysis-content" id="ai-stream-${message.stream_id}"></div>
+                </div>
+            `;
+            streamEl = document.getElementById(`ai-stream-${message.stream_id}`);
+            this.updateAIStatusDisplay('analyzing');
+        }
+        streamEl.textContent += message.delta;
+    }
+
     handleAIInsight(insight) {
         const aiContent = document.getElementById('aiContent');
         if (!aiContent) return;